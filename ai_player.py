@@ -4,14 +4,22 @@ AI Player Module - LLM作为游戏对手
 """
 
 import os
+import re
 import json
 from typing import List, Dict, Any, Optional
-from openai import OpenAI
 from dotenv import load_dotenv
 
+from worldshell import llm_client, llm_cache, views
+
 # 加载环境变量（从worldshell目录下的.env）
 load_dotenv(os.path.join(os.path.dirname(__file__), '.env'))
 
+# 计划模式下一次计划最多的命令数
+MAX_PLAN_LENGTH = 20
+
+# 对话模式的摘要里保留最近多少条动作结果
+MAX_SUMMARY_LINES = 8
+
 class AIPlayer:
     def __init__(self, role: str = 'Z'):
         """
@@ -26,15 +34,32 @@ class AIPlayer:
         self.model = os.getenv('LLM_MODEL', 'gpt-4o-mini')
         self.temperature = float(os.getenv('LLM_TEMPERATURE', '0.7'))
         self.max_tokens = int(os.getenv('LLM_MAX_TOKENS', '2000'))
+        self.timeout = float(os.getenv('LLM_TIMEOUT', '30'))  # 每次决策的总时限（秒，含重试）
+        self.retries = int(os.getenv('LLM_RETRIES', '2'))
+        self.pacing = float(os.getenv('AI_PACING', '2'))  # 两个动作之间的间隔（秒）
+        # 计划模式：每回合一次LLM调用给出整个回合的命令，而不是每个动作调用一次
+        self.plan_mode = os.getenv('LLM_PLAN_MODE', '0') == '1'
+        self.plan: List[str] = []
+        self._plan_turn = None
+        self._plan_alerts = frozenset()
+        self.llm_calls = 0  # 实际发出的LLM请求数（不含缓存命中）
+        self.prompt_tokens = 0  # 累计的提示token数
         
-        # 初始化OpenAI客户端
-        self.client = OpenAI(
-            api_key=self.api_key,
-            base_url=self.base_url
-        )
+        # LLM客户端由 llm_client 模块在所有AI玩家之间共用，回复缓存也是共用的
+        self.cache = llm_cache.get_cache()
+        
+        # 对话模式：不重复发送整个对话，每次只发送一条简短的摘要（之前的经过）、上一步的结果和当前状态；
+        # 原样保留最近几轮对话时，基准还在对话里的部分只发送变化
+        self.conversation_mode = os.getenv('LLM_CONVERSATION_MODE', '0') == '1'
+        self.conversation_window = int(os.getenv('LLM_CONVERSATION_WINDOW', '0'))  # 原样保留的最近对话轮数
         
-        # 对话历史
+        # 最近几轮对话（user/assistant消息）
         self.conversation_history = []
+        self._summary = ''
+        self._action_log: List[str] = []  # 已经告诉LLM的动作结果，用来生成摘要
+        self._last_observation: Optional[Dict[str, Any]] = None
+        self._last_entry = None
+        self._since_full_view = 0  # 上次发送完整房间视图之后又发送了几次变化
         
         # 角色系统提示词
         self.system_prompt = self._get_system_prompt()
@@ -105,7 +130,7 @@ class AIPlayer:
     
     def decide_action(self, game_state: Dict[str, Any], available_actions: List[Dict], history: List[Dict] = None) -> Optional[str]:
         """
-        根据游戏状态决定下一步动作
+        根据游戏状态决定下一步动作（同步版本，在共用事件循环上等待 decide_action_async）
         
         Args:
             game_state: 当前游戏状态
@@ -115,13 +140,266 @@ class AIPlayer:
         Returns:
             动作命令字符串，如 "move north" 或 "take lockpick"
         """
-        # 构建当前状态描述
+        return llm_client.run(self.decide_action_async(game_state, available_actions, history))
+    
+    async def decide_action_async(self, game_state: Dict[str, Any], available_actions: List[Dict], history: List[Dict] = None) -> Optional[str]:
+        """异步决定下一步动作：等待LLM期间不占用线程，多局游戏可以在同一个事件循环里同时决策"""
+        if self.plan_mode:
+            return await self._decide_from_plan(game_state, available_actions, history or [])
+        if self.conversation_mode:
+            return await self._decide_in_conversation(game_state, available_actions, history or [])
+        
+        user_message = self._build_user_message(game_state, available_actions, history)
+        try:
+            action = self._parse_action(await self._ask(user_message))
+            print(f"[AI {self.role}] 决定: {action}")
+            return action
+        except Exception as e:
+            print(f"[AI {self.role}] LLM调用失败: {type(e).__name__} {e}")
+            import traceback
+            traceback.print_exc()
+            # 失败时返回安全的默认动作
+            return "look"
+    
+    async def _ask(self, user_message: str, context: List[Dict[str, str]] = ()) -> str:
+        """
+        发送一条用户消息并返回LLM的回复（相同的请求直接用缓存）
+        
+        Args:
+            context: 系统提示词和这条消息之间的对话（对话模式）
+        """
+        messages = [{"role": "system", "content": self.system_prompt}, *context,
+                    {"role": "user", "content": user_message}]
+        
+        cache_key = None
+        if self.cache:
+            request = json.dumps(messages[1:], ensure_ascii=False) if context else user_message
+            cache_key = self.cache.key(self.model, self.temperature, self.role, self.system_prompt, request)
+            content = self.cache.get(cache_key)
+            if content is not None:
+                print(f"[AI {self.role}] 使用缓存的回复")
+                return content
+        
+        print(f"[AI {self.role}] 正在调用LLM: {self.model} @ {self.base_url}")
+        self.llm_calls += 1
+        completion = await llm_client.complete(
+            self.base_url,
+            self.api_key,
+            messages,
+            model=self.model,
+            temperature=self.temperature,
+            max_tokens=self.max_tokens,
+            timeout=self.timeout,
+            retries=self.retries
+        )
+        prompt_tokens = completion.prompt_tokens or sum(llm_client.estimate_tokens(m['content']) for m in messages)
+        self.prompt_tokens += prompt_tokens
+        print(f"[AI {self.role}] tokens: 提示 {prompt_tokens}, 回复 {completion.completion_tokens}, "
+              f"累计提示 {self.prompt_tokens}")
+        if cache_key:
+            self.cache.put(cache_key, completion.text)
+        return completion.text
+    
+    async def _decide_in_conversation(self, game_state: Dict[str, Any], available_actions: List[Dict], history: List[Dict]) -> Optional[str]:
+        """对话模式：只发送系统提示词、摘要（之前的经过）、最近几轮对话和这次的变化，不重复发送整个对话"""
+        previous = self._last_observation
+        self._summary = self._build_summary()
+        user_message = self._build_delta_message(game_state, available_actions, history)
+        context = []
+        if previous is not None:  # 否则这次发送的是完整状态，不需要摘要和之前的对话
+            if self._summary:
+                context.append({"role": "system", "content": self._summary})
+            if self.conversation_window > 0:
+                context.extend(self.conversation_history[-2 * self.conversation_window:])
+        
+        try:
+            content = await self._ask(user_message, context)
+        except Exception as e:
+            print(f"[AI {self.role}] LLM调用失败: {type(e).__name__} {e}")
+            import traceback
+            traceback.print_exc()
+            # LLM没看到这次的变化，下次重新发送完整状态
+            self._last_observation = None
+            return "look"
+        
+        self.conversation_history.append({"role": "user", "content": user_message})
+        self.conversation_history.append({"role": "assistant", "content": content})
+        del self.conversation_history[:max(len(self.conversation_history) - 2 * self.conversation_window, 0)]
+        action = self._parse_action(content)
+        print(f"[AI {self.role}] 决定: {action}")
+        return action
+    
+    def _build_summary(self) -> str:
+        """之前的经过：最近几条动作结果（每次重新生成，长度有上限）"""
+        if not self._action_log:
+            return ''
+        return "之前的经过（摘要）：\n" + '\n'.join(self._action_log[-MAX_SUMMARY_LINES:])
+    
+    def _new_entries(self, history: List[Dict]) -> List[Dict]:
+        """上次决策之后新增的历史记录"""
+        for i in range(len(history) - 1, -1, -1):
+            if history[i] is self._last_entry:
+                return history[i + 1:]
+        return history[-5:]
+    
+    def _build_delta_message(self, game_state: Dict[str, Any], available_actions: List[Dict], history: List[Dict]) -> str:
+        """
+        上一步的结果和当前状态：第一次（或调用失败之后）发送完整状态；
+        上次的房间视图还在保留的对话里时只描述变化，否则简要地重新说明当前状态
+        """
+        ps = game_state.get('player_status', {})
+        view = self._room_view(game_state).split('\n')
+        commands = self._command_labels(available_actions)
+        observation = {
+            'location': ps.get('location'),
+            'ap': ps.get('ap', 0),
+            'max_ap': ps.get('max_ap', 10),
+            'state': ps.get('state'),
+            'inventory': list(ps.get('inventory', [])),
+            'view': view,
+            'commands': commands,
+        }
+        previous = self._last_observation
+        self._last_observation = observation
+        
+        new_entries = self._new_entries(history)
+        self._last_entry = history[-1] if history else None
+        results = []
+        for entry in new_entries:
+            result = entry.get('result', '').split('\n')[0]
+            if len(result) > 100:
+                result = result[:97] + "..."
+            results.append(f"{entry.get('action', '')} → {result}")
+        self._action_log.extend(results)
+        
+        if previous is None:
+            self._since_full_view = 0
+            return self._build_user_message(game_state, available_actions, history)
+        
+        lines = [f"上一步: {r}" for r in results]
+        if self._since_full_view >= self.conversation_window or observation['location'] != previous['location']:
+            # 换了房间，或者上次完整的房间视图已经不在保留的对话里：简要地重新说明当前状态，而不是只给变化
+            self._since_full_view = 0
+            lines.append(f"位置: {observation['location']}  AP: {observation['ap']}/{observation['max_ap']}  "
+                         f"状态: {observation['state']}  背包: {', '.join(observation['inventory']) or '空'}")
+            lines.append("房间视图:")
+            lines.append(self._room_view(game_state))
+            lines.append(f"可用动作: {', '.join(commands)}")
+            lines.append("\n请选择一个动作。只返回动作命令。")
+            return '\n'.join(lines)
+        
+        self._since_full_view += 1
+        if observation['ap'] != previous['ap']:
+            lines.append(f"AP: {previous['ap']} → {observation['ap']}/{observation['max_ap']}")
+        if observation['state'] != previous['state']:
+            lines.append(f"状态: {observation['state']}")
+        if observation['inventory'] != previous['inventory']:
+            lines.append(f"背包: {', '.join(observation['inventory']) or '空'}")
+        
+        before = set(previous['view'])
+        after = set(view)
+        added = [line for line in view if line.strip() and line not in before]
+        removed = [line for line in previous['view'] if line.strip() and line not in after]
+        if added:
+            lines.append("房间里新出现:")
+            lines.extend(added)
+        if removed:
+            lines.append("房间里不再有:")
+            lines.extend(removed)
+        
+        added = [c for c in commands if c not in previous['commands']]
+        removed = [c for c in previous['commands'] if c not in commands]
+        if added:
+            lines.append(f"新增可用动作: {', '.join(added)}")
+        if removed:
+            lines.append(f"不再可用: {', '.join(removed)}")
+        
+        if len(lines) == len(results):
+            lines.append("其他没有变化。")
+        lines.append("\n请选择一个动作。只返回动作命令。")
+        return '\n'.join(lines)
+    
+    @staticmethod
+    def _command_labels(actions: Dict) -> Dict[str, str]:
+        """可用动作的 命令字符串 -> 说明"""
+        labels = {}
+        for a in actions.get('no_target', []):
+            labels[a['name']] = a.get('label', '')
+        for a in actions.get('with_target', []):
+            command = f"{a['name']} {a['target']}"
+            if a.get('extra'):
+                command += f" with {a['extra']}"
+            labels[command] = a.get('label', '')
+        return labels
+    
+    async def _decide_from_plan(self, game_state: Dict[str, Any], available_actions: List[Dict], history: List[Dict]) -> Optional[str]:
+        """计划模式：每回合让LLM一次给出整个回合的命令，按顺序执行，出现意外时才重新规划"""
+        reason = self._replan_reason(game_state, available_actions, history)
+        if reason:
+            print(f"[AI {self.role}] 制定计划: {reason}")
+            user_message = self._build_user_message(game_state, available_actions, history, plan=True)
+            try:
+                content = await self._ask(user_message)
+            except Exception as e:
+                print(f"[AI {self.role}] LLM调用失败: {type(e).__name__} {e}")
+                import traceback
+                traceback.print_exc()
+                self.plan = []
+                return "look"
+            self.plan = self._parse_plan(content)
+            self._plan_turn = game_state.get('turn')
+            self._plan_alerts = self._alerts(game_state)
+            print(f"[AI {self.role}] 计划: {' -> '.join(self.plan)}")
+            if not self.plan:
+                return None
+        
+        action = self.plan.pop(0)
+        print(f"[AI {self.role}] 决定(计划): {action}")
+        return action
+    
+    def _replan_reason(self, game_state: Dict[str, Any], available_actions: List[Dict], history: List[Dict]) -> Optional[str]:
+        """需要重新规划的原因；计划还能继续执行时返回None"""
+        if not self.plan:
+            return "没有计划"
+        if game_state.get('turn') != self._plan_turn:
+            return "新的回合"
+        if history and history[-1].get('ok') is False:
+            return f"上一步没有成功: {history[-1].get('action')}"
+        if self._alerts(game_state) - self._plan_alerts:
+            return "观察到意外情况"
+        if self.plan[0] not in self._command_labels(available_actions):
+            return f"计划中的 {self.plan[0]} 现在不可用"
+        return None
+    
+    @staticmethod
+    def _room_view(game_state: Dict[str, Any]) -> str:
+        """房间视图的文字（状态里是结构化的观测时用 views 渲染）"""
+        if 'observation' in game_state:
+            return views.render_room(game_state['observation'])
+        return game_state.get('room_view', '')
+    
+    @staticmethod
+    def _alerts(game_state: Dict[str, Any]) -> frozenset:
+        """房间视图里关于对手的行（对手出现、醒着）"""
+        return frozenset(line for line in AIPlayer._room_view(game_state).split('\n')
+                         if line.startswith('!') or '在这里' in line)
+    
+    def _build_user_message(self, game_state: Dict[str, Any], available_actions: List[Dict], history: List[Dict] = None,
+                            plan: bool = False) -> str:
+        """构建发给LLM的用户消息（plan=True时要求给出整个回合的命令列表）"""
         state_desc = self._format_game_state(game_state)
         actions_desc = self._format_available_actions(available_actions)
         history_desc = self._format_history(history or [])
         
-        # 构建提示
-        user_message = f"""当前状态：
+        if plan:
+            ap = game_state.get('player_status', {}).get('ap', 0)
+            request = f"""请规划你本回合要执行的全部命令（你还有 {ap} AP）。
+按执行顺序每行写一条命令，不要编号，不要解释；AP用完前想结束回合时以 wait 或 sleep 结尾。
+后面的命令可以使用前面的命令执行后才出现的动作（比如先 open 容器再 take 里面的物品）。"""
+        else:
+            request = "请选择一个动作。只返回动作命令，格式如：move north 或 take lockpick"
+        
+        return f"""当前状态：
 {state_desc}
 
 {history_desc}
@@ -129,40 +407,29 @@ class AIPlayer:
 可用动作：
 {actions_desc}
 
-请选择一个动作。只返回动作命令，格式如：move north 或 take lockpick
+{request}
 """
+    
+    def _parse_action(self, content: str) -> str:
+        """从LLM回复中提取动作命令"""
+        action = content.strip()
         
-        # 调用LLM
-        try:
-            print(f"[AI {self.role}] 正在调用LLM: {self.model} @ {self.base_url}")
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": self.system_prompt},
-                    {"role": "user", "content": user_message}
-                ],
-                temperature=self.temperature,
-                max_tokens=self.max_tokens
-            )
-            
-            action = response.choices[0].message.content.strip()
-            
-            # 清理可能的解释文本，只保留命令
-            if '\n' in action:
-                action = action.split('\n')[0]
-            
-            # 移除可能的引号或markdown代码块
-            action = action.strip('`').strip('"').strip("'")
-            
-            print(f"[AI {self.role}] 决定: {action}")
-            return action
-            
-        except Exception as e:
-            print(f"[AI {self.role}] LLM调用失败: {e}")
-            import traceback
-            traceback.print_exc()
-            # 失败时返回安全的默认动作
-            return "look"
+        # 清理可能的解释文本，只保留命令
+        if '\n' in action:
+            action = action.split('\n')[0]
+        
+        # 移除可能的引号或markdown代码块
+        return action.strip('`').strip('"').strip("'")
+    
+    def _parse_plan(self, content: str) -> List[str]:
+        """从LLM回复中提取命令列表（去掉编号、列表符号和代码块标记）"""
+        plan = []
+        for line in content.split('\n'):
+            line = re.sub(r'^\s*(\d+[.)、]|[-*•→])\s*', '', line.strip())
+            line = line.strip('`').strip('"').strip("'").strip()
+            if line and not line.startswith('```'):
+                plan.append(line)
+        return plan[:MAX_PLAN_LENGTH]
     
     def _format_game_state(self, state: Dict[str, Any]) -> str:
         """格式化游戏状态为可读文本"""
@@ -180,7 +447,7 @@ class AIPlayer:
             lines.append("背包: 空")
         
         lines.append("\n房间视图:")
-        lines.append(state.get('room_view', '无信息'))
+        lines.append(self._room_view(state) or '无信息')
         
         return '\n'.join(lines)
     
@@ -215,11 +482,15 @@ class AIPlayer:
         
         lines = ["你的最近行动历史:"]
         
-        # 只显示自己的行动（过滤掉对手和系统消息）
-        my_actions = [h for h in history if h.get('player') == self.role]
+        # 只显示自己的最近5条行动（过滤掉对手和系统消息），从尾部往前找，不扫描整个列表
+        my_actions = []
+        for entry in reversed(history):
+            if entry.get('player') == self.role:
+                my_actions.append(entry)
+                if len(my_actions) == 5:
+                    break
         
-        # 最多显示最近5条
-        for action in my_actions[-5:]:
+        for action in reversed(my_actions):
             cmd = action.get('action', '')
             result = action.get('result', '')
             # 截断过长的结果
@@ -232,3 +503,10 @@ class AIPlayer:
     def reset(self):
         """重置AI状态"""
         self.conversation_history = []
+        self._summary = ''
+        self._action_log = []
+        self._last_observation = None
+        self._last_entry = None
+        self._since_full_view = 0
+        self.plan = []
+        self._plan_turn = None
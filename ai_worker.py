@@ -0,0 +1,147 @@
+"""
+AI Worker Module - 固定大小的AI工作线程池
+所有游戏的AI回合都在这里执行，不再每个回合新开线程。
+
+任务是普通函数 job() -> 延迟秒数、Future或None：
+返回数字表示"这个回合还没完，过这么久再调用我一次"（AI两个动作之间的间隔），
+返回Future表示"等它完成后再调用我一次"（如正在进行的LLM请求），
+返回None表示任务结束。等待期间不占用工作线程，其他游戏的AI可以照常行动。
+
+同一个游戏的任务按提交顺序逐个执行，不会并发，所以同一局里不会出现两个AI同时行动。
+"""
+
+import heapq
+import itertools
+import threading
+import time
+import traceback
+from collections import deque
+from concurrent.futures import Future
+from typing import Callable, Deque, Dict, List, Optional, Tuple, Union
+
+Job = Callable[[], Union[float, Future, None]]
+
+class AIWorkerPool:
+    def __init__(self, workers: int = 4):
+        """
+        Args:
+            workers: 工作线程数（第一次提交任务时才启动）
+        """
+        self.workers = workers
+        self._cond = threading.Condition()
+        # (到期时间, 序号, 游戏ID)：每个游戏最多一项，对应它队首的任务
+        self._schedule: List[Tuple[float, int, str]] = []
+        self._seq = itertools.count()
+        # 游戏ID -> 等待执行的 (任务, 初始延迟)，队首是正在执行或等待到期的任务
+        self._jobs: Dict[str, Deque[Tuple[Job, float]]] = {}
+        self._threads: List[threading.Thread] = []
+        self._busy = 0
+        self._awaiting = 0
+        self.completed = 0
+        self.failed = 0
+
+    def submit(self, game_id: str, job: Job, delay: float = 0.0):
+        """提交任务；delay是任务轮到执行后再等待的秒数"""
+        with self._cond:
+            if not self._threads:
+                self._start()
+            jobs = self._jobs.setdefault(game_id, deque())
+            jobs.append((job, delay))
+            if len(jobs) == 1:
+                self._push(game_id, delay)
+            self._cond.notify()
+
+    def cancel(self, game_id: str):
+        """丢弃该游戏还没开始的任务（正在执行的任务自己检查取消标志）"""
+        with self._cond:
+            jobs = self._jobs.get(game_id)
+            while jobs and len(jobs) > 1:
+                jobs.pop()
+
+    def pending(self, game_id: str) -> int:
+        """该游戏还没完成的任务数"""
+        with self._cond:
+            return len(self._jobs.get(game_id, ()))
+
+    def metrics(self) -> Dict[str, int]:
+        """
+        队列状态：ready=已到期等待线程的游戏数，waiting=在间隔中等待的游戏数，
+        awaiting=在等待Future（如LLM请求）的游戏数
+        """
+        with self._cond:
+            now = time.monotonic()
+            ready = sum(1 for due, _, _ in self._schedule if due <= now)
+            return {
+                'workers': self.workers,
+                'busy': self._busy,
+                'ready': ready,
+                'waiting': len(self._schedule) - ready,
+                'awaiting': self._awaiting,
+                'games': len(self._jobs),
+                'queued_jobs': sum(len(jobs) for jobs in self._jobs.values()),
+                'completed': self.completed,
+                'failed': self.failed,
+            }
+
+    def _start(self):
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"ai-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _push(self, game_id: str, delay: float):
+        heapq.heappush(self._schedule, (time.monotonic() + delay, next(self._seq), game_id))
+
+    def _next(self) -> Tuple[str, Job]:
+        """取出下一个到期的任务（在锁内调用）"""
+        while True:
+            if self._schedule:
+                wait = self._schedule[0][0] - time.monotonic()
+                if wait <= 0:
+                    _, _, game_id = heapq.heappop(self._schedule)
+                    return game_id, self._jobs[game_id][0][0]
+                self._cond.wait(wait)
+            else:
+                self._cond.wait()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                game_id, job = self._next()
+                self._busy += 1
+
+            failed = False
+            try:
+                result = job()
+            except Exception:
+                traceback.print_exc()
+                result = None
+                failed = True
+
+            with self._cond:
+                self._busy -= 1
+                self.failed += failed
+                jobs = self._jobs[game_id]
+                if isinstance(result, Future):
+                    self._awaiting += 1
+                elif result is not None:
+                    # 回合还没完：同一个任务稍后继续
+                    self._push(game_id, result)
+                else:
+                    jobs.popleft()
+                    self.completed += 1
+                    if jobs:
+                        self._push(game_id, jobs[0][1])
+                    else:
+                        del self._jobs[game_id]
+                self._cond.notify()
+
+            if isinstance(result, Future):
+                result.add_done_callback(lambda _, game_id=game_id: self._resume(game_id))
+
+    def _resume(self, game_id: str):
+        """等待的Future完成后，让同一个任务继续"""
+        with self._cond:
+            self._awaiting -= 1
+            self._push(game_id, 0)
+            self._cond.notify()
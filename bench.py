@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+"""
+性能基准测试
+用法: python -m worldshell.bench [名称...]   （不带参数则运行全部）
+"""
+
+import os
+import sys
+import time
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from worldshell.engine import GameEngine
+from worldshell import llm_client
+from worldshell.world import World, clear_world_cache
+
+WORLD_FILE = os.path.join(os.path.dirname(__file__), "world_definition.yaml")
+
+def _rate(fn, n: int) -> float:
+    """执行n次fn，返回每秒次数"""
+    start = time.perf_counter()
+    for _ in range(n):
+        fn()
+    elapsed = time.perf_counter() - start
+    return n / elapsed if elapsed > 0 else float('inf')
+
+def bench_world(n: int = 2000):
+    """新游戏创建速度：每次解析YAML vs 从模板复制"""
+    print("=== 游戏创建速度 ===")
+
+    def create_uncached():
+        clear_world_cache()
+        GameEngine(WORLD_FILE)
+
+    before = _rate(create_uncached, n // 10)
+    GameEngine(WORLD_FILE)  # 预热模板
+    after = _rate(lambda: GameEngine(WORLD_FILE), n)
+    print(f"  解析YAML:   {before:10.0f} 局/秒")
+    print(f"  模板复制:   {after:10.0f} 局/秒  ({after / before:.1f}x)")
+    print(f"  仅解析World: {_rate(lambda: World(WORLD_FILE), n // 10):9.0f} 次/秒")
+    print()
+
+def bench_snapshot(n: int = 100000):
+    """快照/恢复速度 vs copy.deepcopy"""
+    import copy
+    print("=== 快照与恢复 ===")
+    engine = GameEngine(WORLD_FILE)
+    engine.quiet = True
+    z = engine.players['Z']
+    engine.execute_action(z, "unlock suitcase with key_z")
+    engine.execute_action(z, "open suitcase")
+    snap = engine.snapshot()
+
+    def step():
+        # 搜索中的典型一步：走一步棋再回滚
+        engine.execute_action(z, "take lockpick")
+        engine.restore(snap)
+
+    restore = _rate(lambda: engine.restore(snap), n)
+    deep = _rate(lambda: copy.deepcopy(engine), n // 100)
+    print(f"  restore:            {restore:10.0f} 次/秒  (deepcopy的 {restore / deep:.0f}x)")
+    print(f"  动作+restore:       {_rate(step, n // 2):10.0f} 次/秒")
+    print(f"  snapshot:           {_rate(engine.snapshot, n // 2):10.0f} 次/秒")
+    print(f"  copy.deepcopy:      {deep:10.0f} 次/秒")
+    print()
+
+def _intruder_reply(games: dict):
+    """替身LLM的回复函数：按入侵者脚本回答当前对局（games['current']），各种模式走的棋完全相同"""
+    from worldshell.simulator import policy_intruder, step
+
+    def reply(messages):
+        engine = games['current']['engine']
+        if '请规划' not in messages[-1]['content']:
+            return policy_intruder(engine, engine.players['Z'], engine.rng) or 'wait'
+        sim = GameEngine(engine.world.yaml_path)
+        sim.quiet = True
+        sim.restore(engine.snapshot())
+        plan = []
+        while sim.current_turn == 'Z' and not sim.game_over and len(plan) < 20:
+            command = policy_intruder(sim, sim.players['Z'], sim.rng) or 'wait'
+            plan.append(command)
+            step(sim, command)
+        return '\n'.join(plan)
+    return reply
+
+def _play_scripted(game_id: str, games: dict, **ai_settings):
+    """
+    H睡觉、LLM扮演的Z按脚本行动，完整地玩一局网页对局
+    返回 (每个Z回合的 (LLM请求数, 用时) 列表, 游戏, AI玩家)
+    """
+    import contextlib
+    import io
+    from worldshell import web_server
+
+    web_server.AI_START_DELAY = 0
+    web_server.games.pop(game_id, None)
+    client = web_server.app.test_client()
+    turns = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        client.post('/api/join', json={'role': 'H', 'game_id': game_id, 'use_ai': True})
+        game = games['current'] = web_server.games[game_id]
+        ai = game['ai_players']['Z']
+        ai.pacing, ai.cache = 0, None
+        for name, value in ai_settings.items():
+            setattr(ai, name, value)
+        engine = game['engine']
+
+        command = {'action': 'sleep'}  # H睡觉，Z不受干扰地走完脚本
+        while not engine.game_over:
+            calls, start = ai.llm_calls, time.perf_counter()
+            if command:
+                client.post('/api/action', json=command)
+                command = None
+            else:
+                client.post('/api/end_turn')
+            while engine.current_turn == 'Z' and not engine.game_over:
+                time.sleep(0.002)
+            turns.append((ai.llm_calls - calls, time.perf_counter() - start))
+    return turns, game, ai
+
+def _with_fake_llm(latency: float, games: dict):
+    from worldshell.fake_llm import FakeLLM
+    server = FakeLLM(_intruder_reply(games), delay=latency).start()
+    os.environ['LLM_BASE_URL'] = server.base_url
+    os.environ.setdefault('LLM_API_KEY', 'bench')
+    return server
+
+def bench_plan(latency: float = 0.1):
+    """AI回合的LLM请求数和用时：每个动作调用一次 vs 计划模式（本地替身模拟网络延迟）"""
+    print(f"=== AI回合：逐个动作 vs 计划模式（模拟延迟 {latency * 1000:.0f}ms） ===")
+    games = {}
+    server = _with_fake_llm(latency, games)
+    for plan_mode in (False, True):
+        turns, game, _ = _play_scripted(f"bench_plan_{plan_mode}", games, plan_mode=plan_mode)
+        actions = sum(1 for e in game['history'] if e['player'] == 'Z')
+        name = '计划模式' if plan_mode else '逐个动作'
+        print(f"  {name}: {len(turns)}个回合 {actions}个动作，"
+              f"平均每回合 {sum(c for c, _ in turns) / len(turns):.1f} 次请求、"
+              f"{sum(t for _, t in turns) / len(turns):.2f}s，胜者 {game['engine'].winner}")
+    server.shutdown()
+    print()
+
+def bench_conversation(latency: float = 0.02):
+    """每次决策的提示token：每次发送完整提示 vs 对话模式只发送变化"""
+    print("=== 每次决策的提示token：完整提示 vs 对话模式 ===")
+    games = {}
+    server = _with_fake_llm(latency, games)
+    for conversation_mode in (False, True):
+        _, game, ai = _play_scripted(f"bench_conversation_{conversation_mode}", games,
+                                     conversation_mode=conversation_mode)
+        name = '对话模式' if conversation_mode else '完整提示'
+        requests = server.requests[-ai.llm_calls:]
+        new_tokens = sum(llm_client.estimate_tokens(r['messages'][-1]['content']) for r in requests)
+        largest = max(sum(llm_client.estimate_tokens(m['content']) for m in r['messages']) for r in requests)
+        print(f"  {name}: {ai.llm_calls}次决策，平均每次提示 {ai.prompt_tokens / ai.llm_calls:.0f} tokens"
+              f"（其中新内容 {new_tokens / ai.llm_calls:.0f}，最多 {largest}），胜者 {game['engine'].winner}")
+    server.shutdown()
+    print()
+
+def _play_logged(web_server, game_id: str, seed: int, moves: int):
+    """不经过HTTP，直接用服务器的函数随机走moves步（所有变化都写入事件日志）"""
+    import random
+    from worldshell.simulator import policy_random
+
+    game = web_server.get_or_create_game(game_id)
+    engine = game['engine']
+    engine.quiet = True
+    rng = random.Random(seed)
+    for role in ('H', 'Z'):
+        game['players_joined'].add(role)
+        web_server._log_event(game, {'type': 'join', 'role': role})
+    for _ in range(moves):
+        player = engine.players[engine.current_turn]
+        command = policy_random(engine, player, rng) if player.ap >= 1 else None
+        if command:
+            result = web_server._execute(game, player, command)
+            web_server._add_history(game, {'turn': engine.turn_count, 'player': player.name,
+                                           'action': command, 'result': result})
+        else:
+            web_server._next_turn(game)
+            web_server._add_history(game, {'turn': engine.turn_count, 'player': 'SYSTEM',
+                                           'action': 'turn_change', 'result': ''})
+        is_over, winner = engine.check_victory()
+        if is_over:
+            web_server._finish(game, winner)
+            break
+
+def bench_recovery(n: int = 1000, moves: int = 200):
+    """服务器重启后恢复n局游戏的用时：只重放事件 vs 快照加之后的事件"""
+    import shutil
+    import tempfile
+    from worldshell import web_server
+
+    print(f"=== 重启恢复 {n} 局游戏（每局最多 {moves} 步） ===")
+    for snapshot_every in (10 ** 9, 50):
+        directory = tempfile.mkdtemp()
+        web_server.GAME_LOG_DIR, web_server.GAME_SNAPSHOT_EVERY = directory, snapshot_every
+        web_server.games.clear()
+        start = time.perf_counter()
+        for i in range(n):
+            _play_logged(web_server, f"bench_{i}", i, moves)
+        played = time.perf_counter() - start
+        expected = {game_id: game['engine'].snapshot() for game_id, game in web_server.games.items()}
+        for game in web_server.games.values():
+            game['log'].close()
+        size = sum(os.path.getsize(os.path.join(directory, f)) for f in os.listdir(directory))
+
+        web_server.games.clear()  # 模拟进程崩溃
+        start = time.perf_counter()
+        recovered = web_server.recover_games()
+        elapsed = time.perf_counter() - start
+        assert recovered == n
+        assert all(web_server.games[game_id]['engine'].snapshot() == snap for game_id, snap in expected.items())
+
+        name = f"每{snapshot_every}个事件快照" if snapshot_every < 10 ** 9 else "只有事件日志"
+        print(f"  {name}: 恢复 {elapsed:.2f}s（{elapsed / n * 1000:.2f}ms/局），"
+              f"日志 {size / 1024:.0f}KB，对局时写日志共 {played:.2f}s")
+        for game in web_server.games.values():
+            game['log'].close()
+        web_server.games.clear()
+        shutil.rmtree(directory)
+    web_server.GAME_LOG_DIR = ''
+    print()
+
+def bench_sync():
+    """每次轮询的响应大小：分别请求 /api/state 和 /api/actions（带ETag） vs 增量同步 /api/sync"""
+    import contextlib
+    import io
+    from worldshell import web_server
+    from worldshell.simulator import policy_intruder
+
+    print("=== 每次轮询的响应字节数：state+actions vs 增量同步 ===")
+    game_id = 'bench_sync'
+    web_server.games.pop(game_id, None)
+    web_server.AI_START_DELAY = 0
+    clients = {role: web_server.app.test_client() for role in 'HZ'}
+    etags = {}
+    cursors = {}
+    old, new = [], []
+
+    def poll(role):
+        client = clients[role]
+        total = 0
+        for path in ('/api/state', '/api/actions'):
+            response = client.get(path, headers={'If-None-Match': etags.get((role, path), '')})
+            etags[(role, path)] = response.headers['ETag']
+            total += len(response.data)
+        old.append(total)
+        since = f"?since={cursors[role]}" if role in cursors else ''
+        response = client.get('/api/sync' + since)
+        cursors[role] = response.json['version']
+        new.append(len(response.data))
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        for role in 'HZ':
+            clients[role].post('/api/join', json={'role': role, 'game_id': game_id})
+            poll(role)
+        old.clear()
+        new.clear()
+        engine = web_server.games[game_id]['engine']
+        clients['H'].post('/api/action', json={'action': 'sleep'})
+        while not engine.game_over:
+            player = engine.players[engine.current_turn]
+            command = policy_intruder(engine, player, engine.rng) if player.name == 'Z' else None
+            client = clients[player.name]
+            if command:
+                client.post('/api/actions/batch', json={'commands': [command]})
+            else:
+                client.post('/api/end_turn')
+            for role in 'HZ':
+                poll(role)  # 有变化
+                poll(role)  # 没有变化（轮询间隔内对方没有行动）
+    changed_old, idle_old = old[0::2], old[1::2]
+    changed_new, idle_new = new[0::2], new[1::2]
+    avg = lambda values: sum(values) / len(values)
+    print(f"  {len(changed_old)}次有变化的轮询: state+actions {avg(changed_old):6.0f} 字节，"
+          f"增量 {avg(changed_new):6.0f} 字节（{avg(changed_old) / avg(changed_new):.1f}x）")
+    print(f"  {len(idle_old)}次没有变化的轮询: state+actions {avg(idle_old):6.0f} 字节（304），"
+          f"增量 {avg(idle_new):6.0f} 字节")
+    print(f"  请求数: {len(old) * 2} → {len(new)}")
+    print()
+
+def bench_traces(rounds: int = 2000, n: int = 20000):
+    """长局里房间观测的开销：房间里的痕迹已经看过，之后又留下一条新的"""
+    print("=== 痕迹观测 ===")
+    for duration in ('5_turns', 'permanent'):
+        engine = GameEngine(WORLD_FILE)
+        engine.quiet = True
+        z = engine.players['Z']
+        room = engine.world.get_room(z.location)
+        for _ in range(rounds):
+            # 每一轮都在房间里留下两条痕迹
+            engine._leave_trace(room, 'footprints', "地上有脚印。", duration)
+            engine._leave_trace(room, 'noise', "有东西被碰过。", duration)
+            engine.next_turn()
+            engine.next_turn()
+        engine.mark_traces_seen(z)
+        engine._leave_trace(room, 'scratch', "门锁上有划痕。", duration)
+        unseen = len(engine._observe(z)['traces'])
+        rate = _rate(lambda: engine._observe(z), n)
+        print(f"  {duration:10s} {rounds}轮后房间里 {len(room.traces):5d} 条痕迹（{unseen} 条没看过），"
+              f"观测 {rate:10.0f} 次/秒")
+    print()
+
+BENCHMARKS = {
+    'world': bench_world,
+    'snapshot': bench_snapshot,
+    'plan': bench_plan,
+    'conversation': bench_conversation,
+    'recovery': bench_recovery,
+    'sync': bench_sync,
+    'traces': bench_traces,
+}
+
+def main():
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        if name not in BENCHMARKS:
+            print(f"未知基准: {name}（可选: {', '.join(BENCHMARKS)}）")
+            return 1
+        BENCHMARKS[name]()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,11 +1,51 @@
-from typing import Dict, List, Optional, Tuple
-from worldshell.world import World, GameObject, Room
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+from worldshell import views
+from worldshell.world import World, GameObject, Room, load_world
+from worldshell.trace_rules import parse_duration
 from worldshell.player import Player, PlayerRole, PlayerState
 import random
 
+# 只查询信息、不改变局面的命令
+QUERY_ACTIONS = ('look', 'status', 'inventory')
+
+# 撬锁（pick）需要带在身上的工具
+PICK_TOOL = 'lockpick'
+
+# 房间观测缓存的条数上限（超过时清空）
+OBSERVATION_CACHE_SIZE = 256
+
+class Action(NamedTuple):
+    """一个可执行的动作（不可变，可以安全地缓存和共享）"""
+    name: str
+    label: str
+    ap_cost: int = 0
+    target: str = ''
+    extra: str = ''
+
+    @property
+    def command(self) -> str:
+        """对应的命令字符串，可直接传给 execute_action"""
+        if not self.target:
+            return self.name
+        if self.extra:
+            return f"{self.name} {self.target} with {self.extra}"
+        return f"{self.name} {self.target}"
+
+    def to_dict(self) -> dict:
+        data = {'name': self.name, 'label': self.label, 'ap_cost': self.ap_cost}
+        if self.target:
+            data['target'] = self.target
+        if self.extra:
+            data['extra'] = self.extra
+        return data
+
 class GameEngine:
-    def __init__(self, world_path: str):
-        self.world = World(world_path)
+    def __init__(self, world_path: str, seed: Optional[int] = None):
+        self.world = load_world(world_path)
+        # 随机数发生器（给定seed时整局可复现，如自我对弈模拟）
+        self.rng = random.Random(seed)
+        self.quiet = False  # 为True时不打印系统消息（无界面批量模拟用）
+        self.max_turns = 6  # H坚持到这么多轮即获胜
         self.players: Dict[str, Player] = {
             'H': Player(PlayerRole.HOUSEKEEPER),
             'Z': Player(PlayerRole.INTRUDER)
@@ -15,15 +55,20 @@ class GameEngine:
         self.game_over = False
         self.winner = None
         
+        # 状态版本：每次改变局面都会递增，用于缓存失效
+        self.version = 0
+        self._action_cache: Dict[str, Tuple[int, Tuple[Action, ...]]] = {}
+        # 房间版本：房间里的物品、痕迹可能变化时递增（观察结果的缓存按房间失效）
+        self._room_versions: Dict[str, int] = {}
+        self._observation_cache: Dict[tuple, dict] = {}
+        
         # 初始化玩家位置
         self.players['H'].location = 'bedroom_h'
         self.players['Z'].location = 'bedroom_z'
         
         # Z一开始就持有自己的钥匙（从房间里拿走）
-        z_room = self.world.get_room('bedroom_z')
-        key_z_obj = z_room.get_object('key_z')
-        if key_z_obj:
-            z_room.remove_object(key_z_obj)
+        if self.world.get_object('key_z'):
+            self.world.place_object('key_z', 'player', 'Z')
         self.players['Z'].add_item('key_z')
 
     def get_current_player(self) -> Player:
@@ -42,49 +87,243 @@ class GameEngine:
         # 新回合开始时恢复AP
         next_player = self.players[self.current_turn]
         next_player.restore_ap(5)  # 每回合开始恢复5 AP
+        # 过期的痕迹消失（只有这些房间的观测需要更新）
+        self.bump_version(rooms=self.world.expire_traces(self.turn_count))
+
+    def bump_version(self, rooms: Optional[Iterable[str]] = None):
+        """
+        标记局面已改变。引擎方法会自动调用，直接修改玩家或物品状态后需要手动调用
+
+        Args:
+            rooms: 内容可能变化的房间；不指定表示任何房间都可能变了，空元组表示房间都没变
+        """
+        self.version += 1
+        if rooms is None:
+            self._observation_cache.clear()
+        else:
+            for room_id in rooms:
+                self._room_versions[room_id] = self._room_versions.get(room_id, 0) + 1
+
+    def finish(self, winner: str):
+        """结束游戏"""
+        self.game_over = True
+        self.winner = winner
+        self.bump_version(rooms=())
+
+    # ===== 快照（搜索与回滚） =====
+
+    def snapshot(self) -> tuple:
+        """保存整局的可变状态（不含世界的静态数据），比deepcopy快得多"""
+        return (
+            self.current_turn, self.turn_count, self.game_over, self.winner,
+            self.players['H'].snapshot(), self.players['Z'].snapshot(),
+            self.world.snapshot(),
+        )
+
+    def restore(self, snapshot: tuple):
+        """恢复到snapshot()时的状态"""
+        (self.current_turn, self.turn_count, self.game_over, self.winner,
+         h_state, z_state, world_state) = snapshot
+        self.players['H'].restore(h_state)
+        self.players['Z'].restore(z_state)
+        self.world.restore(world_state)
+        # 版本只增不减，恢复后旧缓存一律失效
+        self.bump_version()
+
+    def export_state(self) -> dict:
+        """把snapshot()转成只含JSON基本类型的数据（写盘、跨进程存储用）"""
+        current_turn, turn_count, game_over, winner, h, z, (objects, locations, rooms) = self.snapshot()
+
+        def player(state: tuple) -> list:
+            ap, location, player_state, inventory, observed, marks = state
+            return [ap, location, player_state.value, list(inventory), sorted(observed), dict(marks)]
+
+        return {
+            'turn': [current_turn, turn_count, game_over, winner],
+            'players': [player(h), player(z)],
+            # 物品和房间按世界定义里的顺序排列（同一个世界文件顺序固定）
+            'objects': list(objects),
+            'locations': {obj_id: list(location) for obj_id, location in locations.items()},
+            'rooms': [[list(object_ids), list(traces.values())] for object_ids, traces in rooms],
+        }
+
+    def import_state(self, state: dict):
+        """从export_state()的结果恢复"""
+        def player(data: list) -> tuple:
+            # 旧存档没有痕迹位置和序号：位置为空时观测会检查房间里的全部痕迹，结果不变
+            ap, location, player_state, inventory, observed, *marks = data
+            marks = tuple(marks[0].items()) if marks else ()
+            return ap, location, PlayerState(player_state), tuple(inventory), frozenset(observed), marks
+
+        h, z = state['players']
+        world_state = (
+            tuple(state['objects']),
+            {obj_id: tuple(location) for obj_id, location in state['locations'].items()},
+            tuple((tuple(object_ids), {trace['id']: dict(trace, seq=trace.get('seq', 0)) for trace in traces})
+                  for object_ids, traces in state['rooms']),
+        )
+        self.restore((*state['turn'], player(h), player(z), world_state))
+
+    # ===== 合法动作 =====
+
+    def legal_actions(self, player: Player) -> Tuple[Action, ...]:
+        """玩家当前可执行的动作。按状态版本缓存，局面没变时直接返回上次的结果"""
+        cached = self._action_cache.get(player.name)
+        if cached and cached[0] == self.version:
+            return cached[1]
+        actions = tuple(self._generate_actions(player))
+        self._action_cache[player.name] = (self.version, actions)
+        return actions
+
+    def _generate_actions(self, player: Player):
+        # 如果玩家在睡眠，只能醒来
+        if player.is_asleep():
+            yield Action('wake', '醒来 (-1 AP)', 1)
+            return
+        
+        # 基础动作
+        yield Action('look', '观察房间')
+        yield Action('status', '查看状态')
+        yield Action('inventory', '查看背包')
+        yield Action('wait', '等待（+3 AP额外, 结束回合）')
+        yield Action('sleep', '睡觉（+8 AP额外, 失去行动能力！）')
+        
+        room = self.world.get_room(player.location)
+        if not room:
+            return
+        
+        # 移动动作
+        for dest_id in room.connections.values():
+            dest_room = self.world.get_room(dest_id)
+            if dest_room:
+                yield Action('move', f'前往 {dest_room.name}', 1, dest_id)
+        
+        # 1. 房间里的物品
+        for obj in room.objects:
+            yield Action('examine', f'检查 {obj.name}', 1, obj.id)
+            
+            if obj.is_portable:
+                yield Action('take', f'拾取 {obj.name}', 1, obj.id)
+            
+            # 打开/关闭
+            if obj.properties.get('can_open'):
+                if obj.state.get('is_open'):
+                    yield Action('close', f'关闭 {obj.name}', 1, obj.id)
+                else:
+                    yield Action('open', f'打开 {obj.name}', 1, obj.id)
+            
+            if obj.is_lockable:
+                if obj.state.get('is_locked'):
+                    # 解锁（用身上的物品尝试）
+                    for item_id in player.inventory:
+                        item_obj = self.world.get_object(item_id)
+                        item_name = item_obj.name if item_obj else item_id
+                        yield Action('unlock', f'用 {item_name} 解锁 {obj.name}', 2, obj.id, item_id)
+                    
+                    # 撬锁（如果有撬锁器）
+                    if player.has_item(PICK_TOOL):
+                        yield Action('pick', f'撬开 {obj.name} (需要撬锁器, 3 AP)', 3, obj.id)
+                else:
+                    yield Action('lock', f'锁上 {obj.name}', 1, obj.id)
+        
+        # 2. 已打开容器内的物品
+        for container, item in self.world.open_container_items(room.id):
+            yield Action('examine', f'检查 {item.name} (在{container.name}中)', 1, item.id)
+            if item.is_portable:
+                yield Action('take', f'拾取 {item.name} (从{container.name})', 1, item.id)
 
     # ===== 观测系统 (The "Cat Box" Logic) =====
     
     def observe_room(self, player: Player) -> str:
-        """玩家观察当前房间（核心：信息过滤）"""
+        """玩家真正地观察当前房间：返回看到的内容（文字），并把房间里的痕迹标记为已看到"""
+        return views.render_room(self.look(player))
+
+    def look(self, player: Player) -> dict:
+        """和 observe_room 相同，但返回结构化的观测"""
+        observation = self.observe(player)
+        self.mark_traces_seen(player)
+        return observation
+
+    def mark_traces_seen(self, player: Player) -> List[str]:
+        """把玩家所在房间的痕迹标记为已看到，返回新看到的痕迹ID"""
         room = self.world.get_room(player.location)
         if not room:
-            return "你无处可去。"
-        
-        lines = [f"=== {room.name} ===", room.description, ""]
+            return []
+        new = [trace['id'] for trace in self._unseen_traces(player, room)]
+        player.observed_traces.update(new)
+        # 房间里现有的痕迹都看过了，下次只需要检查之后留下的
+        player.trace_marks[room.id] = self.world.trace_seq
+        return new
+
+    def _unseen_traces(self, player: Player, room: Room) -> List[dict]:
+        """
+        房间里玩家没看过的痕迹（按留下的顺序）。痕迹按序号递增排列，从最新的往回找，
+        碰到上次在这个房间看过的位置就停下，已经看过的痕迹不再逐条检查
+        """
+        mark = player.trace_marks.get(room.id, 0)
+        unseen = []
+        for trace in reversed(room.traces.values()):
+            if trace['seq'] < mark:
+                break
+            # 同ID的痕迹可能在别的房间看到过
+            if trace['id'] not in player.observed_traces:
+                unseen.append(trace)
+        unseen.reverse()
+        return unseen
+
+    def render_room(self, player: Player) -> str:
+        """玩家当前房间的文字描述（不改变状态）"""
+        return views.render_room(self.observe(player))
+
+    def observe(self, player: Player) -> dict:
+        """
+        玩家当前房间的结构化观测（核心：信息过滤，格式见 views 模块）。不改变任何状态，没看过的痕迹每次都会列出；
+        结果按 (玩家, 房间, 房间版本, 对手是否在场/醒着, 已看到的痕迹数) 缓存，同一个版本返回同一个对象，调用方不能修改
+        """
+        opponent = self.get_opponent(player)
+        present = opponent.location == player.location
+        key = (player.name, player.location, self._room_versions.get(player.location, 0),
+               present and opponent.is_asleep(), present, len(player.observed_traces))
+        observation = self._observation_cache.get(key)
+        if observation is None:
+            if len(self._observation_cache) >= OBSERVATION_CACHE_SIZE:
+                self._observation_cache.clear()
+            observation = self._observation_cache[key] = self._observe(player)
+        return observation
+
+    def _observe(self, player: Player) -> dict:
+        room = self.world.get_room(player.location)
+        if not room:
+            return {'room': None, 'opponent': None, 'objects': [], 'traces': [], 'exits': []}
         
         # 1. 检查对手是否在同一房间
         opponent = self.get_opponent(player)
+        presence = None
         if opponent.location == player.location:
-            if not opponent.is_asleep():
-                lines.append(f"! {opponent.name} 在这里，而且醒着！")
-            else:
-                lines.append(f"{opponent.name} 在这里睡觉。")
-        
-        # 2. 列出可见的物品（粗粒度）
-        visible_objects = [obj for obj in room.objects if not obj.is_portable or obj.id not in opponent.inventory]
-        if visible_objects:
-            lines.append("你看到：")
-            for obj in visible_objects:
-                lines.append(f"  - {obj.describe()}")
-        
-        # 3. 显示痕迹（模糊信息）
-        if room.traces:
-            lines.append("\n你注意到一些异常：")
-            for trace in room.traces:
-                if trace['id'] not in player.observed_traces:
-                    lines.append(f"  - {trace['description']}")
-                    player.observed_traces.add(trace['id'])
-        
-        # 4. 显示连接的房间
-        if room.connections:
-            lines.append("\n可前往：")
-            for dest_id in room.connections.values():
-                dest_room = self.world.get_room(dest_id)
-                if dest_room:
-                    lines.append(f"  - {dest_room.name} ({dest_id})")
-        
-        return '\n'.join(lines)
+            presence = {'name': opponent.name, 'awake': not opponent.is_asleep()}
+        
+        # 2. 可见的物品（粗粒度）
+        objects = [obj.view() for obj in room.objects
+                   if not obj.is_portable or obj.id not in opponent.inventory]
+        
+        # 3. 痕迹（模糊信息）
+        traces = [{'id': trace['id'], 'description': trace['description']}
+                  for trace in self._unseen_traces(player, room)]
+        
+        # 4. 连接的房间
+        exits = []
+        for dest_id in room.connections.values():
+            dest_room = self.world.get_room(dest_id)
+            if dest_room:
+                exits.append({'id': dest_id, 'name': dest_room.name})
+        
+        return {
+            'room': {'id': room.id, 'name': room.name, 'description': room.description},
+            'opponent': presence,
+            'objects': objects,
+            'traces': traces,
+            'exits': exits
+        }
 
     def observe_object(self, player: Player, obj_id: str) -> str:
         """仔细检查物品（examine）- 可以发现更多细节"""
@@ -97,52 +336,46 @@ class GameEngine:
             return f"没有这个物品：{obj_id}"
         
         # 检查物品是否可访问：在房间里、在玩家身上、或在已打开的容器里
-        room = self.world.get_room(player.location)
-        accessible = False
-        
-        # 1. 在房间里
-        if obj in room.objects:
-            accessible = True
-        # 2. 在玩家身上
-        elif player.has_item(obj_id):
-            accessible = True
-        # 3. 在已打开的容器里
-        else:
-            for container in room.objects:
-                if container.is_container and container.state.get('is_open'):
-                    if obj_id in container.state.get('contains', []):
-                        accessible = True
-                        break
-        
-        if not accessible:
+        if not self.world.is_accessible(obj_id, player):
             return f"你在这里看不到 {obj.name}。"
         
-        # 直接使用describe()作为第一行，不重复名称
-        lines = [obj.describe()]
-        
-        # 如果是容器，显示内容物
-        if obj.is_container:
-            if obj.state.get('is_locked'):
-                lines.append("它被锁住了。")
-            elif not obj.state.get('is_open'):
-                lines.append("它是关着的。")
-            elif obj.is_opaque and obj.state.get('is_open'):
-                contains = obj.state.get('contains', [])
-                if contains:
-                    lines.append("里面有：")
-                    for item_id in contains:
-                        item = self.world.get_object(item_id)
-                        if item:
-                            lines.append(f"  - {item.name}")
-                else:
-                    lines.append("里面是空的。")
-        
-        return '\n'.join(lines)
+        return views.render_object(self.examine(obj))
+
+    def examine(self, obj: GameObject) -> dict:
+        """物品的详细视图：打开的不透明容器还列出内容物"""
+        view = obj.view()
+        if obj.is_container and obj.is_opaque and obj.state.get('is_open') and not obj.state.get('is_locked'):
+            view['contents'] = [{'id': item.id, 'name': item.name}
+                                for item in map(self.world.get_object, obj.state.get('contains', [])) if item]
+        return view
 
     # ===== 动作系统 =====
 
     def execute_action(self, player: Player, command: str) -> str:
         """解析并执行玩家命令"""
+        location = player.location
+        result = self._dispatch_command(player, command)
+        # 动作会改变玩家所在的房间（移动时是出发和到达的两个房间）和目标物品所在的房间：
+        # open/close/lock/unlock/pick 不检查物品在哪里，可能改变其他房间
+        rooms = [location, player.location]
+        parts = command.lower().split()
+        if len(parts) > 1:
+            rooms.append(self._object_room(parts[1]))
+        self.bump_version(rooms=[room_id for room_id in rooms if room_id])
+        return result
+
+    def _object_room(self, obj_id: str) -> Optional[str]:
+        """物品所在的房间：在容器里时是容器所在的房间，在玩家身上时是玩家所在的房间"""
+        location = self.world.locate(obj_id)
+        while location and location[0] == 'container':
+            location = self.world.locate(location[1])
+        if not location:
+            return None
+        if location[0] == 'player':
+            return self.players[location[1]].location
+        return location[1]
+
+    def _dispatch_command(self, player: Player, command: str) -> str:
         parts = command.lower().strip().split()
         if not parts:
             return "请输入命令。"
@@ -258,6 +491,8 @@ class GameEngine:
         # 产生噪音（脚步声）
         noise = 1 if player.stealth > 0 else 2
         self._process_noise(player, "footsteps", noise)
+        # 痕迹留在出发的房间（如湿脚印）
+        self._apply_trace_rules('move', player, room, origin=room.name, dest=dest_room.name)
         
         return f"你移动到了{dest_room.name}。\n\n{self.observe_room(player)}"
 
@@ -267,39 +502,21 @@ class GameEngine:
             return "AP不足。"
         
         room = self.world.get_room(player.location)
-        obj = None
-        parent_container = None
         
-        # 1. 先在房间里找
-        obj = room.get_object(obj_id)
-        
-        # 2. 如果房间里没有，检查打开的容器
-        if not obj:
-            for container in room.objects:
-                if container.is_container and container.state.get('is_open'):
-                    contains = container.state.get('contains', [])
-                    if obj_id in contains:
-                        obj = self.world.get_object(obj_id)
-                        parent_container = container
-                        break
-        
-        if not obj:
+        # 物品必须在房间里或房间中打开的容器里
+        if not self.world.is_reachable(obj_id, player.location):
             return f"这里没有'{obj_id}'。"
+        obj = self.world.get_object(obj_id)
         
         if not obj.is_portable:
             return f"你不能拿走{obj.name}。"
         
+        # 从房间或容器中移到玩家身上
+        self.world.place_object(obj.id, 'player', player.name)
         player.add_item(obj.id)
         
-        # 从房间或容器中移除
-        if parent_container:
-            parent_container.state['contains'].remove(obj.id)
-        else:
-            room.remove_object(obj)
-        
-        # 留下痕迹（如果物品重要）
-        if obj.properties.get('is_objective'):
-            self._leave_trace(room, 'item_taken', f"这里有一个模糊的灰尘轮廓，似乎曾经放着什么东西。")
+        # 按痕迹规则留下痕迹（如重要物品的灰尘轮廓）
+        self._apply_trace_rules('take', player, room, obj)
         
         return f"你拿起了{obj.name}。"
 
@@ -322,6 +539,7 @@ class GameEngine:
             return f"{obj.name}已经是打开的了。"
         
         obj.state['is_open'] = True
+        self.world.noise.door_changed(obj.id)
         noise = 2  # 开门声音
         self._process_noise(player, f"opening {obj.name}", noise)
         
@@ -337,6 +555,7 @@ class GameEngine:
             return f"你不能关闭那个。"
         
         obj.state['is_open'] = False
+        self.world.noise.door_changed(obj.id)
         return f"你关闭了{obj.name}。"
 
     def action_unlock(self, player: Player, obj_id: str, key_id: str) -> str:
@@ -380,7 +599,7 @@ class GameEngine:
             return "AP不足。（撬锁需要3 AP）"
         
         # 检查是否有撬锁器
-        if not player.has_item('lockpick'):
+        if not player.has_item(PICK_TOOL):
             return "你需要撬锁器才能这样做。"
         
         obj = self.world.get_object(obj_id)
@@ -393,13 +612,8 @@ class GameEngine:
         # 撬锁成功
         obj.state['is_locked'] = False
         
-        # 产生噪音（撬锁很吵）
-        room = self.world.get_room(player.location)
-        self._process_noise(player, f"picking lock on {obj.name}", 5)
-        
-        # 留下痕迹
-        if room:
-            self._leave_trace(room, 'scratch_marks', f"{obj.name}的锁芯上有新鲜的划痕。")
+        # 按痕迹规则产生噪音（撬锁很吵）、留下划痕
+        self._apply_trace_rules('pick_lock', player, self.world.get_room(player.location), obj)
         
         return f"你用撬锁器撬开了{obj.name}。\n[噪音很大！可能会惊醒附近的人]"
 
@@ -412,33 +626,53 @@ class GameEngine:
         if not opponent.is_asleep():
             return  # 对手醒着，无需处理
         
-        # 计算距离（简单实现：同房间=0，相邻=1，其他=2+）
-        distance = self._calculate_distance(actor.location, opponent.location)
+        # 噪音衰减：按房间图上的最短路径，关着的门会额外阻挡声音
+        attenuation = self.world.noise.attenuation(actor.location, opponent.location)
+        if attenuation is None:
+            return  # 不连通，听不到
         
-        if opponent.can_hear(noise_level, distance):
+        if opponent.can_hear(noise_level, attenuation=attenuation):
             opponent.wake_up()
             # 这里可以添加通知机制，但在轮流制游戏中，对手下回合会看到
-            print(f"\n[SYSTEM] {opponent.name} was awakened by noise!")
+            if not self.quiet:
+                print(f"\n[SYSTEM] {opponent.name} was awakened by noise!")
 
-    def _calculate_distance(self, loc1: str, loc2: str) -> int:
-        """简单的距离计算"""
-        if loc1 == loc2:
-            return 0
-        
-        room1 = self.world.get_room(loc1)
-        if room1 and loc2 in room1.connections.values():
-            return 1
-        
-        return 2  # 简化：其他情况都是远距离
+    def _apply_trace_rules(self, action: str, player: Player, room: Optional[Room],
+                           target: Optional[GameObject] = None, **params: str):
+        """
+        按世界定义里的痕迹规则（world.trace_index）产生噪音、留下痕迹
+
+        Args:
+            room: 留下痕迹的房间
+            target: 动作的目标物品（决定适用哪些规则）
+            params: 描述模板里的参数；target 默认为目标物品的名称
+        """
+        rules = self.world.trace_index.lookup(action, target.type if target else None)
+        if not rules:
+            return
+        if target is not None:
+            params.setdefault('target', target.name)
+        for rule in rules:
+            if not rule.applies(player, target):
+                continue
+            if rule.noise_level:
+                self._process_noise(player, f"{action} {params.get('target', '')}".strip(), rule.noise_level)
+            if rule.trace_id and room:
+                self._leave_trace(room, rule.trace_id, rule.describe(params), rule.duration)
 
-    def _leave_trace(self, room: Room, trace_id: str, description: str, duration: int = 999):
-        """在房间留下痕迹"""
-        trace = {
+    def _leave_trace(self, room: Room, trace_id: str, description: str, duration='permanent'):
+        """
+        在房间留下痕迹
+
+        Args:
+            duration: 持续的回合数，或 "5_turns"、"permanent" 这样的写法（见 trace_rules.parse_duration）
+        """
+        turns = parse_duration(duration)
+        self.world.leave_trace(room.id, {
             'id': f"{trace_id}_{self.turn_count}",
             'description': description,
-            'expires_at': self.turn_count + duration
-        }
-        room.traces.append(trace)
+            'expires_at': None if turns is None else self.turn_count + turns
+        })
 
     def check_victory(self) -> Tuple[bool, Optional[str]]:
         """检查胜利条件"""
@@ -457,7 +691,7 @@ class GameEngine:
         
         # H获胜：坚持到一定回合数
         # 理论上Z最快2回合能完成，给6回合允许一定的战术空间
-        if self.turn_count >= 6:
+        if self.turn_count >= self.max_turns:
             return True, 'H'
         
         return False, None
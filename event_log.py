@@ -0,0 +1,143 @@
+"""
+Event Log Module - 每局游戏的追加式事件日志和快照
+每个执行的命令、回合切换、历史记录都追加到 <目录>/<游戏ID>.events（每行一个JSON事件），
+每隔一定数量的事件把整局状态写成 <目录>/<游戏ID>.snapshot，然后清空事件日志。
+服务器重启时读取最新的快照，只重放快照之后的事件即可恢复所有进行中的游戏。
+
+写入方式（sync）：
+    'fsync'  每个事件都写到磁盘（断电也不丢，最慢）
+    'flush'  每个事件都交给操作系统（进程崩溃不丢，默认）
+    'buffer' 在进程内缓冲，写快照或关闭时才写出（最快，崩溃时会丢最近的事件）
+"""
+
+import json
+import os
+import threading
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import quote, unquote
+
+SYNC_MODES = ('fsync', 'flush', 'buffer')
+
+EVENTS_SUFFIX = '.events'
+SNAPSHOT_SUFFIX = '.snapshot'
+
+def _dumps(data: Any) -> str:
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':'))
+
+class EventLog:
+    def __init__(self, directory: str, game_id: str, sync: str = 'flush', seq: int = 0):
+        """
+        Args:
+            directory: 日志目录（不存在时自动创建）
+            game_id: 游戏ID（文件名中会转义）
+            sync: 写入方式，见模块说明
+            seq: 已有的最后一个事件序号（恢复游戏后继续写时使用）
+        """
+        if sync not in SYNC_MODES:
+            raise ValueError(f"未知的写入方式: {sync}")
+        os.makedirs(directory, exist_ok=True)
+        self.game_id = game_id
+        self.sync = sync
+        self.seq = seq
+        self.since_snapshot = 0  # 上次快照之后的事件数
+        base = os.path.join(directory, quote(game_id, safe=''))
+        self.events_path = base + EVENTS_SUFFIX
+        self.snapshot_path = base + SNAPSHOT_SUFFIX
+        self._lock = threading.Lock()
+        self._file = open(self.events_path, 'a', encoding='utf-8')
+
+    def append(self, event: Dict[str, Any]) -> int:
+        """追加一个事件，返回它的序号"""
+        with self._lock:
+            if self._file.closed:
+                return self.seq  # 游戏已被删除
+            self.seq += 1
+            self.since_snapshot += 1
+            self._file.write(_dumps({'seq': self.seq, **event}) + '\n')
+            if self.sync != 'buffer':
+                self._file.flush()
+                if self.sync == 'fsync':
+                    os.fsync(self._file.fileno())
+            return self.seq
+
+    def write_snapshot(self, state: Dict[str, Any]):
+        """写入整局状态的快照（包含到当前序号为止的所有事件），然后清空事件日志"""
+        with self._lock:
+            if self._file.closed:
+                return
+            tmp = self.snapshot_path + '.tmp'
+            with open(tmp, 'w', encoding='utf-8') as f:
+                f.write(_dumps({'seq': self.seq, 'state': state}))
+                f.flush()
+                if self.sync == 'fsync':
+                    os.fsync(f.fileno())
+            os.replace(tmp, self.snapshot_path)
+            # 在这里崩溃也没关系：恢复时会跳过序号不大于快照的事件
+            self._file.close()
+            self._file = open(self.events_path, 'w', encoding='utf-8')
+            self.since_snapshot = 0
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+    def delete(self):
+        """关闭并删除这局游戏的日志和快照"""
+        self.close()
+        _remove_files(self.events_path, self.snapshot_path)
+
+def _remove_files(*paths: str):
+    for path in paths:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+def remove(directory: str, game_id: str):
+    """删除一局游戏的日志和快照（游戏不在内存里时使用）"""
+    base = os.path.join(directory, quote(game_id, safe=''))
+    _remove_files(base + EVENTS_SUFFIX, base + SNAPSHOT_SUFFIX)
+
+def load(directory: str, game_id: str) -> Tuple[Optional[Dict[str, Any]], List[Dict[str, Any]], int]:
+    """
+    读取一局游戏的最新快照和之后的事件
+
+    Returns:
+        (快照中的状态或None, 快照之后的事件列表, 最后一个事件的序号)
+    """
+    base = os.path.join(directory, quote(game_id, safe=''))
+    state, seq = None, 0
+    try:
+        with open(base + SNAPSHOT_SUFFIX, 'r', encoding='utf-8') as f:
+            snapshot = json.load(f)
+        state, seq = snapshot['state'], snapshot['seq']
+    except FileNotFoundError:
+        pass
+
+    events = []
+    try:
+        with open(base + EVENTS_SUFFIX, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    break  # 崩溃时只写了一半的最后一行
+                if event['seq'] > seq:
+                    events.append(event)
+                    seq = event['seq']
+    except FileNotFoundError:
+        pass
+    return state, events, seq
+
+def game_ids(directory: str) -> Iterator[str]:
+    """目录里有日志或快照的所有游戏ID"""
+    if not os.path.isdir(directory):
+        return
+    seen = set()
+    for name in sorted(os.listdir(directory)):
+        for suffix in (EVENTS_SUFFIX, SNAPSHOT_SUFFIX):
+            if name.endswith(suffix):
+                game_id = unquote(name[:-len(suffix)])
+                if game_id not in seen:
+                    seen.add(game_id)
+                    yield game_id
@@ -0,0 +1,88 @@
+"""
+本地的OpenAI兼容接口替身（测试和基准测试用），不需要网络和API密钥。
+
+用法:
+    server = FakeLLM(reply='look', delay=0.1).start()
+    os.environ['LLM_BASE_URL'] = server.base_url   # 之后创建的AIPlayer会连到它
+    ...
+    server.shutdown()
+
+reply 可以是固定字符串，也可以是函数 reply(messages) -> str，按请求内容动态回复。
+"""
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Union
+
+from worldshell.llm_client import estimate_tokens
+
+Reply = Union[str, Callable[[List[Dict[str, str]]], str]]
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 64  # 默认的5在并发请求较多时会丢连接
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        fake: 'FakeLLM' = self.server.fake
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        with fake.lock:
+            fake.requests.append(body)
+            count = len(fake.requests)
+        time.sleep(fake.delay)
+
+        if count <= fake.fail_first:
+            self._send(500, {'error': {'message': 'overloaded', 'type': 'server_error'}})
+            return
+        content = fake.reply(body['messages']) if callable(fake.reply) else fake.reply
+        prompt_tokens = sum(estimate_tokens(m['content']) for m in body['messages'])
+        completion_tokens = estimate_tokens(content)
+        self._send(200, {
+            'id': f'fake-{count}', 'object': 'chat.completion', 'created': 0, 'model': body['model'],
+            'choices': [{'index': 0, 'finish_reason': 'stop',
+                         'message': {'role': 'assistant', 'content': content}}],
+            'usage': {'prompt_tokens': prompt_tokens, 'completion_tokens': completion_tokens,
+                      'total_tokens': prompt_tokens + completion_tokens}
+        })
+
+    def _send(self, status: int, payload: dict):
+        data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+class FakeLLM:
+    def __init__(self, reply: Reply = 'look', delay: float = 0.0, fail_first: int = 0):
+        """
+        Args:
+            reply: 回复内容或生成回复的函数
+            delay: 每个请求的模拟延迟（秒）
+            fail_first: 前几个请求返回500错误
+        """
+        self.reply = reply
+        self.delay = delay
+        self.fail_first = fail_first
+        self.requests: List[dict] = []
+        self.lock = threading.Lock()
+        self._server = None
+
+    def start(self) -> 'FakeLLM':
+        self._server = _Server(('127.0.0.1', 0), _Handler)
+        self._server.fake = self
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_port}/v1"
+
+    def shutdown(self):
+        self._server.shutdown()
+        self._server.server_close()
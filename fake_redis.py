@@ -0,0 +1,123 @@
+"""
+本地的Redis协议替身（测试用），只实现 session_store.RedisStore 用到的命令：
+PING SELECT GET SET GETRANGE DEL KEYS WATCH UNWATCH MULTI EXEC
+
+用法:
+    server = FakeRedis().start()
+    store = RedisStore('127.0.0.1', server.port)
+    ...
+    server.shutdown()
+"""
+
+import fnmatch
+import socketserver
+import threading
+from typing import Any, Dict, List, Optional
+
+class _Server(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+    request_queue_size = 64
+
+def _encode(value: Any) -> bytes:
+    if value is None:
+        return b'$-1\r\n'
+    if isinstance(value, Exception):
+        return b'-ERR %s\r\n' % str(value).encode('utf-8')
+    if isinstance(value, str):
+        return b'+%s\r\n' % value.encode('utf-8')
+    if isinstance(value, int):
+        return b':%d\r\n' % value
+    if isinstance(value, bytes):
+        return b'$%d\r\n%s\r\n' % (len(value), value)
+    return b'*%d\r\n' % len(value) + b''.join(_encode(item) for item in value)
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        fake: 'FakeRedis' = self.server.fake
+        watched: Dict[bytes, int] = {}  # 键 -> WATCH时的修改次数
+        queued: Optional[List[List[bytes]]] = None  # MULTI之后排队的命令
+        while True:
+            args = self._read_command()
+            if args is None:
+                return
+            name = args[0].upper()
+            if name == b'MULTI':
+                queued, reply = [], 'OK'
+            elif name == b'EXEC':
+                with fake.lock:
+                    changed = any(fake.revisions.get(key, 0) != rev for key, rev in watched.items())
+                    reply = None if changed else [fake.execute(command) for command in queued or []]
+                queued, watched = None, {}
+            elif queued is not None:
+                queued.append(args)
+                reply = 'QUEUED'
+            elif name == b'WATCH':
+                with fake.lock:
+                    for key in args[1:]:
+                        watched[key] = fake.revisions.get(key, 0)
+                reply = 'OK'
+            elif name == b'UNWATCH':
+                watched, reply = {}, 'OK'
+            else:
+                with fake.lock:
+                    reply = fake.execute(args)
+            self.wfile.write(_encode(reply))
+
+    def _read_command(self) -> Optional[List[bytes]]:
+        line = self.rfile.readline()
+        if not line:
+            return None
+        args = []
+        for _ in range(int(line[1:-2])):
+            size = int(self.rfile.readline()[1:-2])
+            args.append(self.rfile.read(size + 2)[:-2])
+        return args
+
+class FakeRedis:
+    def __init__(self):
+        self.data: Dict[bytes, bytes] = {}
+        self.revisions: Dict[bytes, int] = {}  # 每个键被修改的次数（WATCH用）
+        self.lock = threading.Lock()
+        self._server = None
+
+    def execute(self, args: List[bytes]) -> Any:
+        """执行一条普通命令（调用方持有锁）"""
+        name, args = args[0].upper(), args[1:]
+        if name in (b'PING', b'SELECT'):
+            return 'PONG' if name == b'PING' else 'OK'
+        if name == b'GET':
+            return self.data.get(args[0])
+        if name == b'GETRANGE':
+            value = self.data.get(args[0], b'')
+            end = int(args[2])
+            return value[int(args[1]):None if end == -1 else end + 1]
+        if name == b'SET':
+            self.data[args[0]] = args[1]
+            self.revisions[args[0]] = self.revisions.get(args[0], 0) + 1
+            return 'OK'
+        if name == b'DEL':
+            count = 0
+            for key in args:
+                if self.data.pop(key, None) is not None:
+                    self.revisions[key] = self.revisions.get(key, 0) + 1
+                    count += 1
+            return count
+        if name == b'KEYS':
+            pattern = args[0].decode('utf-8')
+            return [key for key in self.data if fnmatch.fnmatchcase(key.decode('utf-8'), pattern)]
+        return ValueError(f"unknown command '{name.decode('utf-8')}'")
+
+    def start(self) -> 'FakeRedis':
+        self._server = _Server(('127.0.0.1', 0), _Handler)
+        self._server.fake = self
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    @property
+    def port(self) -> int:
+        return self._server.server_address[1]
+
+    def shutdown(self):
+        self._server.shutdown()
+        self._server.server_close()
@@ -0,0 +1,37 @@
+"""
+估算对象占用的内存
+从根对象出发沿 gc.get_referents 遍历所有可达对象，把 sys.getsizeof 加起来。
+类型、模块和函数不计入（它们是所有游戏共用的），也可以排除其他共用的对象
+（如世界模板、LLM回复缓存），结果是一局游戏"自己的"内存的近似值。
+"""
+
+import gc
+import sys
+import types
+from typing import Iterable, Set
+
+# 不计入也不继续遍历的类型
+_SKIP_TYPES = (type, types.ModuleType, types.FunctionType, types.BuiltinFunctionType,
+               types.MethodType, types.CodeType)
+
+def reachable_ids(*roots) -> Set[int]:
+    """从roots可达的所有对象的id（作为 deep_sizeof 的 exclude，排除共用的对象）"""
+    seen: Set[int] = set()
+    _walk(roots, seen)
+    return seen
+
+def deep_sizeof(root, exclude: Iterable[int] = ()) -> int:
+    """root及其可达对象的总大小（字节），exclude中的对象及只能经过它们到达的对象不计入"""
+    return _walk([root], set(exclude))
+
+def _walk(roots, seen: Set[int]) -> int:
+    total = 0
+    stack = list(roots)
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen or isinstance(obj, _SKIP_TYPES):
+            continue
+        seen.add(id(obj))
+        total += sys.getsizeof(obj)
+        stack.extend(gc.get_referents(obj))
+    return total
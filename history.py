@@ -0,0 +1,47 @@
+"""
+游戏历史记录
+整体只保留最近 capacity 条，另外每个玩家（H/Z/SYSTEM）各有一个最近 per_player 条的环形缓冲，
+所以"某个玩家最近N条"不需要扫描整局的记录，一局游戏占用的内存也不会随时长增长。
+"""
+
+from collections import deque
+from itertools import islice
+from typing import Deque, Dict, Iterator, List, Optional
+
+class GameHistory:
+    def __init__(self, capacity: int = 200, per_player: int = 20):
+        """
+        Args:
+            capacity: 整体保留的条数
+            per_player: 每个玩家单独保留的条数
+        """
+        self.per_player = per_player
+        self._entries: Deque[dict] = deque(maxlen=capacity)
+        self._by_player: Dict[str, Deque[dict]] = {}
+        self.total = 0  # 一共记录过多少条（包括已经丢弃的）
+
+    def append(self, entry: dict):
+        self._entries.append(entry)
+        player = entry.get('player')
+        buffer = self._by_player.get(player)
+        if buffer is None:
+            buffer = self._by_player[player] = deque(maxlen=self.per_player)
+        buffer.append(entry)
+        self.total += 1
+
+    def recent(self, n: int, player: Optional[str] = None) -> List[dict]:
+        """最近n条记录（按时间顺序）；指定player时只看该玩家的记录，最多 per_player 条"""
+        buffer = self._entries if player is None else self._by_player.get(player, ())
+        # 从尾部倒着取，复杂度只和n有关
+        entries = list(islice(reversed(buffer), n))
+        entries.reverse()
+        return entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __iter__(self) -> Iterator[dict]:
+        return iter(self._entries)
+
+    def __getitem__(self, index: int) -> dict:
+        return self._entries[index]
@@ -0,0 +1,123 @@
+"""
+LLM Cache Module - LLM回复缓存
+按 (模型, 温度, 角色, 系统提示词, 用户消息) 的哈希缓存回复：内存里是LRU，
+可选地再写到磁盘目录（每条一个JSON文件），重启后仍然命中，录下的对局可以离线重放。
+
+配置（环境变量）：
+    LLM_CACHE_SIZE  内存里最多保留的条数，0表示不缓存（默认256）
+    LLM_CACHE_DIR   磁盘缓存目录，不设置则只用内存
+"""
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+
+class ResponseCache:
+    def __init__(self, capacity: int = 256, path: Optional[str] = None):
+        """
+        Args:
+            capacity: 内存LRU的容量
+            path: 磁盘缓存目录（可选，不存在时自动创建）
+        """
+        self.capacity = capacity
+        self.path = path
+        self._memory: 'OrderedDict[str, str]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        if path:
+            os.makedirs(path, exist_ok=True)
+
+    @staticmethod
+    def key(model: str, temperature: float, role: str, system_prompt: str, user_message: str) -> str:
+        """缓存键：请求内容的SHA-256"""
+        raw = json.dumps([model, temperature, role, system_prompt, user_message], ensure_ascii=False)
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """查找回复，没有时返回None"""
+        with self._lock:
+            response = self._memory.get(key)
+            if response is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return response
+
+        response = self._read_disk(key)
+        with self._lock:
+            if response is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.disk_hits += 1
+            self._remember(key, response)
+        return response
+
+    def put(self, key: str, response: str):
+        """保存回复（写入内存，配置了目录时同时写磁盘）"""
+        with self._lock:
+            self._remember(key, response)
+        self._write_disk(key, response)
+
+    def clear(self):
+        """清空内存缓存和计数（磁盘文件保留）"""
+        with self._lock:
+            self._memory.clear()
+            self.hits = self.disk_hits = self.misses = 0
+
+    def stats(self) -> Dict[str, int]:
+        """命中/未命中次数（hits包含disk_hits）"""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'size': len(self._memory),
+                'capacity': self.capacity,
+            }
+
+    def _remember(self, key: str, response: str):
+        if self.capacity <= 0:
+            return
+        self._memory[key] = response
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.capacity:
+            self._memory.popitem(last=False)
+
+    def _file(self, key: str) -> str:
+        return os.path.join(self.path, f"{key}.json")
+
+    def _read_disk(self, key: str) -> Optional[str]:
+        if not self.path:
+            return None
+        try:
+            with open(self._file(key), 'r', encoding='utf-8') as f:
+                return json.load(f)['response']
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _write_disk(self, key: str, response: str):
+        if not self.path:
+            return
+        # 先写临时文件再改名，读的一方不会看到写了一半的文件
+        tmp = f"{self._file(key)}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'response': response}, f, ensure_ascii=False)
+        os.replace(tmp, self._file(key))
+
+_default: Optional[ResponseCache] = None
+
+def get_cache() -> Optional[ResponseCache]:
+    """所有AI玩家共用的缓存（按环境变量创建，LLM_CACHE_SIZE=0且没有目录时返回None）"""
+    global _default
+    if _default is None:
+        capacity = int(os.getenv('LLM_CACHE_SIZE', '256'))
+        path = os.getenv('LLM_CACHE_DIR') or None
+        if capacity <= 0 and not path:
+            return None
+        _default = ResponseCache(capacity, path)
+    return _default
@@ -0,0 +1,105 @@
+"""
+LLM Client Module - 所有AI玩家共用的异步LLM客户端
+一个后台线程运行事件循环，驱动所有对局的LLM请求；同一个(base_url, api_key)共用一个
+AsyncOpenAI客户端（内部带连接池）。每次调用有总时限，失败时按指数退避加随机抖动重试。
+"""
+
+import asyncio
+import random
+import threading
+from concurrent.futures import Future
+from typing import Any, Coroutine, Dict, List, NamedTuple, Optional, Tuple
+
+from openai import AsyncOpenAI, APIConnectionError, APIStatusError, APITimeoutError
+
+# 会重试的HTTP状态码（另外所有5xx、超时和连接错误也会重试，其他错误直接抛出）
+RETRY_STATUS = (408, 409, 429)
+
+class Completion(NamedTuple):
+    """一次调用的结果：回复文本和token用量（服务端没有返回用量时为0）"""
+    text: str
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_lock = threading.Lock()
+
+# (base_url, api_key) -> 客户端，只在共用事件循环里创建和使用
+_clients: Dict[Tuple[str, str], AsyncOpenAI] = {}
+
+def get_loop() -> asyncio.AbstractEventLoop:
+    """共用事件循环（第一次使用时在后台线程启动）"""
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="llm-loop", daemon=True).start()
+        return _loop
+
+def submit(coro: Coroutine) -> Future:
+    """在共用事件循环上运行协程，返回可以在任何线程等待的Future"""
+    return asyncio.run_coroutine_threadsafe(coro, get_loop())
+
+def run(coro: Coroutine) -> Any:
+    """在共用事件循环上运行协程并等待结果（给同步代码用）"""
+    return submit(coro).result()
+
+def _get_client(base_url: str, api_key: str) -> AsyncOpenAI:
+    key = (base_url, api_key)
+    client = _clients.get(key)
+    if client is None:
+        # 重试由 complete() 自己控制
+        client = _clients[key] = AsyncOpenAI(api_key=api_key, base_url=base_url, max_retries=0)
+    return client
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算token数（中文约一个字一个token，英文约四个字母一个token，按两个字符一个估算）"""
+    return max(1, len(text) // 2)
+
+def _retryable(error: Exception) -> bool:
+    """只重试暂时性的错误；程序错误、格式不对的回复等直接抛出，不要被重试掩盖"""
+    if isinstance(error, APIStatusError):
+        return error.status_code in RETRY_STATUS or error.status_code >= 500
+    return isinstance(error, (APITimeoutError, APIConnectionError, asyncio.TimeoutError))
+
+async def complete(base_url: str, api_key: str, messages: List[Dict[str, str]], *, model: str,
+                   temperature: float, max_tokens: int, timeout: float = 30.0,
+                   retries: int = 2, backoff: float = 0.5) -> Completion:
+    """
+    调用chat completion，返回回复文本和token用量
+
+    Args:
+        timeout: 整个调用（包括重试和等待）的总时限（秒），超过时抛出TimeoutError
+        retries: 最多重试次数
+        backoff: 第一次重试的最大等待（秒），之后每次翻倍，实际等待在0到该值之间随机
+    """
+    client = _get_client(base_url, api_key)
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    attempt = 0
+    while True:
+        try:
+            response = await asyncio.wait_for(
+                client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    temperature=temperature,
+                    max_tokens=max_tokens
+                ),
+                deadline - loop.time()
+            )
+            usage = response.usage
+            return Completion(
+                response.choices[0].message.content or '',
+                usage.prompt_tokens if usage else 0,
+                usage.completion_tokens if usage else 0
+            )
+        except Exception as e:
+            if attempt >= retries or not _retryable(e):
+                raise
+            delay = random.uniform(0, backoff * 2 ** attempt)
+            if loop.time() + delay >= deadline:
+                raise
+            attempt += 1
+            print(f"[LLM] 调用失败（{type(e).__name__}），{delay:.2f}秒后第{attempt}次重试")
+            await asyncio.sleep(delay)
@@ -62,6 +62,7 @@ def main():
             choice = input(f"{player.name} 正在睡觉。输入 'wake' 醒来，或 'skip' 跳过回合: ").strip().lower()
             if choice == 'wake':
                 player.wake_up()
+                game.bump_version()
                 print("你醒来了。")
             else:
                 print("你继续睡觉...")
@@ -85,7 +86,10 @@ def main():
                     return
                 
                 if command.lower() == 'help':
-                    print("可用命令: look, move, take, examine, open, close, unlock, inventory, status, wait, sleep, quit")
+                    print("可用命令:")
+                    for action in game.legal_actions(player):
+                        print(f"  {action.command:<32} {action.label}")
+                    print("  quit")
                     continue
                 
                 # 执行命令
@@ -95,8 +99,7 @@ def main():
                 # 检查胜利条件
                 is_over, winner = game.check_victory()
                 if is_over:
-                    game.game_over = True
-                    game.winner = winner
+                    game.finish(winner)
                     break
                 
                 # 如果动作成功（消耗了AP），轮到下一个玩家
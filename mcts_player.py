@@ -0,0 +1,337 @@
+"""
+MCTS Player Module - 本地搜索AI对手
+蒙特卡洛树搜索，不需要网络和LLM，在给定的毫秒预算内给出动作。
+与 AIPlayer 接口相同（decide_action），可以在 /api/join 时通过 ai_type='mcts' 选择。
+
+对手的位置、睡眠状态和背包是隐藏信息：每次迭代都按看得到的信息重新采样（determinization），
+树节点按"当前采样下是否合法"统计可用次数（ISMCTS），避免利用看不到的信息。
+
+一定不会改变局面的动作（检查物品、打开锁着的东西、穿过关着的门等）和Z重新锁上、关上东西不参与搜索；
+扩展节点和模拟时按局面评估（离目标物品多近、是否拿到目标物品、离出口多近）贪心选择动作，模拟时偶尔随机。
+Z的目标物品和出口默认从世界定义推断（is_objective 的物品、没有出路的房间）。
+"""
+
+import math
+import random
+import time
+from typing import Any, Dict, List, Optional
+
+from worldshell.engine import PICK_TOOL, Action, GameEngine
+from worldshell.player import Player, PlayerState
+from worldshell.simulator import candidate_actions, step
+
+# 只获得信息、不改变局面的动作（确定化之后的搜索里没有价值）
+INFO_ACTIONS = ('examine',)
+# Z只需要把东西打开，重新锁上、关上只会让自己白费AP
+Z_UNDO_ACTIONS = ('lock', 'close')
+
+# 模拟时随机选择动作的概率（其余时候按局面评估贪心选择）
+ROLLOUT_EPSILON = 0.2
+
+# 看不到对手时可能的状态（引擎里睡觉总是深度睡眠），以及对手还在上次看到的地方、保持上次状态的概率
+OPPONENT_STATES = (PlayerState.AWAKE, PlayerState.DEEP_SLEEP)
+LAST_SEEN_PROB = 0.7
+
+# 看不到的物品在对手身上的先验概率（物品本来就在对手身上时用 HOME_ITEM_PROB）
+HIDDEN_ITEM_PROB = 0.1
+HOME_ITEM_PROB = 0.9
+
+class _Node:
+    __slots__ = ('mover', 'children', 'visits', 'reward', 'available')
+
+    def __init__(self, mover: Optional[str]):
+        self.mover = mover  # 走到这个节点的玩家
+        self.children: Dict[str, '_Node'] = {}
+        self.visits = 0
+        self.reward = 0.0
+        self.available = 0
+
+class MCTSPlayer:
+    def __init__(self, role: str, engine: GameEngine, budget_ms: int = 50,
+                 exploration: float = 0.1, rollout_depth: int = 4, seed: Optional[int] = None,
+                 iterations: Optional[int] = None, goal_item: Optional[str] = None,
+                 exit_room: Optional[str] = None, tool_item: str = PICK_TOOL):
+        """
+        初始化MCTS玩家
+
+        Args:
+            role: 'H' 或 'Z'
+            engine: 正在进行的游戏（搜索在私有副本上进行，不会修改它）
+            budget_ms: 每次决策的时间预算（毫秒）
+            exploration: UCB探索系数（局面评估的差别通常只有零点几，系数要和这个尺度相当）
+            rollout_depth: 随机模拟的最大动作数，超过后用局面评估代替
+            iterations: 每次决策固定的迭代次数（给定时不看时间预算，配合seed结果完全可复现）
+            goal_item: Z要拿到的物品，默认是世界里Z一开始没有的目标物品（is_objective）
+            exit_room: Z拿到物品后要去的出口，默认是世界里没有出路的房间
+            tool_item: 撬锁用的工具（局面评估里算作拿到目标物品之前的一步）
+        """
+        self.role = role
+        self.opponent = 'Z' if role == 'H' else 'H'
+        self.engine = engine
+        self.budget_ms = budget_ms
+        self.exploration = exploration
+        self.rollout_depth = rollout_depth
+        self.iterations = iterations
+        self.rng = random.Random(seed)
+        self.quiet = False  # 为True时不打印每次决策（无界面批量模拟用）
+        self.pacing = 0.5  # 两个动作之间的展示间隔（秒），决策本身几乎不耗时
+        self.last_iterations = 0
+
+        # 搜索用的私有副本（从同一个世界模板复制，可以直接恢复真实对局的快照）
+        self.sim = GameEngine(engine.world.yaml_path)
+        self.sim.quiet = True
+        # 物品的初始位置（采样对手背包时，没被对手拿走的物品放回这里）
+        self._home = dict(self.sim.world.locations)
+        self._last_seen = None  # 上次看到对手时的 (位置, 状态)
+
+        # Z的目标：拿到目标物品，逃到出口（从世界定义推断，也可以直接指定）
+        world = self.sim.world
+        z = self.sim.players['Z']
+        objectives = [obj.id for obj in world.objects.values()
+                      if obj.properties.get('is_objective') and not z.has_item(obj.id)]
+        self.goal_item = goal_item or (objectives[0] if objectives else None)
+        self.exit_room = exit_room or next((room.id for room in world.rooms.values() if not room.connections), None)
+        self.tool_item = tool_item
+
+    def decide_action(self, game_state: Dict[str, Any], available_actions: Dict, history: List[Dict] = None) -> Optional[str]:
+        """
+        在时间预算内搜索并返回动作命令（参数与AIPlayer一致，搜索直接使用对局引擎）
+        """
+        deadline = time.perf_counter() + self.budget_ms / 1000
+        sim = self.sim
+        sim.max_turns = self.engine.max_turns
+        root_state = self.engine.snapshot()
+        sim.restore(root_state)
+        me = sim.players[self.role]
+        if sim.current_turn != self.role or sim.game_over:
+            return None
+
+        root_commands = self._legal(sim)
+        if not root_commands:
+            return None
+        if len(root_commands) == 1:
+            return root_commands[0]
+
+        # 对手和自己在同一个房间时看得见（位置、是否睡着），否则位置也要采样
+        opponent_visible = sim.players[self.opponent].location == me.location
+        if opponent_visible:
+            opponent = sim.players[self.opponent]
+            self._last_seen = (opponent.location, opponent.state)
+        hidden_rooms = [r for r in sim.world.rooms if r != me.location]
+
+        root = _Node(None)
+        iterations = 0
+        while True:
+            sim.restore(root_state)
+            self._determinize(sim, opponent_visible, hidden_rooms)
+            self._iterate(sim, root)
+            iterations += 1
+            if self.iterations is not None:
+                if iterations >= self.iterations:
+                    break
+            elif time.perf_counter() >= deadline:
+                break
+
+        self.last_iterations = iterations
+        best = max(root.children.items(), key=lambda item: item[1].visits)
+        if not self.quiet:
+            print(f"[MCTS {self.role}] {iterations}次迭代，选择: {best[0]} "
+                  f"(访问{best[1].visits}次, 胜率{best[1].reward / max(best[1].visits, 1):.2f})")
+        return best[0]
+
+    def _determinize(self, sim: GameEngine, opponent_visible: bool, hidden_rooms: List[str]):
+        """按自己看得到的信息采样对手的位置、睡眠状态和背包"""
+        me = sim.players[self.role]
+        opponent = sim.players[self.opponent]
+        rng = self.rng
+        if not opponent_visible:
+            seen = self._last_seen
+            if seen and seen[0] != me.location and rng.random() < LAST_SEEN_PROB:
+                opponent.location, opponent.state = seen
+            else:
+                opponent.location = rng.choice(hidden_rooms)
+                opponent.state = rng.choice(OPPONENT_STATES)
+
+        world = sim.world
+        for item_id, obj in world.objects.items():
+            if not obj.is_portable or me.has_item(item_id) or world.is_reachable(item_id, me.location):
+                continue  # 自己看得到在哪里
+            home = self._home.get(item_id)
+            at_home = home == ('player', opponent.name)
+            held = rng.random() < (HOME_ITEM_PROB if at_home else HIDDEN_ITEM_PROB)
+            if held and not opponent.has_item(item_id):
+                world.place_object(item_id, 'player', opponent.name)
+                opponent.add_item(item_id)
+            elif not held and opponent.has_item(item_id) and home and not at_home \
+                    and not self._observable(sim, home, me):
+                opponent.remove_item(item_id)
+                world.place_object(item_id, *home)
+        sim.bump_version()
+
+    @staticmethod
+    def _observable(sim: GameEngine, location: tuple, me: Player) -> bool:
+        """自己能不能看到这个位置（自己的房间、房间里打开的容器、自己身上）"""
+        kind, holder_id = location
+        if kind == 'room':
+            return holder_id == me.location
+        if kind == 'container':
+            container = sim.world.get_object(holder_id)
+            return (bool(container.state.get('is_open'))
+                    and sim.world.locate(holder_id) == ('room', me.location))
+        return holder_id == me.name
+
+    def _legal(self, sim: GameEngine) -> List[str]:
+        player = sim.get_current_player()
+        return [a.command for a in candidate_actions(sim, player)
+                if a.ap_cost <= player.ap and self._useful(sim, player, a)]
+
+    def _useful(self, sim: GameEngine, player: Player, action: Action) -> bool:
+        """动作是否可能改变局面（一定失败或只消耗AP的动作不搜索）"""
+        name = action.name
+        if name in INFO_ACTIONS or (player.name == 'Z' and name in Z_UNDO_ACTIONS):
+            return False
+        world = sim.world
+        if name == 'move':
+            if player.name == 'Z' and action.target == self.exit_room and not player.has_item(self.goal_item):
+                return False  # 出口是死路，没拿到日记本时去了也不会赢
+            # 和 GameEngine.action_move 一样：当前房间里连接两个房间的门关着时走不过去
+            for obj in world.get_room(player.location).objects:
+                if obj.type == 'Door' and player.location in obj.link and action.target in obj.link \
+                        and not obj.state.get('is_open', False):
+                    return False
+            return True
+        obj = world.get_object(action.target) if action.target else None
+        if name == 'open':
+            return not obj.state.get('is_locked')
+        if name == 'unlock':
+            return obj.state.get('key_id') == action.extra
+        return True
+
+    def _iterate(self, sim: GameEngine, root: _Node):
+        path = [root]
+        node = root
+
+        # 1. 选择与扩展
+        while not sim.game_over:
+            legal = self._legal(sim)
+            if not legal:
+                break
+            for command in legal:
+                child = node.children.get(command)
+                if child:
+                    child.available += 1
+            untried = [c for c in legal if c not in node.children]
+            mover = sim.current_turn
+            if untried:
+                command = self._greedy(sim, untried)  # 先扩展局面评估最好的动作
+                node.children[command] = child = _Node(mover)
+                child.available = 1
+                step(sim, command)
+                path.append(child)
+                break
+            command = max(legal, key=lambda c: self._ucb(node.children[c]))
+            node = node.children[command]
+            step(sim, command)
+            path.append(node)
+
+        # 2. 模拟（按局面评估贪心，偶尔随机）
+        for _ in range(self.rollout_depth):
+            if sim.game_over:
+                break
+            command = self._rollout_policy(sim)
+            if not command:
+                break
+            step(sim, command)
+
+        # 3. 回传（奖励以走到该节点的玩家为视角）
+        z_value = self._evaluate(sim)
+        for visited in path:
+            visited.visits += 1
+            if visited.mover:
+                visited.reward += z_value if visited.mover == 'Z' else 1 - z_value
+
+    def _ucb(self, node: _Node) -> float:
+        if node.visits == 0:
+            return float('inf')
+        return node.reward / node.visits + self.exploration * math.sqrt(math.log(max(node.available, 1)) / node.visits)
+
+    def _rollout_policy(self, sim: GameEngine) -> Optional[str]:
+        """模拟时的动作：多数时候选局面评估对自己最好的动作，偶尔随机"""
+        commands = self._legal(sim)
+        if not commands:
+            return None
+        if len(commands) == 1 or self.rng.random() < ROLLOUT_EPSILON:
+            return self.rng.choice(commands)
+        return self._greedy(sim, commands)
+
+    def _greedy(self, sim: GameEngine, commands: List[str]) -> str:
+        """试走每个动作，返回局面评估对当前玩家最好的一个（一样好时随机选）"""
+        if len(commands) == 1:
+            return commands[0]
+        sign = 1 if sim.current_turn == 'Z' else -1
+        state = sim.snapshot()
+        best, best_value = [], None
+        for command in commands:
+            step(sim, command)
+            value = sign * self._evaluate(sim)
+            sim.restore(state)
+            if best_value is None or value > best_value:
+                best, best_value = [command], value
+            elif value == best_value:
+                best.append(command)
+        return self.rng.choice(best)
+
+    def _evaluate(self, sim: GameEngine) -> float:
+        """
+        局面对Z的价值（0~1）。结束时按胜负，否则按目标进度：
+        没拿到日记本时看离撬锁器和日记本有多近，拿到后看离出口有多近
+        """
+        if sim.game_over:
+            return 1.0 if sim.winner == 'Z' else 0.0
+
+        z = sim.players['Z']
+        if self.goal_item and z.has_item(self.goal_item):
+            value = 0.6 + 0.4 * self._closeness(sim, z.location, self.exit_room)
+        else:
+            value = 0.15 * self._progress(sim, z, self.tool_item) + 0.45 * self._progress(sim, z, self.goal_item)
+
+        # 时间越少，Z越难完成
+        remaining = max(sim.max_turns - sim.turn_count, 0) / max(sim.max_turns, 1)
+        return value * (0.5 + 0.5 * remaining)
+
+    @staticmethod
+    def _closeness(sim: GameEngine, src: str, dst: Optional[str]) -> float:
+        distance = sim.world.noise.distance(src, dst) if dst else None
+        return 1.0 / (1 + distance) if distance is not None else 0.0
+
+    def _progress(self, sim: GameEngine, player: Player, item_id: str) -> float:
+        """
+        离拿到物品还有多远（0~1，拿到为1）：到物品所在房间的距离，
+        通往那个房间的门、装着它的容器是否已经解锁和打开
+        """
+        if player.has_item(item_id):
+            return 1.0
+        world = sim.world
+        location = world.locate(item_id)
+        container = None
+        if location and location[0] == 'container':
+            container = world.get_object(location[1])
+            location = world.locate(container.id)
+        if not location or location[0] != 'room':
+            return 0.0  # 在别人身上
+
+        def openness(obj) -> float:
+            return 0.5 * (not obj.state.get('is_locked')) + 0.5 * bool(obj.state.get('is_open'))
+
+        room_id = location[1]
+        doors = [world.get_object(door_id) for link, door_ids in world.noise.edge_doors.items()
+                 if room_id in link for door_id in door_ids]
+        door_score = sum(map(openness, doors)) / len(doors) if doors else 1.0
+        container_score = openness(container) if container else 1.0
+        return 0.9 * (0.4 * self._closeness(sim, player.location, room_id)
+                      + 0.3 * door_score + 0.3 * container_score)
+
+    def reset(self):
+        """重置AI状态"""
+        self.last_iterations = 0
+        self._last_seen = None
@@ -0,0 +1,123 @@
+"""
+噪音传播模型
+房间间跳数在建图时一次算好（BFS），声音衰减按边计算：每经过一条连接衰减固定值，
+关着的门再按门类型的 blocks_sound 额外衰减。衰减结果按起点缓存，只有门开关时才失效。
+"""
+
+import heapq
+from collections import deque
+from typing import Dict, List, Optional, Set, FrozenSet
+
+# 每经过一条房间连接的衰减（与 Player.can_hear 原来的 distance * 2 一致）
+HOP_ATTENUATION = 2
+
+# 关着的门按 blocks_sound 属性额外衰减；开着的门不衰减
+DOOR_ATTENUATION = {
+    True: 6,
+    'full': 6,
+    'partial': 2,
+    False: 0,
+    None: 0,
+}
+
+class NoiseMap:
+    def __init__(self, world):
+        self.world = world
+
+        # 声音不分方向，所以按无向图处理房间连接
+        self.neighbors: Dict[str, Set[str]] = {room_id: set() for room_id in world.rooms}
+        for room_id, room in world.rooms.items():
+            for dest_id in room.connections.values():
+                if dest_id in self.neighbors:
+                    self.neighbors[room_id].add(dest_id)
+                    self.neighbors[dest_id].add(room_id)
+
+        # 每条连接上的门
+        self.edge_doors: Dict[FrozenSet[str], List[str]] = {}
+        for obj in world.objects.values():
+            if len(obj.link) == 2:
+                self.edge_doors.setdefault(frozenset(obj.link), []).append(obj.id)
+        self.door_ids: Set[str] = {d for doors in self.edge_doors.values() for d in doors}
+        self._door_order = tuple(sorted(self.door_ids))
+
+        self.hops: Dict[str, Dict[str, int]] = {room_id: self._bfs(room_id) for room_id in self.neighbors}
+
+        # 起点房间 -> {终点房间: 衰减}，门状态变化时清空
+        self._attenuation: Dict[str, Dict[str, int]] = {}
+        # 缓存对应的门开关状态
+        self._signature: Optional[tuple] = None
+
+    def bind(self, world) -> 'NoiseMap':
+        """为复制出来的世界创建噪音模型：拓扑数据共享，衰减缓存独立"""
+        noise = NoiseMap.__new__(NoiseMap)
+        noise.__dict__.update(self.__dict__)
+        noise.world = world
+        noise._attenuation = {}
+        noise._signature = None
+        return noise
+
+    def _bfs(self, start: str) -> Dict[str, int]:
+        dist = {start: 0}
+        queue = deque([start])
+        while queue:
+            room_id = queue.popleft()
+            for next_id in self.neighbors[room_id]:
+                if next_id not in dist:
+                    dist[next_id] = dist[room_id] + 1
+                    queue.append(next_id)
+        return dist
+
+    def distance(self, loc1: str, loc2: str) -> Optional[int]:
+        """两个房间之间的跳数，不连通时返回None"""
+        return self.hops.get(loc1, {}).get(loc2)
+
+    def _edge_attenuation(self, room1: str, room2: str) -> int:
+        attenuation = HOP_ATTENUATION
+        for door_id in self.edge_doors.get(frozenset((room1, room2)), ()):
+            door = self.world.objects[door_id]
+            if not door.state.get('is_open', False):
+                attenuation += DOOR_ATTENUATION.get(door.properties.get('blocks_sound'), 0)
+        return attenuation
+
+    def _compute_row(self, start: str) -> Dict[str, int]:
+        # Dijkstra：门会让某些边更"贵"，所以不能直接用跳数
+        row = {start: 0}
+        heap = [(0, start)]
+        while heap:
+            cost, room_id = heapq.heappop(heap)
+            if cost > row[room_id]:
+                continue
+            for next_id in self.neighbors[room_id]:
+                next_cost = cost + self._edge_attenuation(room_id, next_id)
+                if next_cost < row.get(next_id, next_cost + 1):
+                    row[next_id] = next_cost
+                    heapq.heappush(heap, (next_cost, next_id))
+        return row
+
+    def attenuation(self, source: str, listener: str) -> Optional[int]:
+        """声音从source传到listener的衰减量，不连通时返回None"""
+        row = self._attenuation.get(source)
+        if row is None:
+            if source not in self.neighbors:
+                return None
+            if self._signature is None:
+                self._signature = self._door_signature()
+            row = self._attenuation[source] = self._compute_row(source)
+        return row.get(listener)
+
+    def door_changed(self, obj_id: str):
+        """物品状态改变时调用；只有门的变化会让缓存失效"""
+        if obj_id in self.door_ids:
+            self.invalidate()
+
+    def _door_signature(self) -> tuple:
+        return tuple(bool(self.world.objects[d].state.get('is_open')) for d in self._door_order)
+
+    def refresh(self):
+        """批量改动物品状态后调用（如恢复快照）：只有门的开关状态变了才清空缓存"""
+        if self._signature is not None and self._door_signature() != self._signature:
+            self.invalidate()
+
+    def invalidate(self):
+        self._attenuation = {}
+        self._signature = None
@@ -1,5 +1,6 @@
-from typing import List, Optional
+from typing import Dict, List, Optional
 from enum import Enum
+from worldshell import views
 
 class PlayerRole(Enum):
     HOUSEKEEPER = "H"  # 守夜人
@@ -31,6 +32,7 @@ class Player:
         
         # Memory/knowledge tracking
         self.observed_traces = set()  # 已经观察到的痕迹ID
+        self.trace_marks: Dict[str, int] = {}  # 房间ID -> 痕迹序号：这个房间里序号更小的痕迹都看过了
         self.action_history = []  # 行动历史，用于生成痕迹
 
     def has_item(self, obj_id: str) -> bool:
@@ -66,26 +68,44 @@ class Player:
         """醒来"""
         self.state = PlayerState.AWAKE
 
-    def can_hear(self, noise_level: int, distance: int = 0) -> bool:
-        """判断是否能听到噪音"""
+    def can_hear(self, noise_level: int, distance: int = 0, attenuation: Optional[int] = None) -> bool:
+        """判断是否能听到噪音（attenuation为噪音模型算出的衰减，不传则按距离估算）"""
+        if attenuation is None:
+            attenuation = distance * 2
         if self.state == PlayerState.AWAKE:
             return noise_level >= 1  # 醒着时对噪音敏感
         elif self.state == PlayerState.LIGHT_SLEEP:
             # 浅睡眠，需要噪音大于感知力 - 距离衰减
-            effective_noise = noise_level - distance * 2
+            effective_noise = noise_level - attenuation
             return effective_noise >= self.awareness
         else:  # DEEP_SLEEP
             # 深度睡眠，很难被吵醒
-            effective_noise = noise_level - distance * 2
+            effective_noise = noise_level - attenuation
             return effective_noise >= self.awareness + 5
 
+    def snapshot(self) -> tuple:
+        """保存可变状态（AP、位置、睡眠状态、背包、已观察痕迹）"""
+        return (self.ap, self.location, self.state, tuple(self.inventory), frozenset(self.observed_traces),
+                tuple(self.trace_marks.items()))
+
+    def restore(self, snapshot: tuple):
+        """从snapshot()的结果恢复"""
+        self.ap, self.location, self.state, inventory, observed, marks = snapshot
+        self.inventory = list(inventory)
+        self.observed_traces = set(observed)
+        self.trace_marks = dict(marks)
+
+    def status(self) -> dict:
+        """玩家状态的结构化视图"""
+        return {
+            'name': self.name,
+            'location': self.location,
+            'ap': self.ap,
+            'max_ap': self.max_ap,
+            'state': self.state.value,
+            'inventory': list(self.inventory)
+        }
+
     def describe_status(self) -> str:
         """返回玩家状态描述"""
-        lines = [
-            f"=== {self.name} ({'Housekeeper' if self.role == PlayerRole.HOUSEKEEPER else 'Intruder'}) ===",
-            f"Location: {self.location}",
-            f"AP: {self.ap}/{self.max_ap}",
-            f"State: {self.state.value}",
-            f"Inventory: {', '.join(self.inventory) if self.inventory else 'Empty'}"
-        ]
-        return '\n'.join(lines)
+        return views.render_status(self.status())
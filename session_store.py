@@ -0,0 +1,255 @@
+"""
+Session Store Module - 可以在多个服务器进程之间共享的游戏状态存储
+每局游戏存成一条记录：版本号 + 压缩后的状态（web_server._export_game 的结果）。
+写入时带上读到的版本号（乐观锁），期间被其他进程改过就抛出 VersionConflict，
+调用方重新读取最新状态后再处理，多个进程同时服务同一局游戏也不会互相覆盖。
+
+后端（SESSION_STORE 环境变量，见 open_store）：
+    memory://                 进程内（测试用，或者单进程部署）
+    sqlite:///path/to/db      SQLite文件（同一台机器上的多个进程）
+    redis://host:port/db      Redis协议（不需要redis库，本地测试可以用 fake_redis.py）
+"""
+
+import abc
+import json
+import socket
+import sqlite3
+import threading
+import zlib
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+class VersionConflict(Exception):
+    """写入时存储里的版本和读到的版本不一致（其他进程先写了）"""
+
+def encode_state(state: Dict[str, Any]) -> bytes:
+    """紧凑的JSON再用zlib压缩（一局游戏通常不到2KB）"""
+    return zlib.compress(json.dumps(state, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+
+def decode_state(data: bytes) -> Dict[str, Any]:
+    return json.loads(zlib.decompress(data).decode('utf-8'))
+
+class SessionStore(abc.ABC):
+    """存储接口。版本号从1开始，每次写入加一；不存在的游戏版本为None"""
+
+    @abc.abstractmethod
+    def version(self, game_id: str) -> Optional[int]:
+        """当前版本号（只读版本号，比load便宜）"""
+
+    @abc.abstractmethod
+    def load(self, game_id: str) -> Optional[Tuple[int, Dict[str, Any]]]:
+        """(版本号, 状态)，不存在时返回None"""
+
+    @abc.abstractmethod
+    def save(self, game_id: str, state: Dict[str, Any], expected: int) -> int:
+        """
+        写入状态，返回新的版本号
+
+        Args:
+            expected: 读到的版本号，新游戏为0
+
+        Raises:
+            VersionConflict: 存储里的版本不是expected
+        """
+
+    @abc.abstractmethod
+    def delete(self, game_id: str):
+        """删除一局游戏（不存在时什么也不做）"""
+
+    @abc.abstractmethod
+    def game_ids(self) -> List[str]:
+        """存储里的所有游戏ID"""
+
+class MemoryStore(SessionStore):
+    """进程内存储（同样保存编码后的数据，行为和其他后端一致）"""
+
+    def __init__(self):
+        self._records: Dict[str, Tuple[int, bytes]] = {}
+        self._lock = threading.Lock()
+
+    def version(self, game_id: str) -> Optional[int]:
+        record = self._records.get(game_id)
+        return record[0] if record else None
+
+    def load(self, game_id: str) -> Optional[Tuple[int, Dict[str, Any]]]:
+        record = self._records.get(game_id)
+        return (record[0], decode_state(record[1])) if record else None
+
+    def save(self, game_id: str, state: Dict[str, Any], expected: int) -> int:
+        data = encode_state(state)
+        with self._lock:
+            if (self.version(game_id) or 0) != expected:
+                raise VersionConflict(game_id)
+            self._records[game_id] = (expected + 1, data)
+            return expected + 1
+
+    def delete(self, game_id: str):
+        with self._lock:
+            self._records.pop(game_id, None)
+
+    def game_ids(self) -> List[str]:
+        return list(self._records)
+
+class SQLiteStore(SessionStore):
+    """SQLite存储，每个线程一个连接"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        with self._connect() as db:
+            db.execute("CREATE TABLE IF NOT EXISTS games ("
+                       "id TEXT PRIMARY KEY, version INTEGER NOT NULL, state BLOB NOT NULL)")
+
+    def _connect(self) -> sqlite3.Connection:
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = self._local.db = sqlite3.connect(self.path, timeout=30)
+            db.execute("PRAGMA journal_mode=WAL")  # 读不阻塞写
+        return db
+
+    def version(self, game_id: str) -> Optional[int]:
+        row = self._connect().execute("SELECT version FROM games WHERE id = ?", (game_id,)).fetchone()
+        return row[0] if row else None
+
+    def load(self, game_id: str) -> Optional[Tuple[int, Dict[str, Any]]]:
+        row = self._connect().execute("SELECT version, state FROM games WHERE id = ?", (game_id,)).fetchone()
+        return (row[0], decode_state(row[1])) if row else None
+
+    def save(self, game_id: str, state: Dict[str, Any], expected: int) -> int:
+        data = encode_state(state)
+        with self._connect() as db:
+            if expected == 0:
+                try:
+                    db.execute("INSERT INTO games (id, version, state) VALUES (?, 1, ?)", (game_id, data))
+                except sqlite3.IntegrityError:
+                    raise VersionConflict(game_id) from None
+            else:
+                # 版本号作为条件：被其他进程改过时一行也不会更新
+                cursor = db.execute("UPDATE games SET version = version + 1, state = ? "
+                                    "WHERE id = ? AND version = ?", (data, game_id, expected))
+                if cursor.rowcount != 1:
+                    raise VersionConflict(game_id)
+        return expected + 1
+
+    def delete(self, game_id: str):
+        with self._connect() as db:
+            db.execute("DELETE FROM games WHERE id = ?", (game_id,))
+
+    def game_ids(self) -> List[str]:
+        return [row[0] for row in self._connect().execute("SELECT id FROM games")]
+
+class RedisError(Exception):
+    """Redis返回的错误"""
+
+class _RedisConnection:
+    """最小的RESP客户端，只支持这里用到的命令"""
+
+    def __init__(self, host: str, port: int, db: int):
+        self._sock = socket.create_connection((host, port))
+        self._file = self._sock.makefile('rb')
+        if db:
+            self.call('SELECT', db)
+
+    def call(self, *args) -> Any:
+        parts = [b'*%d\r\n' % len(args)]
+        for arg in args:
+            data = arg if isinstance(arg, bytes) else str(arg).encode('utf-8')
+            parts.append(b'$%d\r\n%s\r\n' % (len(data), data))
+        self._sock.sendall(b''.join(parts))
+        return self._read()
+
+    def _read(self) -> Any:
+        line = self._file.readline()
+        if not line:
+            raise ConnectionError("Redis连接已关闭")
+        kind, rest = line[:1], line[1:-2]
+        if kind == b'+':
+            return rest.decode('utf-8')
+        if kind == b'-':
+            raise RedisError(rest.decode('utf-8'))
+        if kind == b':':
+            return int(rest)
+        if kind == b'$':
+            size = int(rest)
+            if size < 0:
+                return None
+            data = self._file.read(size + 2)
+            return data[:-2]
+        if kind == b'*':
+            count = int(rest)
+            return None if count < 0 else [self._read() for _ in range(count)]
+        raise RedisError(f"无法解析的回复: {line!r}")
+
+    def close(self):
+        self._file.close()
+        self._sock.close()
+
+class RedisStore(SessionStore):
+    """
+    Redis存储：每局游戏一个字符串键，值为 "版本号:" + 编码后的状态。
+    写入用 WATCH/MULTI/EXEC，期间键被改过时EXEC返回空，即版本冲突。
+    """
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 6379, db: int = 0, prefix: str = 'worldshell:game:'):
+        self.host, self.port, self.db = host, port, db
+        self.prefix = prefix
+        self._local = threading.local()  # WATCH是连接级别的，每个线程一个连接
+
+    def _connect(self) -> _RedisConnection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = _RedisConnection(self.host, self.port, self.db)
+        return conn
+
+    @staticmethod
+    def _split(value: Optional[bytes]) -> Optional[Tuple[int, bytes]]:
+        if value is None:
+            return None
+        version, _, data = value.partition(b':')
+        return int(version), data
+
+    def version(self, game_id: str) -> Optional[int]:
+        # 只取版本号部分，不传输整个状态
+        value = self._connect().call('GETRANGE', self.prefix + game_id, 0, 19)
+        if not value:
+            return None
+        return int(value.partition(b':')[0])
+
+    def load(self, game_id: str) -> Optional[Tuple[int, Dict[str, Any]]]:
+        record = self._split(self._connect().call('GET', self.prefix + game_id))
+        return (record[0], decode_state(record[1])) if record else None
+
+    def save(self, game_id: str, state: Dict[str, Any], expected: int) -> int:
+        key = self.prefix + game_id
+        value = b'%d:' % (expected + 1) + encode_state(state)
+        conn = self._connect()
+        conn.call('WATCH', key)
+        record = self._split(conn.call('GET', key))
+        if (record[0] if record else 0) != expected:
+            conn.call('UNWATCH')
+            raise VersionConflict(game_id)
+        conn.call('MULTI')
+        conn.call('SET', key, value)
+        if conn.call('EXEC') is None:
+            raise VersionConflict(game_id)
+        return expected + 1
+
+    def delete(self, game_id: str):
+        self._connect().call('DEL', self.prefix + game_id)
+
+    def game_ids(self) -> List[str]:
+        keys = self._connect().call('KEYS', self.prefix + '*')
+        return [key.decode('utf-8')[len(self.prefix):] for key in keys]
+
+def open_store(url: str) -> SessionStore:
+    """按URL创建存储，如 memory://、sqlite:///games.db、redis://localhost:6379/0"""
+    parsed = urlparse(url)
+    if parsed.scheme == 'memory':
+        return MemoryStore()
+    if parsed.scheme == 'sqlite':
+        # 和SQLAlchemy一样：sqlite:///相对路径，sqlite:////绝对路径
+        return SQLiteStore(url[len('sqlite:///'):])
+    if parsed.scheme == 'redis':
+        db = int(parsed.path.strip('/') or 0)
+        return RedisStore(parsed.hostname or '127.0.0.1', parsed.port or 6379, db)
+    raise ValueError(f"未知的存储: {url}")
@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+无界面自我对弈模拟器 - 用于调整AP消耗和胜利条件等平衡性参数
+用法: python -m worldshell.simulator --games 10000 --h guard --z intruder --workers 4 --seed 1
+
+策略是普通函数 policy(engine, player, rng) -> 命令字符串（返回None表示结束回合），
+注册到 POLICIES 即可通过名字使用。给定seed时结果完全可复现（与进程数无关）。
+"""
+
+import argparse
+import os
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional, Union
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from worldshell.engine import GameEngine, Action, QUERY_ACTIONS
+from worldshell.player import Player
+
+WORLD_FILE = os.path.join(os.path.dirname(__file__), "world_definition.yaml")
+
+# 这些命令会自动结束回合
+AUTO_END_TURN = ('wait', 'sleep')
+
+def candidate_actions(engine: GameEngine, player: Player) -> List[Action]:
+    """当前可尝试的动作（不含look/status等不改变局面的查询动作）"""
+    return [a for a in engine.legal_actions(player) if a.name not in QUERY_ACTIONS]
+
+def candidate_commands(engine: GameEngine, player: Player) -> List[str]:
+    """当前可尝试的命令字符串"""
+    return [a.command for a in candidate_actions(engine, player)]
+
+def _step_towards(engine: GameEngine, src: str, dst: str) -> Optional[str]:
+    """朝目标房间走一步的命令"""
+    room = engine.world.get_room(src)
+    best = None
+    for dest_id in room.connections.values():
+        distance = engine.world.noise.distance(dest_id, dst)
+        if distance is not None and (best is None or distance < best[0]):
+            best = (distance, dest_id)
+    return f"move {best[1]}" if best else None
+
+# ===== 策略 =====
+
+def policy_random(engine: GameEngine, player: Player, rng) -> Optional[str]:
+    """在AP够用的命令里随机选一个"""
+    commands = [a.command for a in candidate_actions(engine, player) if a.ap_cost <= player.ap]
+    return rng.choice(commands) if commands else None
+
+def policy_guard(engine: GameEngine, player: Player, rng) -> Optional[str]:
+    """守夜人：醒着守在原地"""
+    if player.is_asleep():
+        return 'wake'
+    return 'wait'
+
+def policy_sleeper(engine: GameEngine, player: Player, rng) -> Optional[str]:
+    """守夜人：一直睡觉"""
+    if player.is_asleep():
+        return None
+    return 'sleep'
+
+def policy_intruder(engine: GameEngine, player: Player, rng) -> Optional[str]:
+    """入侵者脚本（针对默认世界）：拿撬锁器 -> 撬门 -> 撬保险箱 -> 拿日记本 -> 逃离"""
+    if player.is_asleep():
+        return 'wake'
+
+    world = engine.world
+    here = player.location
+
+    def need(cost: int, command: Optional[str]) -> Optional[str]:
+        # AP不够时等待（+3 AP并结束回合）
+        return command if player.ap >= cost else 'wait'
+
+    if player.has_item('diary_book'):
+        return need(1, _step_towards(engine, here, 'exit_door'))
+
+    if not player.has_item('lockpick'):
+        if here != 'bedroom_z':
+            return need(1, _step_towards(engine, here, 'bedroom_z'))
+        suitcase = world.get_object('suitcase')
+        if suitcase.state.get('is_locked'):
+            return need(2, 'unlock suitcase with key_z')
+        if not suitcase.state.get('is_open'):
+            return need(1, 'open suitcase')
+        return need(1, 'take lockpick')
+
+    if here == 'living_room':
+        door = world.get_object('door_h')
+        if door.state.get('is_locked'):
+            return need(3, 'pick door_h')
+        if not door.state.get('is_open'):
+            return need(1, 'open door_h')
+        return need(1, 'move bedroom_h')
+    if here != 'bedroom_h':
+        return need(1, _step_towards(engine, here, 'bedroom_h'))
+
+    safe = world.get_object('safe_01')
+    if safe.state.get('is_locked'):
+        return need(3, 'pick safe_01')
+    if not safe.state.get('is_open'):
+        return need(1, 'open safe_01')
+    return need(1, 'take diary_book')
+
+POLICIES: Dict[str, Callable] = {
+    'random': policy_random,
+    'guard': policy_guard,
+    'sleeper': policy_sleeper,
+    'intruder': policy_intruder,
+}
+
+def _resolve_policy(policy: Union[str, Callable]) -> Callable:
+    return POLICIES[policy] if isinstance(policy, str) else policy
+
+# ===== 对局 =====
+
+def _check_victory(engine: GameEngine) -> bool:
+    is_over, winner = engine.check_victory()
+    if is_over:
+        engine.finish(winner)
+    return is_over
+
+def end_turn(engine: GameEngine):
+    """结束当前回合并检查胜负"""
+    engine.next_turn()
+    _check_victory(engine)
+
+def step(engine: GameEngine, command: str):
+    """
+    当前玩家执行一条命令，规则与web服务器一致：
+    执行后检查胜负；wait/sleep或AP耗尽时自动结束回合
+    """
+    player = engine.get_current_player()
+    engine.execute_action(player, command)
+    if _check_victory(engine):
+        return
+    if command.split()[0] in AUTO_END_TURN or player.ap < 1:
+        end_turn(engine)
+
+def play_game(h_policy: Union[str, Callable], z_policy: Union[str, Callable], seed: int,
+              world_path: str = WORLD_FILE, max_turns: int = 6,
+              max_actions_per_turn: int = 30) -> Dict:
+    """完整地玩一局，返回 {'winner', 'turns', 'actions': {'H': Counter, 'Z': Counter}}"""
+    engine = GameEngine(world_path, seed=seed)
+    engine.quiet = True
+    engine.max_turns = max_turns
+    policies = {'H': _resolve_policy(h_policy), 'Z': _resolve_policy(z_policy)}
+    actions = {'H': Counter(), 'Z': Counter()}
+
+    while not engine.game_over:
+        role = engine.current_turn
+        player = engine.players[role]
+        steps = 0
+        # 策略放弃或本回合动作过多时结束回合
+        while engine.current_turn == role and not engine.game_over:
+            command = None
+            if player.ap >= 1 and steps < max_actions_per_turn:
+                command = policies[role](engine, player, engine.rng)
+            if not command:
+                end_turn(engine)
+                break
+            step(engine, command)
+            actions[role][command.split()[0]] += 1
+            steps += 1
+
+    return {'winner': engine.winner, 'turns': engine.turn_count, 'actions': actions}
+
+def _new_stats() -> Dict:
+    return {'games': 0, 'wins': Counter(), 'turns': 0, 'actions': {'H': Counter(), 'Z': Counter()}}
+
+def _merge_stats(total: Dict, part: Dict):
+    total['games'] += part['games']
+    total['wins'].update(part['wins'])
+    total['turns'] += part['turns']
+    for role in ('H', 'Z'):
+        total['actions'][role].update(part['actions'][role])
+
+def _run_batch(args) -> Dict:
+    """在工作进程中跑一批对局，返回汇总统计"""
+    h_policy, z_policy, seeds, world_path, max_turns = args
+    stats = _new_stats()
+    for seed in seeds:
+        result = play_game(h_policy, z_policy, seed, world_path, max_turns)
+        stats['games'] += 1
+        stats['wins'][result['winner']] += 1
+        stats['turns'] += result['turns']
+        for role in ('H', 'Z'):
+            stats['actions'][role].update(result['actions'][role])
+    return stats
+
+def simulate(games: int, h_policy: Union[str, Callable] = 'random', z_policy: Union[str, Callable] = 'random',
+             seed: int = 0, workers: int = 1, world_path: str = WORLD_FILE, max_turns: int = 6,
+             batch_size: int = 500) -> Dict:
+    """
+    并行模拟多局游戏
+
+    每局的种子由(seed, 局号)决定，汇总只做加法，所以结果与进程数和分批方式无关。
+    自定义策略用函数（而不是名字）传入时，必须是模块级函数才能被多进程使用。
+    """
+    seeds = [seed * 1_000_003 + i for i in range(games)]
+    batches = [(h_policy, z_policy, seeds[i:i + batch_size], world_path, max_turns)
+               for i in range(0, games, batch_size)]
+
+    stats = _new_stats()
+    if workers <= 1:
+        for batch in batches:
+            _merge_stats(stats, _run_batch(batch))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for part in pool.map(_run_batch, batches):
+                _merge_stats(stats, part)
+    return stats
+
+def format_report(stats: Dict) -> str:
+    """把统计结果格式化为文本报告"""
+    games = stats['games'] or 1
+    lines = [f"对局数: {stats['games']}"]
+    for role in ('H', 'Z'):
+        lines.append(f"{role} 胜率: {stats['wins'].get(role, 0) / games:6.1%}")
+    total_actions = sum(sum(c.values()) for c in stats['actions'].values())
+    lines.append(f"平均局长: {stats['turns'] / games:.2f} 轮, {total_actions / games:.1f} 个动作")
+    for role in ('H', 'Z'):
+        counter = stats['actions'][role]
+        count = sum(counter.values()) or 1
+        dist = ', '.join(f"{verb} {n / count:.0%}" for verb, n in counter.most_common())
+        lines.append(f"{role} 动作分布: {dist or '无'}")
+    return '\n'.join(lines)
+
+def main():
+    parser = argparse.ArgumentParser(description="WorldShell 自我对弈模拟")
+    parser.add_argument('--games', type=int, default=10000)
+    parser.add_argument('--h', default='guard', choices=sorted(POLICIES), help="H的策略")
+    parser.add_argument('--z', default='intruder', choices=sorted(POLICIES), help="Z的策略")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--max-turns', type=int, default=6, help="H坚持多少轮获胜")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    stats = simulate(args.games, args.h, args.z, seed=args.seed, workers=args.workers,
+                     max_turns=args.max_turns)
+    elapsed = time.perf_counter() - start
+
+    print(f"=== H={args.h} vs Z={args.z} ===")
+    print(format_report(stats))
+    print(f"耗时 {elapsed:.2f}s ({stats['games'] / elapsed * 60:.0f} 局/分钟, {args.workers} 进程)")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
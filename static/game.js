@@ -2,7 +2,9 @@
 let gameState = {
     role: null,
     gameId: 'default',
-    updateInterval: null
+    updateInterval: null,
+    eventSource: null,
+    sync: null  // 增量同步的本地副本 {version, state, actions}
 };
 
 // Screen management
@@ -16,7 +18,8 @@ async function selectRole(role) {
     try {
         // 检查游戏模式
         const gameMode = document.querySelector('input[name="game_mode"]:checked').value;
-        const useAI = (gameMode === 'ai');
+        const useAI = (gameMode !== 'pvp');
+        const aiType = (gameMode === 'mcts') ? 'mcts' : 'llm';
         
         const response = await fetch('/api/join', {
             method: 'POST',
@@ -26,7 +29,8 @@ async function selectRole(role) {
             body: JSON.stringify({
                 role: role,
                 game_id: gameState.gameId,
-                use_ai: useAI
+                use_ai: useAI,
+                ai_type: aiType
             })
         });
 
@@ -52,21 +56,135 @@ async function selectRole(role) {
 
 // Start game update loop
 function startGameLoop() {
-    updateGameState();
-    gameState.updateInterval = setInterval(updateGameState, 2000); // 每2秒更新一次
+    // 优先使用服务器推送（SSE），不支持或连接失败时退回轮询
+    if (window.EventSource) {
+        startStream();
+    } else {
+        startPolling();
+    }
+}
+
+function startStream() {
+    const source = new EventSource('/api/stream');
+    gameState.eventSource = source;
+    
+    source.onopen = () => stopPolling();
+    source.onmessage = (event) => renderGameState(JSON.parse(event.data));
+    source.addEventListener('reset', () => stopStream());
+    source.onerror = () => {
+        // 浏览器会自动重连，期间用轮询兜底
+        if (gameState.eventSource) {
+            startPolling();
+        }
+    };
+}
+
+function stopStream() {
+    if (gameState.eventSource) {
+        gameState.eventSource.close();
+        gameState.eventSource = null;
+    }
+}
+
+function startPolling() {
+    if (!gameState.updateInterval) {
+        updateGameState();
+        gameState.updateInterval = setInterval(updateGameState, 2000); // 每2秒更新一次
+    }
+}
+
+function stopPolling() {
+    if (gameState.updateInterval) {
+        clearInterval(gameState.updateInterval);
+        gameState.updateInterval = null;
+    }
+}
+
+function isStreaming() {
+    return gameState.eventSource && gameState.eventSource.readyState === EventSource.OPEN;
 }
 
-// Update game state
+// Update game state（只取上次之后变化的部分）
 async function updateGameState() {
     try {
-        const response = await fetch('/api/state');
+        const since = gameState.sync ? '?since=' + encodeURIComponent(gameState.sync.version) : '';
+        const response = await fetch('/api/sync' + since);
         const data = await response.json();
         
         if (data.error) {
             console.error('State error:', data.error);
             return;
         }
+        if (data.unchanged) {
+            return;
+        }
         
+        applySync(data);
+        renderGameState(gameState.sync.state, groupActions(gameState.sync.actions));
+    } catch (error) {
+        console.error('Error updating state:', error);
+    }
+}
+
+// 把增量合并到本地副本（完整状态时直接替换）
+function applySync(data) {
+    if (data.full || !gameState.sync) {
+        gameState.sync = {version: data.version, state: data.state, actions: data.actions};
+        return;
+    }
+    const sync = gameState.sync;
+    Object.assign(sync.state, data.changed);
+    Object.assign(sync.state.player_status, data.player_status);
+    Object.assign(sync.state.observation, data.observation);
+    sync.state.history = sync.state.history.concat(data.history).slice(-10);
+    const removed = new Set(data.actions_removed);
+    sync.actions = sync.actions.filter(action => !removed.has(action.command)).concat(data.actions_added);
+    sync.version = data.version;
+}
+
+// 房间观测的文字版本（和服务器端 views.render_room 的格式相同）
+function describeObject(obj) {
+    const status = [];
+    if ('open' in obj) status.push(obj.open ? '已打开' : '关闭');
+    if ('locked' in obj) status.push(obj.locked ? '上锁' : '未锁');
+    return status.length ? `${obj.name} (${status.join(', ')})` : obj.name;
+}
+
+function renderObservation(obs) {
+    if (!obs.room) {
+        return '你无处可去。';
+    }
+    const lines = [`=== ${obs.room.name} ===`, obs.room.description, ''];
+    if (obs.opponent) {
+        lines.push(obs.opponent.awake
+            ? `! ${obs.opponent.name} 在这里，而且醒着！`
+            : `${obs.opponent.name} 在这里睡觉。`);
+    }
+    if (obs.objects.length > 0) {
+        lines.push('你看到：');
+        obs.objects.forEach(obj => lines.push(`  - ${describeObject(obj)}`));
+    }
+    if (obs.traces.length > 0) {
+        lines.push('\n你注意到一些异常：');
+        obs.traces.forEach(trace => lines.push(`  - ${trace.description}`));
+    }
+    if (obs.exits.length > 0) {
+        lines.push('\n可前往：');
+        obs.exits.forEach(exit => lines.push(`  - ${exit.name} (${exit.id})`));
+    }
+    return lines.join('\n');
+}
+
+function groupActions(actions) {
+    return {
+        no_target: actions.filter(action => !action.target),
+        with_target: actions.filter(action => action.target)
+    };
+}
+
+// Render game state（actions: 已经拿到的可用动作，没有时再请求）
+function renderGameState(data, actions) {
+    try {
         // Update status panel
         document.getElementById('player-role').textContent = data.role;
         document.getElementById('turn-count').textContent = data.turn_count;
@@ -87,7 +205,7 @@ async function updateGameState() {
         }
         
         // Update room view
-        document.getElementById('room-view').textContent = data.room_view;
+        document.getElementById('room-view').textContent = renderObservation(data.observation);
         
         // Update turn indicator
         const turnIndicator = document.getElementById('turn-indicator');
@@ -97,7 +215,11 @@ async function updateGameState() {
             turnIndicator.textContent = '🟢 你的回合！';
             turnIndicator.className = 'turn-indicator your-turn';
             endTurnBtn.disabled = false;
-            updateAvailableActions();
+            if (actions) {
+                renderActions(actions);
+            } else {
+                updateAvailableActions();
+            }
         } else {
             turnIndicator.textContent = `⏳ 等待 ${data.current_turn} 行动...`;
             turnIndicator.className = 'turn-indicator not-your-turn';
@@ -110,12 +232,13 @@ async function updateGameState() {
         
         // Check game over
         if (data.game_over) {
-            clearInterval(gameState.updateInterval);
+            stopPolling();
+            stopStream();
             showGameOver(data.winner);
         }
         
     } catch (error) {
-        console.error('Error updating state:', error);
+        console.error('Error rendering state:', error);
     }
 }
 
@@ -130,6 +253,14 @@ async function updateAvailableActions() {
             return;
         }
         
+        renderActions(data);
+    } catch (error) {
+        console.error('Error fetching actions:', error);
+    }
+}
+
+function renderActions(data) {
+    try {
         const actionsList = document.getElementById('actions-list');
         actionsList.innerHTML = '';
         
@@ -168,31 +299,29 @@ async function updateAvailableActions() {
         }
         
     } catch (error) {
-        console.error('Error fetching actions:', error);
+        console.error('Error rendering actions:', error);
     }
 }
 
-// Execute action
+// Execute action（批量接口一次返回结果、新状态和可用动作，不需要再请求）
 async function executeAction(action, target, extra) {
     try {
-        const response = await fetch('/api/action', {
+        const response = await fetch('/api/actions/batch', {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
             },
             body: JSON.stringify({
-                action: action,
-                target: target,
-                extra: extra,
+                commands: [{action: action, target: target, extra: extra}],
                 end_turn: false  // 不自动结束回合
             })
         });
 
         const data = await response.json();
         
-        if (data.success) {
-            // 立即更新状态
-            updateGameState();
+        if (data.state) {
+            // 动作本身失败（如AP不足）时结果已经在历史记录里
+            renderGameState(data.state, data.actions);
         } else {
             alert(data.error || '动作执行失败');
         }
@@ -215,7 +344,9 @@ async function endTurn() {
         const data = await response.json();
         
         if (data.success) {
-            updateGameState();
+            if (!isStreaming()) {
+                updateGameState();
+            }
         } else {
             alert(data.error || '结束回合失败');
         }
@@ -264,9 +395,8 @@ async function restartGame() {
     
     try {
         // 停止当前的更新循环
-        if (gameState.updateInterval) {
-            clearInterval(gameState.updateInterval);
-        }
+        stopPolling();
+        stopStream();
         
         // 调用后端重置游戏
         const response = await fetch('/api/restart', {
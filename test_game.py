@@ -5,11 +5,14 @@ Simple test script to validate the game engine without interactive input
 
 import sys
 import os
+import json
 
 # Add parent directory to path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from worldshell.engine import GameEngine
+from worldshell.trace_rules import compile_condition, parse_duration
+from worldshell import views
 
 def test_game_initialization():
     """测试游戏初始化"""
@@ -91,6 +94,385 @@ def test_trace_system(game):
     print("例如: Z 拿走重要物品会留下灰尘痕迹，H examine 时会看到")
     print()
 
+def test_world_template_clone():
+    """测试世界模板复制：多局游戏互不影响"""
+    print("=== 测试 6: 世界模板复制 ===")
+    world_file = os.path.join(os.path.dirname(__file__), "world_definition.yaml")
+    game1 = GameEngine(world_file)
+    game2 = GameEngine(world_file)
+
+    z = game1.players['Z']
+    game1.execute_action(z, "unlock suitcase with key_z")
+    game1.execute_action(z, "open suitcase")
+    game1.execute_action(z, "take lockpick")
+
+    suitcase1 = game1.world.get_object('suitcase')
+    suitcase2 = game2.world.get_object('suitcase')
+    assert suitcase1.state['is_open'] and not suitcase2.state.get('is_open')
+    assert 'lockpick' not in suitcase1.state['contains']
+    assert 'lockpick' in suitcase2.state['contains']
+    # 不可变的类型数据是共享的
+    assert suitcase1.properties is suitcase2.properties
+    assert game2.world.get_room('bedroom_z').get_object('key_z') is None
+    print("✓ 两局游戏的世界状态相互独立")
+    print()
+
+def test_object_index():
+    """测试物品位置索引"""
+    print("=== 测试 7: 物品位置索引 ===")
+    world_file = os.path.join(os.path.dirname(__file__), "world_definition.yaml")
+    game = GameEngine(world_file)
+    world = game.world
+    z = game.players['Z']
+
+    assert world.locate('key_z') == ('player', 'Z')
+    assert world.locate('lockpick') == ('container', 'suitcase')
+    assert world.locate('suitcase') == ('room', 'bedroom_z')
+    assert not world.is_accessible('lockpick', z)  # 手提箱还锁着
+
+    game.execute_action(z, "unlock suitcase with key_z")
+    game.execute_action(z, "open suitcase")
+    assert world.is_accessible('lockpick', z)
+    assert not world.is_accessible('lockpick', game.players['H'])
+
+    game.execute_action(z, "take lockpick")
+    assert world.locate('lockpick') == ('player', 'Z')
+    assert 'lockpick' not in world.get_object('suitcase').state['contains']
+    assert "这里没有" in game.execute_action(z, "take lockpick")
+    print("✓ 拿取物品后位置索引保持一致")
+    print()
+
+def test_noise_propagation():
+    """测试噪音传播：门的开关影响衰减"""
+    print("=== 测试 8: 噪音传播 ===")
+    world_file = os.path.join(os.path.dirname(__file__), "world_definition.yaml")
+    game = GameEngine(world_file)
+    noise = game.world.noise
+
+    assert noise.distance('bedroom_z', 'bedroom_h') == 2
+    assert noise.attenuation('bedroom_z', 'bathroom') == 4
+    # H的房门关着（blocks_sound: partial），声音额外衰减
+    closed = noise.attenuation('bedroom_z', 'bedroom_h')
+    assert closed == 6
+
+    door = game.world.get_object('door_h')
+    door.state['is_locked'] = False
+    z = game.players['Z']
+    z.location = 'living_room'
+    game.execute_action(z, "open door_h")
+    assert noise.attenuation('bedroom_z', 'bedroom_h') == 4
+    print(f"✓ 关门衰减 {closed}，开门后 {noise.attenuation('bedroom_z', 'bedroom_h')}")
+
+    h = game.players['H']
+    h.sleep(deep=False)
+    z.location = 'bathroom'
+    game._process_noise(z, "test", 5)
+    assert h.is_asleep()  # 隔了两个房间，听不到
+    z.location = 'living_room'
+    game._process_noise(z, "test", 7)
+    assert not h.is_asleep()
+    print("✓ 噪音按衰减决定是否惊醒对手")
+    print()
+
+def test_simulator():
+    """测试自我对弈模拟器"""
+    print("=== 测试 9: 自我对弈模拟 ===")
+    from worldshell.simulator import simulate, play_game
+
+    result = play_game('sleeper', 'intruder', seed=1)
+    assert result['winner'] == 'Z'
+    assert result['actions']['Z']['pick'] == 2  # 撬门 + 撬保险箱
+
+    first = simulate(200, 'random', 'intruder', seed=42)
+    second = simulate(200, 'random', 'intruder', seed=42, batch_size=30)
+    assert first == second
+    assert first['games'] == 200
+    print(f"✓ 同一seed结果可复现: {dict(first['wins'])}")
+    print()
+
+def test_snapshot_restore():
+    """测试快照与恢复"""
+    print("=== 测试 10: 快照与恢复 ===")
+    world_file = os.path.join(os.path.dirname(__file__), "world_definition.yaml")
+    game = GameEngine(world_file)
+    z = game.players['Z']
+    game.next_turn()
+    snap = game.snapshot()
+    view_before = game.observe_room(z)
+
+    for command in ["unlock suitcase with key_z", "open suitcase", "take lockpick", "move living_room"]:
+        game.execute_action(z, command)
+    game.next_turn()
+    assert z.has_item('lockpick') and z.location == 'living_room'
+
+    for _ in range(2):  # 同一个快照可以反复恢复
+        game.restore(snap)
+        assert game.current_turn == 'Z' and z.ap == 10 and z.location == 'bedroom_z'
+        assert z.inventory == ['key_z']
+        assert game.world.locate('lockpick') == ('container', 'suitcase')
+        assert game.world.get_object('suitcase').state['is_locked']
+        assert game.observe_room(z) == view_before
+        game.execute_action(z, "unlock suitcase with key_z")
+    print("✓ 恢复后状态与快照时一致")
+
+    # 导出的状态可以写成JSON，导入到另一个引擎后局面相同
+    import json
+    other = GameEngine(world_file)
+    other.import_state(json.loads(json.dumps(game.export_state())))
+    assert other.snapshot() == game.snapshot()
+    print("✓ 导出为JSON再导入后局面相同")
+    print()
+
+def test_mcts_player():
+    """测试本地MCTS AI"""
+    print("=== 测试 11: 本地MCTS AI ===")
+    from worldshell.mcts_player import MCTSPlayer
+    from worldshell.simulator import candidate_commands, play_game
+
+    world_file = os.path.join(os.path.dirname(__file__), "world_definition.yaml")
+    game = GameEngine(world_file)
+    game.next_turn()
+    z = game.players['Z']
+    ai = MCTSPlayer('Z', game, budget_ms=30, seed=1)
+    ai.quiet = True
+    assert (ai.goal_item, ai.exit_room, ai.tool_item) == ('diary_book', 'exit_door', 'lockpick')  # 从世界定义推断
+
+    before = game.snapshot()
+    command = ai.decide_action({}, {}, [])
+    assert command in candidate_commands(game, z)
+    assert ai.last_iterations > 1
+    assert game.snapshot() == before  # 搜索不改动真实对局
+
+    # 固定迭代次数和seed时结果完全可复现
+    commands = set()
+    for _ in range(2):
+        ai = MCTSPlayer('Z', game, seed=1, iterations=20)
+        ai.quiet = True
+        commands.add(ai.decide_action({}, {}, []))
+        assert ai.last_iterations == 20
+    assert len(commands) == 1
+    print(f"✓ 按时间预算或固定迭代次数搜索，选择: {command}")
+
+    # 作为Z赢下对睡觉的H的对局
+    def mcts_policy(engine, player, rng):
+        if mcts_policy.ai is None or mcts_policy.ai.engine is not engine:
+            mcts_policy.ai = MCTSPlayer('Z', engine, seed=0, iterations=50)
+            mcts_policy.ai.quiet = True
+        return mcts_policy.ai.decide_action({}, {}, [])
+    mcts_policy.ai = None
+
+    games = 3
+    wins = sum(play_game('sleeper', mcts_policy, seed=seed)['winner'] == 'Z' for seed in range(games))
+    assert wins == games
+    print(f"✓ 对睡觉的H赢了{wins}/{games}局")
+    print()
+
+def test_legal_actions():
+    """测试合法动作生成与缓存"""
+    print("=== 测试 12: 合法动作 ===")
+    world_file = os.path.join(os.path.dirname(__file__), "world_definition.yaml")
+    game = GameEngine(world_file)
+    z = game.players['Z']
+
+    actions = game.legal_actions(z)
+    commands = [a.command for a in actions]
+    assert 'move living_room' in commands
+    assert 'unlock suitcase with key_z' in commands
+    assert 'take lockpick' not in commands
+    assert game.legal_actions(z) is actions  # 局面没变，命中缓存
+
+    game.execute_action(z, "unlock suitcase with key_z")
+    game.execute_action(z, "open suitcase")
+    actions = game.legal_actions(z)
+    commands = [a.command for a in actions]
+    assert 'take lockpick' in commands and 'close suitcase' in commands
+    take = next(a for a in actions if a.command == 'take lockpick')
+    assert take.ap_cost == 1 and take.to_dict()['target'] == 'lockpick'
+
+    z.sleep()
+    game.bump_version()
+    assert [a.name for a in game.legal_actions(z)] == ['wake']
+    print("✓ 动作随局面更新，局面不变时命中缓存")
+    print()
+
+def test_render_room():
+    """测试房间描述：显示不改变状态且有缓存，真正观察时才标记痕迹"""
+    print("=== 测试 13: 房间描述缓存 ===")
+    world_file = os.path.join(os.path.dirname(__file__), "world_definition.yaml")
+    game = GameEngine(world_file)
+    game.quiet = True
+    h, z = game.players['H'], game.players['Z']
+    game.next_turn()
+    game.execute_action(z, "move living_room")
+    room = game.world.get_room('living_room')
+    game._leave_trace(room, 'test', "地上有一串脚印。")
+    game.bump_version()
+
+    view = game.render_room(z)
+    assert "地上有一串脚印。" in view
+    assert game.observe(z) is game.observe(z)  # 命中缓存
+    assert not z.observed_traces  # 显示不算看过
+
+    # 对手进出房间、其他房间的变化
+    game.execute_action(h, "wake")
+    game.execute_action(h, "move living_room")
+    assert "H 在这里，而且醒着" in game.render_room(z)
+    game.execute_action(h, "move bathroom")
+    assert game.render_room(z) == view
+
+    # 在别的房间打开物品（open不检查物品在哪里）也要让那个房间的观测失效
+    cabinet = lambda: next(obj for obj in game.observe(z)['objects'] if obj['id'] == 'tv_cabinet')
+    assert h.location != z.location and not cabinet()['open']
+    game.execute_action(h, "open tv_cabinet")
+    assert cabinet()['open'] and game.observe(z) == game._observe(z)
+
+    # look 才标记痕迹，之后不再列出
+    before_look = game.snapshot()
+    assert "地上有一串脚印。" in game.execute_action(z, "look")
+    assert "地上有一串脚印。" not in game.render_room(z)
+    assert game.mark_traces_seen(z) == []
+
+    # 之后留下的痕迹照常列出；回滚到look之前，看过的位置也一起回退
+    game._leave_trace(room, 'scratch', "门锁上有划痕。")
+    game.bump_version()
+    assert [t['description'] for t in game.observe(z)['traces']] == ["门锁上有划痕。"]
+    assert game.mark_traces_seen(z) == [f'scratch_{game.turn_count}']
+    game.restore(before_look)
+    assert [t['description'] for t in game.observe(z)['traces']] == ["地上有一串脚印。"]
+    # 导出再导入后序号继续递增，新痕迹排在后面
+    other = GameEngine(world_file)
+    other.import_state(json.loads(json.dumps(game.export_state())))
+    other_z = other.players['Z']
+    other.mark_traces_seen(other_z)
+    other._leave_trace(other.world.get_room('living_room'), 'scratch', "门锁上有划痕。")
+    other.bump_version()
+    assert [t['description'] for t in other.observe(other_z)['traces']] == ["门锁上有划痕。"]
+    print("✓ 显示房间不消耗痕迹，重复显示命中缓存，look后痕迹标记为已看到，之后只列出新痕迹")
+    print()
+
+def test_observation_model():
+    """测试结构化观测：可以JSON序列化，文字由views渲染"""
+    print("=== 测试 14: 结构化观测 ===")
+    world_file = os.path.join(os.path.dirname(__file__), "world_definition.yaml")
+    game = GameEngine(world_file)
+    game.quiet = True
+    h, z = game.players['H'], game.players['Z']
+    game.next_turn()
+
+    obs = game.observe(z)
+    assert json.loads(json.dumps(obs)) == obs
+    assert obs['room'] == {'id': 'bedroom_z', 'name': game.world.get_room('bedroom_z').name,
+                           'description': game.world.get_room('bedroom_z').description}
+    assert obs['opponent'] is None
+    assert {'id': 'suitcase', 'name': '手提箱', 'open': False, 'locked': True} in obs['objects']
+    assert {'id': 'living_room', 'name': '客厅'} in obs['exits']
+    assert game.render_room(z) == views.render_room(obs)
+    assert "  - 手提箱 (关闭, 上锁)" in game.render_room(z)
+
+    # 物品状态变化后是新的观测，旧的观测对象不变
+    game.execute_action(z, "unlock suitcase with key_z")
+    game.execute_action(z, "open suitcase")
+    assert {'id': 'suitcase', 'name': '手提箱', 'open': True, 'locked': False} in game.observe(z)['objects']
+    assert {'id': 'suitcase', 'name': '手提箱', 'open': False, 'locked': True} in obs['objects']
+    detail = game.examine(game.world.get_object('suitcase'))
+    assert detail['contents'] == [{'id': 'lockpick', 'name': game.world.get_object('lockpick').name}]
+    assert views.render_object(detail).startswith("手提箱 (已打开, 未锁)\n里面有：")
+
+    # 对手在场
+    game.execute_action(z, "move living_room")
+    game.execute_action(h, "wake")
+    game.execute_action(h, "move living_room")
+    assert game.observe(z)['opponent'] == {'name': 'H', 'awake': True}
+    assert "! H 在这里，而且醒着！" in game.render_room(z)
+
+    assert z.status()['location'] == 'living_room'
+    assert z.describe_status().startswith("=== Z (Intruder) ===\nLocation: living_room")
+    print("✓ 观测是纯数据，文字渲染结果和原来的格式一致")
+    print()
+
+def test_trace_expiry():
+    """测试痕迹过期：按回合从堆里清除，永久痕迹保留，快照恢复后一致"""
+    print("=== 测试 15: 痕迹过期 ===")
+    assert [parse_duration(v) for v in (3, '5_turns', '1_turn', 'permanent', None)] == [3, 5, 1, None, None]
+    world_file = os.path.join(os.path.dirname(__file__), "world_definition.yaml")
+    game = GameEngine(world_file)
+    game.quiet = True
+    h = game.players['H']
+    room = game.world.get_room(h.location)
+    game._leave_trace(room, 'wet_footprints', "湿脚印。", '2_turns')
+    game._leave_trace(room, 'dust_outline', "灰尘轮廓。", 'permanent')
+    game.bump_version()
+    assert len(game.world.trace_expiry) == 1  # 永久痕迹不进堆
+    snap = game.snapshot()
+    view = game.observe(h)
+    assert [t['description'] for t in view['traces']] == ["湿脚印。", "灰尘轮廓。"]
+
+    game.next_turn()
+    game.next_turn()  # 第1轮
+    assert len(room.traces) == 2
+    game.next_turn()
+    game.next_turn()  # 第2轮：湿脚印干了
+    assert list(room.traces) == ['dust_outline_0'] and not game.world.trace_expiry
+    assert [t['description'] for t in game.observe(h)['traces']] == ["灰尘轮廓。"]
+
+    game.restore(snap)
+    assert list(room.traces) == ['wet_footprints_0', 'dust_outline_0']
+    assert game.world.trace_expiry == [(2, 'bedroom_h', 'wet_footprints_0')]
+
+    # 导出再导入后仍会按时过期
+    other = GameEngine(world_file)
+    other.import_state(json.loads(json.dumps(game.export_state())))
+    for _ in range(4):
+        other.next_turn()
+    assert list(other.world.get_room('bedroom_h').traces) == ['dust_outline_0']
+    print("✓ 过期痕迹在回合切换时清除，观测随之更新，快照和导入后堆保持一致")
+    print()
+
+def test_trace_rules():
+    """测试痕迹规则：加载世界时编译成按 (动作, 目标类型) 的索引，动作执行时按规则留下痕迹"""
+    print("=== 测试 16: 痕迹规则 ===")
+    world_file = os.path.join(os.path.dirname(__file__), "world_definition.yaml")
+    game = GameEngine(world_file)
+    game.quiet = True
+    h, z = game.players['H'], game.players['Z']
+    index = game.world.trace_index
+
+    # 子类型有专门规则时用专门规则，否则用不限类型的规则
+    assert [r.target_type for r in index.lookup('pick_lock', 'Safe')] == ['Safe']
+    assert [r.target_type for r in index.lookup('pick_lock', 'Door')] == [None]
+    assert [r.trace_id for r in index.lookup('take', 'KeyItem')] == ['dust_outline']
+    assert index.lookup('take', 'Tool') == () and index.lookup('examine') == ()
+    move = index.lookup('move')[0]
+    assert move.duration == 5 and move.describe({'origin': '客厅', 'dest': '浴室'}) == "从客厅到浴室的湿脚印。"
+
+    # 条件编译成只读白名单字段的函数
+    check = compile_condition("actor.location == bathroom and target.type != Door")
+    z.location = 'bathroom'
+    assert check(z, game.world.get_object('suitcase')) and not check(z, game.world.get_object('door_h'))
+    assert not compile_condition("actor.status == wet")(z, None)
+    for bad in ("actor.__class__ == x", "__import__('os')", "actor.name"):
+        try:
+            compile_condition(bad)
+            assert False, bad
+        except ValueError:
+            pass
+
+    # 撬门：门没有专门规则，按通用规则留下划痕
+    game = GameEngine(world_file)
+    game.quiet = True
+    z = game.players['Z']
+    game.next_turn()
+    for command in ["unlock suitcase with key_z", "open suitcase", "take lockpick", "move living_room"]:
+        game.execute_action(z, command)
+    game.next_turn()
+    game.next_turn()
+    assert "你用撬锁器撬开了H的房门" in game.execute_action(z, "pick door_h")
+    traces = list(game.world.get_room('living_room').traces.values())
+    assert [t['description'] for t in traces] == ["H的房门的锁芯上有新鲜的划痕。"]
+    assert traces[0]['expires_at'] is None
+    print("✓ 规则按类型继承编译成索引，条件只能读取白名单字段，动作按规则留下痕迹")
+    print()
+
 def main():
     print("=" * 60)
     print("  WorldShell 功能测试")
@@ -103,6 +485,17 @@ def main():
         test_movement(game)
         test_object_interaction(game)
         test_trace_system(game)
+        test_world_template_clone()
+        test_object_index()
+        test_noise_propagation()
+        test_simulator()
+        test_snapshot_restore()
+        test_mcts_player()
+        test_legal_actions()
+        test_render_room()
+        test_observation_model()
+        test_trace_expiry()
+        test_trace_rules()
         
         print("=" * 60)
         print("✓ 所有测试通过！游戏核心功能正常。")
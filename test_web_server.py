@@ -0,0 +1,852 @@
+#!/usr/bin/env python3
+"""
+Web服务器接口测试（使用Flask测试客户端，不需要启动服务器）
+"""
+
+import sys
+import os
+import json
+import tempfile
+import threading
+import time
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from worldshell import web_server
+from worldshell.ai_worker import AIWorkerPool
+from worldshell.history import GameHistory
+from worldshell.ai_player import AIPlayer
+from worldshell import llm_client, llm_cache
+from worldshell.fake_llm import FakeLLM
+from worldshell.fake_redis import FakeRedis
+from worldshell.session_store import (SessionStore, MemoryStore, SQLiteStore, RedisStore, VersionConflict,
+                                      encode_state)
+
+def _join(role: str, game_id: str, **extra):
+    """创建一个客户端并以指定角色加入游戏"""
+    client = web_server.app.test_client()
+    response = client.post('/api/join', json={'role': role, 'game_id': game_id, **extra})
+    assert response.json['success'], response.json
+    return client
+
+def _read_event(lines) -> dict:
+    """从SSE响应中读取下一条data事件"""
+    for line in lines:
+        line = line.decode('utf-8') if isinstance(line, bytes) else line
+        for part in line.split('\n'):
+            if part.startswith('data: '):
+                return json.loads(part[len('data: '):])
+    return None
+
+def _start_fake_llm(reply='look', delay: float = 0.0, fail_first: int = 0) -> FakeLLM:
+    """启动替身服务器，并通过 LLM_BASE_URL 让之后创建的AIPlayer连到它"""
+    server = FakeLLM(reply, delay, fail_first).start()
+    os.environ['LLM_BASE_URL'] = server.base_url
+    os.environ['LLM_API_KEY'] = 'test'
+    llm_cache.get_cache().clear()  # 新场景，之前缓存的回复不再适用
+    return server
+
+def test_stream_pushes_changes():
+    """测试SSE推送：状态变化时推送，没有变化时不推送"""
+    print("=== 测试 1: 状态推送 ===")
+    game_id = 'test_stream'
+    web_server.games.pop(game_id, None)
+    h = _join('H', game_id)
+    z = _join('Z', game_id)
+
+    response = h.get('/api/stream')
+    assert response.mimetype == 'text/event-stream'
+    lines = response.response
+
+    first = _read_event(lines)
+    assert first['role'] == 'H' and first['is_your_turn']
+
+    # 另一个线程里结束H的回合，推送连接应该收到新状态
+    threading.Timer(0.1, lambda: h.post('/api/end_turn')).start()
+    start = time.perf_counter()
+    second = _read_event(lines)
+    assert second['current_turn'] == 'Z' and not second['is_your_turn']
+    assert time.perf_counter() - start < 2
+    assert second['history'][-1]['action'] == 'turn_change'
+
+    # Z执行动作后H也会收到推送
+    threading.Timer(0.1, lambda: z.post('/api/action', json={'action': 'move', 'target': 'living_room'})).start()
+    third = _read_event(lines)
+    assert third['history'][-1]['player'] == 'Z'
+    response.close()
+    print("✓ 回合切换和对手动作都会立即推送")
+    print()
+
+def test_conditional_get():
+    """测试ETag与304"""
+    print("=== 测试 2: 条件GET ===")
+    game_id = 'test_etag'
+    web_server.games.pop(game_id, None)
+    h = _join('H', game_id)
+    engine = web_server.games[game_id]['engine']
+
+    for path in ('/api/state', '/api/actions'):
+        first = h.get(path)
+        assert first.status_code == 200
+        etag = first.headers['ETag']
+
+        calls = []
+        original = engine.observe
+        engine.observe = lambda player: calls.append(player) or original(player)
+        again = h.get(path, headers={'If-None-Match': etag})
+        engine.observe = original
+        assert again.status_code == 304 and again.headers['ETag'] == etag
+        assert not calls  # 304时不重新观察房间
+
+    etag = h.get('/api/state').headers['ETag']
+    h.post('/api/action', json={'action': 'wait'})
+    changed = h.get('/api/state', headers={'If-None-Match': etag})
+    assert changed.status_code == 200 and changed.headers['ETag'] != etag
+
+    # 不同角色的ETag不同
+    z = _join('Z', game_id)
+    assert z.get('/api/state').headers['ETag'] != h.get('/api/state').headers['ETag']
+    print("✓ 未变化时返回304，变化后返回新内容")
+    print()
+
+def test_ai_worker_pool():
+    """测试AI线程池：间隔不占用线程，同一游戏的任务不并发"""
+    print("=== 测试 3: AI线程池 ===")
+    pool = AIWorkerPool(workers=1)
+    log = []
+
+    def make_job(game_id: str, steps: int):
+        remaining = [steps]
+        def job():
+            log.append((game_id, time.perf_counter()))
+            remaining[0] -= 1
+            return 0.2 if remaining[0] > 0 else None
+        return job
+
+    start = time.perf_counter()
+    for game_id in ('a', 'b', 'c'):
+        pool.submit(game_id, make_job(game_id, 3))
+    pool.submit('a', make_job('a2', 1))  # 同一游戏的第二个任务排在第一个之后
+    while pool.metrics()['games']:
+        time.sleep(0.01)
+    elapsed = time.perf_counter() - start
+
+    # 1个线程、3个游戏各等待2次0.2秒：间隔重叠，总时间接近0.4秒而不是1.2秒
+    assert elapsed < 0.8, elapsed
+    assert [g for g, _ in log].count('a') == 3
+    assert [g for g, _ in log if g in ('a', 'a2')] == ['a', 'a', 'a', 'a2']
+    assert pool.metrics()['completed'] == 4
+    print(f"✓ 1个线程完成3局交错的AI回合，用时 {elapsed:.2f}s")
+
+    # 多局AI对战不会为每个回合新开线程
+    web_server.AI_START_DELAY = 0
+    web_server.MCTS_BUDGET_MS = 20
+    threads_before = threading.active_count()
+    game_ids = [f'test_pool_{i}' for i in range(8)]
+    for game_id in game_ids:
+        web_server.games.pop(game_id, None)
+        _join('Z', game_id, use_ai=True, ai_type='mcts')  # H由AI扮演且先手
+        web_server.games[game_id]['ai_players']['H'].pacing = 0.05
+        assert web_server.games[game_id]['ai_players']['H'].budget_ms == 20  # 按MCTS_BUDGET_MS配置
+    web_server.MCTS_BUDGET_MS = 50
+    assert threading.active_count() <= threads_before + web_server.AI_WORKERS
+
+    deadline = time.perf_counter() + 20
+    while any(web_server.games[g]['engine'].current_turn == 'H' for g in game_ids):
+        assert time.perf_counter() < deadline, web_server.ai_pool.metrics()
+        time.sleep(0.05)
+    while web_server.ai_pool.metrics()['games']:
+        time.sleep(0.01)
+
+    metrics = web_server.app.test_client().get('/api/ai/metrics').json
+    assert metrics['games'] == 0 and metrics['busy'] == 0 and metrics['failed'] == 0
+    assert metrics['completed'] >= len(game_ids)
+    print(f"✓ {len(game_ids)}局AI回合由{metrics['workers']}个线程完成: {metrics}")
+    print()
+
+def test_async_llm_client():
+    """测试异步LLM决策：多局并发、失败重试、总时限"""
+    print("=== 测试 4: 异步LLM客户端 ===")
+    state = {'player_status': {'location': 'living_room', 'ap': 5, 'max_ap': 10,
+                               'state': 'awake', 'inventory': []},
+             'room_view': '客厅'}
+    actions = {'no_target': [{'name': 'wait', 'label': '等待'}], 'with_target': []}
+
+    # 20局同时决策，共用一个事件循环：总时间接近一次请求的延迟
+    server = _start_fake_llm(reply='`move living_room`\n因为客厅更近', delay=0.3)
+    players = [AIPlayer('Z') for _ in range(20)]
+    start = time.perf_counter()
+    futures = [llm_client.submit(p.decide_action_async(state, actions)) for p in players]
+    results = [f.result() for f in futures]
+    elapsed = time.perf_counter() - start
+    assert results == ['move living_room'] * 20
+    assert len(server.requests) == 20
+    assert elapsed < 0.3 * 20 / 4, elapsed
+    print(f"✓ 20个并发决策用时 {elapsed:.2f}s")
+
+    # 同步接口也走同一个客户端
+    assert players[0].decide_action(state, actions) == 'move living_room'
+    server.shutdown()
+
+    # 服务端连续失败两次，第三次成功
+    server = _start_fake_llm(reply='wait', fail_first=2)
+    player = AIPlayer('H')
+    player.retries = 2
+    assert player.decide_action(state, actions) == 'wait'
+    assert len(server.requests) == 3
+    print("✓ 5xx错误后带抖动重试成功")
+    server.shutdown()
+
+    # 程序错误（如回复格式不对）不重试，直接抛出
+    calls = []
+    class BrokenCompletions:
+        async def create(self, **kwargs):
+            calls.append(kwargs)
+            raise KeyError('choices')
+    broken = type('Client', (), {'chat': type('Chat', (), {'completions': BrokenCompletions()})()})()
+    llm_client._clients[('http://broken', 'key')] = broken
+    try:
+        llm_client.run(llm_client.complete('http://broken', 'key', [], model='m', temperature=0, max_tokens=1,
+                                           retries=3, backoff=0.01))
+        assert False, "应该抛出KeyError"
+    except KeyError:
+        pass
+    finally:
+        del llm_client._clients[('http://broken', 'key')]
+    assert len(calls) == 1
+    print("✓ 非暂时性错误不重试")
+
+    # 服务端太慢：在总时限内放弃，返回默认动作
+    server = _start_fake_llm(reply='wait', delay=2)
+    player = AIPlayer('H')
+    player.timeout = 0.5
+    start = time.perf_counter()
+    assert player.decide_action(state, actions) == 'look'
+    assert time.perf_counter() - start < 1.5
+    print("✓ 超过时限时返回默认动作")
+    server.shutdown()
+
+    # 网页对局：LLM请求进行中不占用工作线程，回复后执行动作并结束回合
+    server = _start_fake_llm(reply='wait', delay=0.3)
+    web_server.AI_START_DELAY = 0
+    game_id = 'test_llm_game'
+    web_server.games.pop(game_id, None)
+    _join('Z', game_id, use_ai=True, ai_type='llm')
+    engine = web_server.games[game_id]['engine']
+    time.sleep(0.15)
+    assert web_server.ai_pool.metrics()['awaiting'] == 1
+    assert web_server.ai_pool.metrics()['busy'] == 0
+    deadline = time.perf_counter() + 5
+    while engine.current_turn == 'H':
+        assert time.perf_counter() < deadline
+        time.sleep(0.02)
+    assert web_server.games[game_id]['history'][0]['action'] == 'wait'
+    server.shutdown()
+    print("✓ 网页对局中LLM决策异步进行")
+    print()
+
+def test_llm_cache():
+    """测试LLM回复缓存：LRU淘汰、磁盘持久化、重复局面不再请求"""
+    import tempfile
+    print("=== 测试 5: LLM回复缓存 ===")
+    cache = llm_cache.ResponseCache(capacity=2)
+    keys = [cache.key('m', 0.7, 'Z', 'sys', f'msg{i}') for i in range(3)]
+    assert len(set(keys)) == 3
+    assert keys[0] == cache.key('m', 0.7, 'Z', 'sys', 'msg0')
+    assert keys[0] != cache.key('m', 0.7, 'H', 'sys', 'msg0')
+    assert keys[0] != cache.key('m', 0.2, 'Z', 'sys', 'msg0')
+    cache.put(keys[0], 'look')
+    cache.put(keys[1], 'wait')
+    assert cache.get(keys[0]) == 'look'  # keys[0]变成最近使用
+    cache.put(keys[2], 'sleep')           # 淘汰keys[1]
+    assert cache.get(keys[1]) is None and cache.get(keys[0]) == 'look'
+    assert cache.stats()['hits'] == 2 and cache.stats()['misses'] == 1
+    print("✓ LRU按最近使用淘汰")
+
+    with tempfile.TemporaryDirectory() as path:
+        ResponseCache = llm_cache.ResponseCache
+        ResponseCache(capacity=2, path=path).put(keys[0], 'move living_room')
+        reloaded = ResponseCache(capacity=2, path=path)  # 模拟重启
+        assert reloaded.get(keys[0]) == 'move living_room'
+        assert reloaded.stats()['disk_hits'] == 1
+        assert reloaded.get(keys[0]) == 'move living_room'
+        assert reloaded.stats()['disk_hits'] == 1  # 第二次从内存命中
+    print("✓ 磁盘缓存重启后仍然命中")
+
+    # 重复局面直接用缓存，不发请求
+    server = _start_fake_llm(reply='wait', delay=0.2)
+    state = {'player_status': {'location': 'bedroom_h', 'ap': 6, 'max_ap': 6,
+                               'state': 'awake', 'inventory': []},
+             'room_view': '卧室'}
+    actions = {'no_target': [{'name': 'wait', 'label': '等待'}], 'with_target': []}
+    assert AIPlayer('H').decide_action(state, actions) == 'wait'
+    start = time.perf_counter()
+    assert AIPlayer('H').decide_action(state, actions) == 'wait'
+    assert time.perf_counter() - start < 0.1
+    assert len(server.requests) == 1
+    AIPlayer('Z').decide_action(state, actions)  # 角色不同，不能共用
+    assert len(server.requests) == 2
+    server.shutdown()
+
+    stats = web_server.app.test_client().get('/api/ai/metrics').json['llm_cache']
+    assert stats['hits'] == 1 and stats['misses'] == 2
+    print(f"✓ 重复局面命中缓存: {stats}")
+    print()
+
+def test_plan_mode():
+    """测试计划模式：一次LLM调用执行整个回合，动作失败时重新规划"""
+    print("=== 测试 6: 计划模式 ===")
+    plans = iter([
+        "1. open suitcase\n2. take lockpick\n3. wait",   # 箱子还锁着，第一步会失败
+        "```\nunlock suitcase with key_z\nopen suitcase\ntake lockpick\nwait\n```",
+    ])
+    server = _start_fake_llm(reply=lambda messages: next(plans), delay=0.05)
+    web_server.AI_START_DELAY = 0
+    game_id = 'test_plan'
+    web_server.games.pop(game_id, None)
+    h = _join('H', game_id, use_ai=True, ai_type='llm')
+    game = web_server.games[game_id]
+    ai = game['ai_players']['Z']
+    ai.plan_mode = True
+    ai.pacing = 0
+
+    h.post('/api/end_turn')
+    deadline = time.perf_counter() + 5
+    while game['engine'].current_turn == 'Z':
+        assert time.perf_counter() < deadline, game['history']
+        time.sleep(0.02)
+
+    moves = [(e['action'], e['ok']) for e in game['history'] if e['player'] == 'Z']
+    assert moves == [('open suitcase', False), ('unlock suitcase with key_z', True),
+                     ('open suitcase', True), ('take lockpick', True), ('wait', True)], moves
+    assert ai.llm_calls == 2 and len(server.requests) == 2
+    assert '请规划' in server.requests[0]['messages'][1]['content']
+    assert game['engine'].players['Z'].has_item('lockpick')
+    server.shutdown()
+    print("✓ 5个动作只用了2次LLM请求（第一步失败后重新规划）")
+
+    # 对手突然出现、新回合、计划中的动作不可用时都要重新规划
+    ai.plan = ['move living_room', 'wait']
+    ai._plan_turn = 3
+    ai._plan_alerts = frozenset()
+    actions = {'no_target': [{'name': 'wait'}],
+               'with_target': [{'name': 'move', 'target': 'living_room'}]}
+    calm = {'turn': 3, 'room_view': '=== 客厅 ==='}
+    assert ai._replan_reason(calm, actions, []) is None
+    assert ai._replan_reason({'turn': 4, 'room_view': ''}, actions, [])
+    assert ai._replan_reason({'turn': 3, 'room_view': '! H 在这里，而且醒着！'}, actions, [])
+    assert ai._replan_reason(calm, {'no_target': [{'name': 'wait'}]}, [])
+    print("✓ 对手出现、新回合、动作不可用时重新规划")
+    print()
+
+def test_conversation_mode():
+    """测试对话模式：不重复发送整个对话，每次请求都比完整提示短"""
+    print("=== 测试 7: 对话模式 ===")
+    server = _start_fake_llm(reply='open suitcase')
+    ai = AIPlayer('Z')
+    ai.conversation_mode = True
+    ai.conversation_window = 0
+
+    def state(ap: int, suitcase: str) -> dict:
+        return {'turn': 1,
+                'player_status': {'location': 'bedroom_z', 'ap': ap, 'max_ap': 10,
+                                  'state': 'awake', 'inventory': ['key_z']},
+                'room_view': f"=== Z的卧室 ===\n你看到：\n  - 手提箱 ({suitcase})\n\n可前往：\n  - 客厅 (living_room)"}
+    actions = {'no_target': [{'name': 'wait', 'label': '等待'}],
+               'with_target': [{'name': 'unlock', 'target': 'suitcase', 'extra': 'key_z', 'label': '解锁'}]}
+    opened = {'no_target': [{'name': 'wait', 'label': '等待'}],
+              'with_target': [{'name': 'open', 'target': 'suitcase', 'label': '打开'}]}
+    tokens = lambda messages: sum(llm_client.estimate_tokens(m['content']) for m in messages)
+    history = []
+
+    ai.decide_action(state(10, '关闭, 上锁'), actions, history)
+    first = server.requests[-1]['messages']
+    assert len(first) == 2 and '可用动作' in first[-1]['content']
+
+    history.append({'player': 'Z', 'action': 'unlock suitcase with key_z', 'result': '你解锁了手提箱。'})
+    ai.decide_action(state(8, '关闭, 未锁'), opened, history)
+    second = server.requests[-1]['messages']
+    assert len(second) == 2  # 之前的对话不再重复发送
+    message = second[-1]['content']
+    assert '上一步: unlock suitcase with key_z → 你解锁了手提箱。' in message
+    assert 'AP: 8/10' in message and '手提箱 (关闭, 未锁)' in message
+    assert '可用动作: wait, open suitcase' in message
+    assert tokens(second) < tokens(first)
+
+    history.append({'player': 'Z', 'action': 'open suitcase', 'result': '你打开了手提箱。'})
+    ai.decide_action(state(7, '已打开, 未锁'), opened, history)
+    third = server.requests[-1]['messages']
+    assert len(third) == 3 and third[1]['role'] == 'system'  # 之前的经过在摘要里
+    assert 'unlock suitcase with key_z → 你解锁了手提箱。' in third[1]['content']
+    assert '上一步: open suitcase → 你打开了手提箱。' in third[-1]['content']
+    assert tokens(third) < tokens(first)
+    assert ai.prompt_tokens > 0
+    print(f"✓ 每次请求都比完整提示短（{tokens(second)}、{tokens(third)} tokens，完整提示 {tokens(first)}）")
+
+    # 原样保留最近一轮对话时，上次的状态还在对话里，只发送变化
+    ai = AIPlayer('Z')
+    ai.conversation_mode = True
+    ai.conversation_window = 1
+    ai.cache = None  # 第一次请求和上面的相同，不要命中缓存
+    history = []
+    ai.decide_action(state(10, '关闭, 上锁'), actions, history)
+    first = server.requests[-1]['messages']
+    history.append({'player': 'Z', 'action': 'unlock suitcase with key_z', 'result': '你解锁了手提箱。'})
+    ai.decide_action(state(8, '关闭, 未锁'), opened, history)
+    second = server.requests[-1]['messages']
+    assert second[1:3] == [first[-1], {'role': 'assistant', 'content': 'open suitcase'}]
+    delta = second[-1]['content']
+    assert 'AP: 10 → 8/10' in delta and '手提箱 (关闭, 未锁)' in delta
+    assert '新增可用动作: open suitcase' in delta and '不再可用: unlock suitcase with key_z' in delta
+    assert '客厅' not in delta  # 没变的内容不再发送
+    assert len(ai.conversation_history) == 2
+    server.shutdown()
+    print("✓ 保留的对话里已有的状态只发送变化")
+    print()
+
+def test_game_history():
+    """测试历史记录：整体和每个玩家都只保留最近的记录"""
+    print("=== 测试 8: 历史记录 ===")
+    history = GameHistory(capacity=50, per_player=5)
+    for i in range(10000):
+        history.append({'player': 'HZ'[i % 2] if i % 10 else 'SYSTEM', 'action': str(i)})
+
+    assert len(history) == 50 and history.total == 10000
+    assert [e['action'] for e in history.recent(3)] == ['9997', '9998', '9999']
+    assert history[-1]['action'] == '9999' and history[0]['action'] == '9950'
+    assert [e['action'] for e in history.recent(10, player='Z')] == ['9991', '9993', '9995', '9997', '9999']
+    assert [e['action'] for e in history.recent(2, player='SYSTEM')] == ['9980', '9990']
+    # 很久以前的记录不在整体缓冲里了，但每个玩家仍然保留自己最近的记录
+    assert history.recent(5, player='SYSTEM')[0]['action'] == '9950'
+    assert history.recent(5, player='nobody') == []
+    print("✓ 1万条记录后只保留最近50条，每个玩家最近5条")
+
+    # 网页接口只返回最近10条
+    game_id = 'test_history'
+    web_server.games.pop(game_id, None)
+    h = _join('H', game_id)
+    for _ in range(8):
+        h.post('/api/action', json={'action': 'look'})
+        h.post('/api/end_turn')
+        web_server.games[game_id]['engine'].next_turn()
+    state = h.get('/api/state').json
+    assert len(state['history']) == 10 and state['history'][-1]['action'] == 'turn_change'
+    print("✓ 状态接口返回最近10条")
+    print()
+
+def test_event_log_recovery():
+    """测试事件日志：进程崩溃后从快照和之后的事件恢复游戏"""
+    print("=== 测试 9: 事件日志恢复 ===")
+    game_id = 'test/recovery'  # 带斜杠的ID在文件名里会被转义
+    web_server.games.pop(game_id, None)
+    directory = tempfile.mkdtemp()
+    web_server.GAME_LOG_DIR, web_server.GAME_SNAPSHOT_EVERY = directory, 5
+    try:
+        h = _join('H', game_id)
+        z = _join('Z', game_id)
+        h.post('/api/action', json={'action': 'move', 'target': 'living_room'})
+        h.post('/api/end_turn')
+        for action, target, extra in [('unlock', 'suitcase', 'key_z'), ('open', 'suitcase', None),
+                                      ('take', 'lockpick', None), ('move', 'living_room', None)]:
+            z.post('/api/action', json={'action': action, 'target': target, 'extra': extra})
+        game = web_server.games[game_id]
+        assert os.path.exists(game['log'].snapshot_path)  # 事件超过5个，已经写过快照
+
+        def summary(game):
+            engine = game['engine']
+            return (engine.current_turn, engine.turn_count,
+                    [(p.location, p.ap, p.inventory) for p in engine.players.values()],
+                    engine.export_state()['objects'], engine.export_state()['locations'],
+                    list(game['history']), game['players_joined'], game['token'])
+        expected = summary(game)
+
+        # 模拟崩溃：内存里的游戏丢失，最后一行只写了一半
+        web_server.games.pop(game_id)
+        with open(game['log'].events_path, 'a', encoding='utf-8') as f:
+            f.write('{"seq": 99, "type": "comm')
+        assert web_server.recover_games() == 1
+        assert summary(web_server.games[game_id]) == expected
+        print("✓ 从快照和之后的事件恢复，忽略写了一半的最后一行")
+
+        # 恢复后继续写日志，再次恢复仍然一致
+        z.post('/api/end_turn')
+        expected = summary(web_server.games[game_id])
+        web_server.games.pop(game_id)
+        assert summary(web_server.get_or_create_game(game_id)) == expected
+        print("✓ 恢复的游戏可以继续进行")
+
+        z.post('/api/restart', json={'game_id': game_id})
+        assert not os.listdir(directory)
+    finally:
+        web_server.GAME_LOG_DIR = ''
+    print("✓ 重置游戏后删除日志")
+    print()
+
+def test_session_store():
+    """测试共享存储：三种后端的乐观锁，以及两个进程服务同一局游戏"""
+    print("=== 测试 10: 共享存储 ===")
+    # 缺少方法的后端在创建时就报错
+    class Incomplete(SessionStore):
+        def version(self, game_id):
+            return None
+    try:
+        Incomplete()
+        assert False, "缺少方法的后端不应该能创建"
+    except TypeError:
+        pass
+
+    redis = FakeRedis().start()
+    backends = {
+        'memory': lambda: MemoryStore(),
+        'sqlite': lambda: SQLiteStore(os.path.join(tempfile.mkdtemp(), 'games.db')),
+        'redis': lambda: RedisStore('127.0.0.1', redis.port),
+    }
+    for name, create in backends.items():
+        store = create()
+        assert store.version('g') is None and store.load('g') is None
+        assert store.save('g', {'n': 0}, 0) == 1
+        try:
+            store.save('g', {'n': 99}, 0)  # 另一个进程也以为是新游戏
+            assert False, "应该版本冲突"
+        except VersionConflict:
+            pass
+        assert store.load('g') == (1, {'n': 0})
+
+        # 多个线程（各自的连接）同时 读-改-写，冲突时重新读，结果不丢失
+        def worker():
+            for _ in range(25):
+                while True:
+                    version, state = store.load('g')
+                    try:
+                        store.save('g', {'n': state['n'] + 1}, version)
+                        break
+                    except VersionConflict:
+                        pass
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert store.load('g') == (101, {'n': 100}) and store.version('g') == 101
+        assert store.game_ids() == ['g']
+        store.delete('g')
+        assert store.version('g') is None and store.game_ids() == []
+        print(f"✓ {name}: 4个线程并发写入100次，没有丢失")
+    redis.shutdown()
+
+    # 两个进程（各自的games字典）共用一个存储
+    game_id = 'test_store'
+    original_games, original_store = web_server.games, web_server.store
+    process_a, process_b = {}, {}
+    web_server.store = SQLiteStore(os.path.join(tempfile.mkdtemp(), 'games.db'))
+    try:
+        web_server.games = process_a
+        h = _join('H', game_id)
+        h.post('/api/action', json={'action': 'move', 'target': 'living_room'})
+        web_server.games = process_b
+        z = _join('Z', game_id)
+        assert process_b[game_id]['engine'].players['H'].location == 'living_room'
+        h.post('/api/end_turn')  # 在进程B处理H的请求
+        web_server.games = process_a
+        assert z.get('/api/state').json['is_your_turn']  # 进程A读到进程B的改动
+
+        # 进程A拿着旧版本写入：冲突，本地改动被丢弃
+        game_a = process_a[game_id]
+        web_server.games = process_b
+        z.post('/api/action', json={'action': 'wait'})
+        web_server.games = process_a
+        game_a['engine'].execute_action(game_a['engine'].players['Z'], 'move living_room')
+        web_server._log_event(game_a, {'type': 'command', 'role': 'Z', 'command': 'move living_room'})
+        try:
+            web_server._save_game(game_id, game_a)
+            assert False, "应该版本冲突"
+        except VersionConflict:
+            pass
+        assert game_a['engine'].players['Z'].location == 'bedroom_z'
+        assert game_a['engine'].current_turn == 'H'  # 换成了进程B写入的状态（Z等待后轮到H）
+        size = len(encode_state(web_server._export_game(game_a)))
+        print(f"✓ 两个进程交替处理同一局游戏，旧版本写入被拒绝（状态 {size} 字节）")
+
+        # 进程B重置游戏后，进程A也不再使用旧的实例
+        web_server.games = process_b
+        z.post('/api/restart', json={'game_id': game_id})
+        web_server.games = process_a
+        web_server.get_or_create_game(game_id)
+        assert game_a['cancelled'] and process_a[game_id] is not game_a
+    finally:
+        web_server.games, web_server.store = original_games, original_store
+    print()
+
+def _client_as(role: str, game_id: str):
+    """已加入游戏的角色再开一个客户端（同一个玩家的多个并发请求）"""
+    client = web_server.app.test_client()
+    with client.session_transaction() as sess:
+        sess['role'], sess['game_id'] = role, game_id
+    return client
+
+def test_game_lock():
+    """测试游戏锁：并发的回合切换不会丢失或重复，不同游戏互不阻塞"""
+    print("=== 测试 11: 游戏锁 ===")
+    game_id = 'test_lock'
+    web_server.games.pop(game_id, None)
+    _join('H', game_id)
+    _join('Z', game_id)
+    game = web_server.games[game_id]
+    history_before = game['history'].total
+
+    # 两个角色各4个线程，不停地结束自己的回合（只有轮到自己时才会成功）
+    results = []
+    def spam(role):
+        client = _client_as(role, game_id)
+        for _ in range(100):
+            response = client.post('/api/end_turn')
+            results.append((role, response.status_code))
+    threads = [threading.Thread(target=spam, args=(role,)) for role in 'HZ' for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    switches = [r for r in results if r[1] == 200]
+    assert len(results) == 800 and len(switches) > 10
+    assert game['history'].total - history_before == len(switches)  # 每次成功恰好切换一次
+    # 回合严格交替（从后往前看），没有同一个玩家连续结束两次
+    changes = [e['result'] for e in game['history'].recent(len(switches))]
+    for i, change in enumerate(reversed(changes)):
+        assert change == f"现在轮到 {'HZ'[(len(switches) - i) % 2]}", (i, change)
+    assert game['engine'].current_turn == 'HZ'[len(switches) % 2]
+    print(f"✓ 800个并发请求，{len(switches)}次回合切换，没有丢失或重复")
+
+    # 一局游戏的锁被占用时，另一局游戏的请求照常处理
+    other_id = next(f'test_lock_{i}' for i in range(100)
+                    if web_server._game_lock(f'test_lock_{i}') is not web_server._game_lock(game_id))
+    web_server.games.pop(other_id, None)
+    other = _join('H', other_id)
+    blocked = _client_as('H', game_id)
+    done = []
+    with web_server._game_lock(game_id):
+        t = threading.Thread(target=lambda: done.append(blocked.get('/api/state').status_code))
+        t.start()
+        assert other.post('/api/end_turn').status_code == 200
+        t.join(0.2)
+        assert not done  # 同一局游戏的请求在等锁
+    t.join()
+    assert done == [200]
+    print("✓ 不同游戏并行处理，同一游戏串行")
+    print()
+
+def test_idle_eviction():
+    """测试空闲游戏回收：TTL过期、数量上限、写到磁盘后下次请求恢复，以及内存统计"""
+    print("=== 测试 12: 空闲游戏回收 ===")
+    saved = (web_server.games, web_server.GAME_IDLE_TTL, web_server.MAX_GAMES, web_server.GAME_SPILL_DIR)
+    web_server.games = {}
+    web_server.GAME_IDLE_TTL, web_server.MAX_GAMES = 60, 3
+    web_server.GAME_SPILL_DIR = tempfile.mkdtemp()
+    try:
+        h = _join('H', 'idle_0')
+        h.post('/api/action', json={'action': 'move', 'target': 'living_room'})
+        h.post('/api/end_turn')
+        for i in range(1, 4):
+            _join('H', f'idle_{i}')
+        # 超过3局：最久没用的idle_0被写到磁盘并移出内存
+        assert sorted(web_server.games) == ['idle_1', 'idle_2', 'idle_3']
+        assert os.listdir(web_server.GAME_SPILL_DIR) == ['idle_0.json']
+
+        # 下次请求时恢复，ETag接着原来的版本
+        state = h.get('/api/state').json
+        assert state['player_status']['location'] == 'living_room' and state['current_turn'] == 'Z'
+        assert state['history'][-1]['action'] == 'turn_change' and state['version'] > 0
+        assert os.listdir(web_server.GAME_SPILL_DIR) == ['idle_1.json']  # 给它腾位置
+        assert sorted(web_server.games) == ['idle_0', 'idle_2', 'idle_3']
+        print("✓ 超过数量上限时回收最久没用的游戏，下次请求从磁盘恢复")
+
+        # 超过TTL的游戏被回收，有推送连接的不回收
+        web_server.games['idle_2']['last_access'] -= 120
+        web_server.games['idle_3']['last_access'] -= 120
+        web_server.games['idle_3']['streams'] = 1
+        assert web_server.evict_idle_games() == 1
+        assert 'idle_2' not in web_server.games and 'idle_3' in web_server.games
+        web_server.games['idle_3']['streams'] = 0
+        web_server.get_or_create_game('idle_1')
+        print("✓ 空闲超过TTL的游戏被回收，有连接的游戏保留")
+
+        # 没有事件日志、共享存储和回收目录时，回收的游戏无法恢复，所以不回收
+        spill_dir, web_server.GAME_SPILL_DIR = web_server.GAME_SPILL_DIR, ''
+        web_server.games['idle_3']['last_access'] -= 120
+        _join('H', 'idle_4')
+        assert web_server.evict_idle_games() == 0
+        assert sorted(web_server.games) == ['idle_0', 'idle_1', 'idle_3', 'idle_4']
+        web_server.GAME_SPILL_DIR = spill_dir
+        assert web_server.evict_idle_games() == 1  # 过期的idle_3（回收后也不再超出上限）
+        assert sorted(web_server.games) == ['idle_0', 'idle_1', 'idle_4']
+        print("✓ 回收后无法恢复的游戏不回收")
+
+        # 内存统计：历史更长的游戏更大，共用的世界模板不计入
+        for _ in range(100):
+            web_server._add_history(web_server.games['idle_0'], {'player': 'SYSTEM', 'action': 'x' * 100})
+        report = h.get('/api/games/memory').json
+        sizes = {game_id: item['bytes'] for game_id, item in report['games'].items()}
+        assert report['count'] == 3 and report['total_bytes'] == sum(sizes.values())
+        assert sizes['idle_0'] > sizes['idle_1'] + 100 * 100
+        assert sizes['idle_1'] < 200 * 1024
+        print(f"✓ 内存统计: {sizes}")
+    finally:
+        web_server.games, web_server.GAME_IDLE_TTL, web_server.MAX_GAMES, web_server.GAME_SPILL_DIR = saved
+    print()
+
+def test_batch_actions():
+    """测试批量动作：一次请求执行多个命令，遇到失败就停止，返回状态和可用动作"""
+    print("=== 测试 13: 批量动作 ===")
+    game_id = 'test_batch'
+    web_server.games.pop(game_id, None)
+    h = _join('H', game_id)
+    z = _join('Z', game_id)
+    h.post('/api/end_turn')
+
+    response = z.post('/api/actions/batch', json={'commands': [
+        'unlock suitcase with key_z',
+        {'action': 'open', 'target': 'suitcase'},
+        'take lockpick',
+        'take lockpick',  # 已经拿过了，失败
+        'move living_room',
+    ]}).json
+    assert not response['success'] and response['applied'] == 3
+    assert [r['ok'] for r in response['results']] == [True, True, True, False]
+    assert response['results'][1]['command'] == 'open suitcase'
+    # 返回执行后的状态和可用动作，不需要再请求
+    assert 'lockpick' in response['state']['player_status']['inventory']
+    assert response['state']['player_status']['location'] == 'bedroom_z'
+    actions = [(a['name'], a['target']) for a in response['actions']['with_target']]
+    assert ('move', 'living_room') in actions and ('take', 'lockpick') not in actions
+    history = web_server.games[game_id]['history'].recent(4, player='Z')
+    assert [e['action'] for e in history] == ['unlock suitcase with key_z', 'open suitcase',
+                                              'take lockpick', 'take lockpick']
+    print("✓ 遇到第一个失败的命令停止，之前的命令保留，返回结果、状态和可用动作")
+
+    response = z.post('/api/actions/batch', json={'commands': ['move living_room', 'look'],
+                                                  'end_turn': True}).json
+    assert response['success'] and response['state']['current_turn'] == 'H'
+    # 等待会结束回合，后面的命令不再执行
+    response = h.post('/api/actions/batch', json={'commands': ['wait', 'look']}).json
+    assert len(response['results']) == 1 and not response['success'] and response['applied'] == 1
+    assert response['state']['current_turn'] == 'Z'
+    assert h.post('/api/actions/batch', json={'commands': ['look']}).status_code == 400  # 不是H的回合
+    assert z.post('/api/actions/batch', json={'commands': []}).status_code == 400
+    print("✓ 全部成功后结束回合；等待或回合结束后不再执行")
+    print()
+
+def _apply_sync(local: dict, data: dict) -> dict:
+    """和 static/game.js 的 applySync 相同：把增量合并到本地副本"""
+    if data.get('unchanged'):
+        return local
+    if data.get('full'):
+        return {'version': data['version'], 'state': data['state'], 'actions': data['actions']}
+    local['state'].update(data['changed'])
+    local['state']['player_status'].update(data['player_status'])
+    local['state']['observation'].update(data['observation'])
+    local['state']['history'] = (local['state']['history'] + data['history'])[-10:]
+    removed = set(data['actions_removed'])
+    local['actions'] = [a for a in local['actions'] if a['command'] not in removed] + data['actions_added']
+    local['version'] = data['version']
+    return local
+
+def test_sync_delta():
+    """测试增量同步：合并增量后和完整状态一致，且比完整状态小"""
+    print("=== 测试 14: 增量同步 ===")
+    game_id = 'test_sync'
+    web_server.games.pop(game_id, None)
+    h = _join('H', game_id)
+    z = _join('Z', game_id)
+
+    def sync(client, local):
+        since = f"?since={local['version']}" if local else ''
+        response = client.get('/api/sync' + since)
+        return _apply_sync(local, response.json), len(response.data)
+
+    def check(client, local):
+        response = client.get('/api/sync')
+        full = response.json
+        assert full['full']
+        strip = lambda state: {k: v for k, v in state.items() if k != 'version'}
+        assert strip(local['state']) == strip(full['state'])
+        assert sorted(a['command'] for a in local['actions']) == sorted(a['command'] for a in full['actions'])
+        return len(response.data)
+
+    local = {'H': None, 'Z': None}
+    sizes = []
+    local['H'], _ = sync(h, None)
+    local['Z'], _ = sync(z, None)
+    h.post('/api/end_turn')
+    for command in ['unlock suitcase with key_z', 'open suitcase', 'take lockpick', 'move living_room',
+                    'move bathroom', 'look']:
+        result = z.post('/api/actions/batch', json={'commands': [command]}).json
+        assert result['results'][0]['ok'], command
+        delta = z.get(f"/api/sync?since={local['Z']['version']}").json
+        if command == 'open suitcase':
+            # 房间没换，观测里只有物品列表变了
+            assert list(delta['observation']) == ['objects']
+        elif command.startswith('move '):
+            # 换了房间：增量里有新的位置和新房间的观测
+            room_id = command.split()[1]
+            assert delta['player_status']['location'] == room_id
+            assert delta['observation']['room']['id'] == room_id
+            engine = web_server.games[game_id]['engine']
+            assert delta['observation']['exits'] == engine.observe(engine.players['Z'])['exits']
+        for role, client in (('H', h), ('Z', z)):
+            local[role], size = sync(client, local[role])
+            sizes.append((size, check(client, local[role])))
+    assert z.get(f"/api/sync?since={local['Z']['version']}").json == {'version': local['Z']['version'],
+                                                                      'unchanged': True}
+    # 每次增量都比同一版本的完整状态小
+    assert all(size < full_size for size, full_size in sizes)
+    delta_total, full_total = sum(size for size, _ in sizes), sum(full for _, full in sizes)
+    print(f"✓ 合并增量后和完整状态一致，增量共 {delta_total} 字节（完整状态共 {full_total} 字节）")
+
+    # 落后太多（新的历史记录超过状态里保留的条数）时发送完整状态
+    version = local['H']['version']
+    for _ in range(6):
+        z.post('/api/action', json={'action': 'look'})
+        z.post('/api/end_turn')
+        h.post('/api/end_turn')
+    data = h.get(f'/api/sync?since={version}').json
+    assert data['full']
+    assert h.get('/api/sync?since=unknown').json['full']
+    print("✓ 版本太旧或未知时发送完整状态")
+    print()
+
+def main():
+    print("=" * 60)
+    print("  WorldShell Web接口测试")
+    print("=" * 60)
+    print()
+
+    try:
+        test_stream_pushes_changes()
+        test_conditional_get()
+        test_ai_worker_pool()
+        test_async_llm_client()
+        test_llm_cache()
+        test_plan_mode()
+        test_conversation_mode()
+        test_game_history()
+        test_event_log_recovery()
+        test_session_store()
+        test_game_lock()
+        test_idle_eviction()
+        test_batch_actions()
+        test_sync_delta()
+
+        print("=" * 60)
+        print("✓ 所有测试通过！")
+        print("=" * 60)
+    except Exception as e:
+        print(f"✗ 测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return 1
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
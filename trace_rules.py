@@ -0,0 +1,164 @@
+"""
+Trace Rules Module - 把世界定义里的 trace_rules 编译成按 (动作, 目标类型) 索引的规则表
+加载世界时编译一次：条件编译成只能读取白名单字段的判断函数，描述模板预先拆好，
+执行动作时直接查表（O(1)），不再每次解释规则。
+
+规则格式（world_definition.yaml）：
+    - action: pick_lock          # 动作名（引擎的 action_* 方法名）
+      target_type: Safe          # 目标物品类型，子类型同样适用；不写表示任何目标（或没有目标的动作）
+      condition: "actor.status == wet"   # 可选，见 compile_condition
+      noise_level: 5             # 可选，动作产生的噪音
+      trace:
+        id: "scratch_marks"
+        description: "{target}的锁芯上有新鲜的划痕。"   # {}里是动作提供的参数，如 target、origin、dest
+        duration: 5_turns        # 可选，见 parse_duration，默认永久
+
+某个类型自己（或最近的父类型）有这个动作的规则时只用这些规则，否则用不限类型的规则。
+"""
+
+import re
+from string import Formatter
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+# 条件里可以读取的字段：actor 是执行动作的玩家，target 是目标物品（没有目标时为None）
+ACTOR_FIELDS: Dict[str, Callable[[Any], Any]] = {
+    'name': lambda player: player.name,
+    'location': lambda player: player.location,
+    'state': lambda player: player.state.value,
+    'status': lambda player: player.state.value,
+    'ap': lambda player: player.ap,
+}
+TARGET_FIELDS: Dict[str, Callable[[Any], Any]] = {
+    'id': lambda obj: obj.id,
+    'type': lambda obj: obj.type,
+    'name': lambda obj: obj.name,
+}
+
+def parse_duration(value) -> Optional[int]:
+    """痕迹持续的回合数：整数、"5_turns" 或 "permanent"（返回None，永不过期）"""
+    if value is None or value == 'permanent':
+        return None
+    if isinstance(value, int):
+        return value
+    count, _, unit = str(value).partition('_')
+    if unit in ('turn', 'turns') and count.isdigit():
+        return int(count)
+    raise ValueError(f"无法解析的痕迹持续时间: {value!r}")
+
+_COMPARISON = re.compile(r'^\s*(\S+)\s*(==|!=)\s*(\S+)\s*$')
+
+class TraceRule(NamedTuple):
+    """编译后的规则（不可变，同一个世界模板复制出的所有游戏共用）"""
+    action: str
+    target_type: Optional[str]
+    condition: Optional[Callable[[Any, Any], bool]]  # (actor, target) -> bool，None表示总是适用
+    noise_level: int
+    trace_id: Optional[str]
+    template: Tuple[Tuple[str, Optional[str]], ...]  # (文字, 参数名) 片段
+    duration: Optional[int]  # 持续的回合数，None表示永久
+
+    def applies(self, actor, target=None) -> bool:
+        return self.condition is None or self.condition(actor, target)
+
+    def describe(self, params: Dict[str, str]) -> str:
+        """用动作提供的参数填充描述模板（动作没有提供的参数原样保留）"""
+        return ''.join(text + (params.get(field, f"{{{field}}}") if field else '') for text, field in self.template)
+
+def _operand(token: str) -> Callable[[Any, Any], Any]:
+    """条件里的一个操作数：actor.字段、target.字段，或者字面量（数字、带引号或不带引号的字符串）"""
+    owner, dot, field = token.partition('.')
+    if dot and owner in ('actor', 'target'):
+        fields = ACTOR_FIELDS if owner == 'actor' else TARGET_FIELDS
+        getter = fields.get(field)
+        if getter is None:
+            raise ValueError(f"条件里不支持的字段: {token}")
+        if owner == 'actor':
+            return lambda actor, target: getter(actor)
+        return lambda actor, target: getter(target) if target is not None else None
+    if token[:1] in '"\'' and token[-1:] == token[:1] and len(token) >= 2:
+        value = token[1:-1]
+    elif re.fullmatch(r'-?\d+', token):
+        value = int(token)
+    else:
+        value = token
+    return lambda actor, target: value
+
+def compile_condition(condition: Optional[str]) -> Optional[Callable[[Any, Any], bool]]:
+    """
+    把条件编译成判断函数。只支持用 and 连接的比较（== 或 !=），不会执行任意代码
+
+    例如 "actor.status == wet"、"target.type != Door and actor.location == bathroom"
+    """
+    if not condition:
+        return None
+    checks = []
+    for part in re.split(r'\s+and\s+', condition.strip()):
+        match = _COMPARISON.match(part)
+        if not match:
+            raise ValueError(f"无法解析的条件: {condition!r}")
+        left, operator, right = _operand(match.group(1)), match.group(2), _operand(match.group(3))
+        if operator == '==':
+            checks.append(lambda actor, target, l=left, r=right: l(actor, target) == r(actor, target))
+        else:
+            checks.append(lambda actor, target, l=left, r=right: l(actor, target) != r(actor, target))
+    if len(checks) == 1:
+        return checks[0]
+    return lambda actor, target: all(check(actor, target) for check in checks)
+
+def compile_template(description: str) -> Tuple[Tuple[str, Optional[str]], ...]:
+    """预先拆分描述模板，如 "从{origin}到{dest}" -> (("从", "origin"), ("到", "dest"))"""
+    parts = []
+    for text, field, spec, conversion in Formatter().parse(description):
+        if spec or conversion:
+            raise ValueError(f"描述模板不支持格式说明: {description!r}")
+        parts.append((text, field or None))
+    return tuple(parts)
+
+def compile_rule(data: Dict[str, Any]) -> TraceRule:
+    trace = data.get('trace') or {}
+    return TraceRule(
+        action=data['action'],
+        target_type=data.get('target_type'),
+        condition=compile_condition(data.get('condition')),
+        noise_level=data.get('noise_level', 0),
+        trace_id=trace.get('id'),
+        template=compile_template(trace.get('description', '')),
+        duration=parse_duration(trace.get('duration', 'permanent')),
+    )
+
+class TraceRuleIndex:
+    """按 (动作, 目标类型) 查找规则。类型继承在编译时展开，查找只是一次字典访问"""
+
+    def __init__(self, rules: List[Dict[str, Any]], object_types: Dict[str, Dict[str, Any]]):
+        compiled = [compile_rule(rule) for rule in rules]
+        by_key: Dict[Tuple[str, Optional[str]], List[TraceRule]] = {}
+        for rule in compiled:
+            by_key.setdefault((rule.action, rule.target_type), []).append(rule)
+
+        self._index: Dict[Tuple[str, Optional[str]], Tuple[TraceRule, ...]] = {}
+        for action in {rule.action for rule in compiled}:
+            untyped = tuple(by_key.get((action, None), ()))
+            self._index[(action, None)] = untyped
+            for type_name in object_types:
+                rules = untyped
+                for ancestor in self._ancestors(type_name, object_types):
+                    if (action, ancestor) in by_key:
+                        rules = tuple(by_key[(action, ancestor)])
+                        break
+                self._index[(action, type_name)] = rules
+
+    @staticmethod
+    def _ancestors(type_name: str, object_types: Dict[str, Dict[str, Any]]) -> List[str]:
+        """类型自己和它的父类型（由近到远）"""
+        chain = []
+        while type_name and type_name not in chain:
+            chain.append(type_name)
+            type_name = object_types.get(type_name, {}).get('inherits')
+        return chain
+
+    def lookup(self, action: str, target_type: Optional[str] = None) -> Tuple[TraceRule, ...]:
+        """适用于这个动作和目标类型的规则（还要再检查各自的条件）"""
+        rules = self._index.get((action, target_type))
+        if rules is None:
+            rules = self._index.get((action, None), ())
+        return rules
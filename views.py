@@ -0,0 +1,86 @@
+"""
+Views Module - 把引擎的结构化观测渲染成文字
+引擎只产生结构化的观测（GameEngine.observe / examine、Player.status，都是可以直接JSON序列化的dict），
+文字由这里的渲染函数生成：命令行、动作结果和LLM提示词都用它们，网页端在 static/game.js 里有同样格式的渲染。
+
+房间观测的格式：
+    {
+        'room': {'id', 'name', 'description'} 或 None（玩家不在任何房间）,
+        'opponent': {'name', 'awake'} 或 None（对手不在这个房间）,
+        'objects': [物品视图, ...],
+        'traces': [{'id', 'description'}, ...]（只有还没看过的痕迹）,
+        'exits': [{'id', 'name'}, ...]
+    }
+物品视图: {'id', 'name'}，容器另有 'open'，可上锁的另有 'locked'；
+仔细检查时打开的不透明容器另有 'contents': [{'id', 'name'}, ...]
+"""
+
+from typing import Any, Dict
+
+ROLE_NAMES = {'H': 'Housekeeper', 'Z': 'Intruder'}
+
+def describe_object(view: Dict[str, Any]) -> str:
+    """物品名称和状态，如 "手提箱 (关闭, 上锁)" """
+    status = []
+    if 'open' in view:
+        status.append("已打开" if view['open'] else "关闭")
+    if 'locked' in view:
+        status.append("上锁" if view['locked'] else "未锁")
+    if status:
+        return f"{view['name']} ({', '.join(status)})"
+    return view['name']
+
+def render_room(observation: Dict[str, Any]) -> str:
+    """房间观测的文字版本"""
+    room = observation['room']
+    if not room:
+        return "你无处可去。"
+
+    lines = [f"=== {room['name']} ===", room['description'], ""]
+
+    opponent = observation['opponent']
+    if opponent:
+        if opponent['awake']:
+            lines.append(f"! {opponent['name']} 在这里，而且醒着！")
+        else:
+            lines.append(f"{opponent['name']} 在这里睡觉。")
+
+    if observation['objects']:
+        lines.append("你看到：")
+        lines.extend(f"  - {describe_object(obj)}" for obj in observation['objects'])
+
+    if observation['traces']:
+        lines.append("\n你注意到一些异常：")
+        lines.extend(f"  - {trace['description']}" for trace in observation['traces'])
+
+    if observation['exits']:
+        lines.append("\n可前往：")
+        lines.extend(f"  - {exit['name']} ({exit['id']})" for exit in observation['exits'])
+
+    return '\n'.join(lines)
+
+def render_object(view: Dict[str, Any]) -> str:
+    """仔细检查物品（examine）的文字版本"""
+    lines = [describe_object(view)]
+    if 'open' in view:
+        if view.get('locked'):
+            lines.append("它被锁住了。")
+        elif not view['open']:
+            lines.append("它是关着的。")
+        elif 'contents' in view:
+            if view['contents']:
+                lines.append("里面有：")
+                lines.extend(f"  - {item['name']}" for item in view['contents'])
+            else:
+                lines.append("里面是空的。")
+    return '\n'.join(lines)
+
+def render_status(status: Dict[str, Any]) -> str:
+    """玩家状态（Player.status）的文字版本"""
+    return '\n'.join([
+        f"=== {status['name']} ({ROLE_NAMES.get(status['name'], status['name'])}) ===",
+        f"Location: {status['location']}",
+        f"AP: {status['ap']}/{status['max_ap']}",
+        f"State: {status['state']}",
+        f"Inventory: {', '.join(status['inventory']) if status['inventory'] else 'Empty'}"
+    ])
@@ -1,40 +1,401 @@
-from flask import Flask, render_template, jsonify, request, session
+from flask import Flask, Response, render_template, jsonify, request, session, stream_with_context
 from flask_cors import CORS
+import functools
+import json
 import os
 import sys
 import secrets
 import threading
 import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Union
+from urllib.parse import quote
 
 # Add parent directory to path for imports
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from worldshell.engine import GameEngine
+from worldshell.engine import GameEngine, QUERY_ACTIONS
 from worldshell.player import Player
 from worldshell.ai_player import AIPlayer
+from worldshell.mcts_player import MCTSPlayer
+from worldshell.ai_worker import AIWorkerPool
+from worldshell.history import GameHistory
+from worldshell.event_log import EventLog
+from worldshell import event_log
+from worldshell import llm_client, llm_cache
+from worldshell import session_store
+from worldshell import footprint
+from worldshell.world import cached_templates
+from worldshell.session_store import VersionConflict
 
 app = Flask(__name__, 
             static_folder='static',
             template_folder='templates')
-app.secret_key = secrets.token_hex(16)
+# 设置固定的SECRET_KEY后，服务器重启前登录的玩家仍然有效（配合事件日志恢复游戏）
+app.secret_key = os.getenv('SECRET_KEY') or secrets.token_hex(16)
 CORS(app)
+# 响应里的中文直接用UTF-8（不转义成\uXXXX，和推送连接一致），房间观测等内容小一半
+app.json.ensure_ascii = False
 
-# 游戏实例存储（简单实现，生产环境应该用Redis等）
+# 本进程的游戏实例（配置了共享存储时相当于存储的缓存，每次请求先检查版本）
 games = {}
 
+# 共享的游戏状态存储：多个服务器进程服务同一局游戏时设置（见 session_store.py），不设置则只在本进程内存里
+SESSION_STORE = os.getenv('SESSION_STORE', '')
+store = session_store.open_store(SESSION_STORE) if SESSION_STORE else None
+
+# 使用共享存储时，推送连接检查其他进程改动的间隔（秒）
+STORE_POLL_INTERVAL = 1.0
+
+# 空闲游戏的回收：超过GAME_IDLE_TTL秒没有请求的游戏，以及超过MAX_GAMES局时最久没用的游戏，
+# 从内存中移除（0表示不限），下次请求时从事件日志、共享存储或GAME_SPILL_DIR（回收前把游戏写到这个目录）恢复。
+# 三者都没有配置时不回收：回收后无法恢复，回来的玩家会得到一局新游戏
+GAME_IDLE_TTL = float(os.getenv('GAME_IDLE_TTL', '3600'))
+MAX_GAMES = int(os.getenv('MAX_GAMES', '1000'))
+GAME_SPILL_DIR = os.getenv('GAME_SPILL_DIR', '')
+GAME_SWEEP_INTERVAL = 60  # 检查空闲游戏的最小间隔（秒）
+_last_sweep = time.monotonic()
+
+# 推送连接空闲时发送保活消息的间隔（秒）
+STREAM_KEEPALIVE = 15
+
+# AI工作线程数（所有游戏共用），以及轮到AI后开始行动前的延迟（让前端有时间更新）
+AI_WORKERS = int(os.getenv('AI_WORKERS', '4'))
+AI_START_DELAY = float(os.getenv('AI_START_DELAY', '1'))
+
+ai_pool = AIWorkerPool(AI_WORKERS)
+
+# 传给AI的自己的历史记录条数
+AI_HISTORY_LENGTH = 10
+
+# 本地MCTS AI每次决策的时间预算（毫秒）
+MCTS_BUDGET_MS = int(os.getenv('MCTS_BUDGET_MS', '50'))
+
+# 不改变局面的动作（执行后局面不变也不算失败）
+INFO_ACTIONS = QUERY_ACTIONS + ('examine', 'wait')
+
+# 执行后自动结束回合的动作
+AUTO_END_ACTIONS = ('wait', 'sleep')
+
+# 批量接口一次最多执行的命令数
+MAX_BATCH_COMMANDS = 20
+
+# 增量同步：每个角色保留最近几个版本的状态作为基准，客户端的版本太旧时发送完整状态
+SYNC_BASES = 8
+# 增量里按字段比较的嵌套部分（其他字段整个比较）
+SYNC_NESTED = ('player_status', 'observation')
+
+# 事件日志目录：设置后每局游戏的命令和回合切换都写入日志，服务器重启后可以恢复；不设置则只保存在内存里
+GAME_LOG_DIR = os.getenv('GAME_LOG_DIR', '')
+GAME_LOG_SYNC = os.getenv('GAME_LOG_SYNC', 'flush')  # fsync / flush / buffer，见 event_log.py
+GAME_SNAPSHOT_EVERY = int(os.getenv('GAME_SNAPSHOT_EVERY', '50'))  # 每多少个事件写一次快照
+
+WORLD_FILE = os.path.join(os.path.dirname(__file__), "world_definition.yaml")
+
+# 游戏锁的条数：按游戏ID的哈希分配，同一局游戏的请求和AI线程串行，不同的游戏基本上互不影响
+GAME_LOCK_STRIPES = 64
+_game_locks = [threading.RLock() for _ in range(GAME_LOCK_STRIPES)]
+
+def _game_lock(game_id: str) -> threading.RLock:
+    """一局游戏的锁（可重入）。所有读写引擎的代码都要持有它，包括创建和删除游戏"""
+    return _game_locks[hash(game_id) % GAME_LOCK_STRIPES]
+
+def _session_game_id() -> str:
+    return session.get('game_id', 'default')
+
+def _body_game_id() -> str:
+    return (request.get_json(silent=True) or {}).get('game_id', 'default')
+
+def _locked(get_game_id):
+    """接口装饰器：整个请求持有对应游戏的锁"""
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            with _game_lock(get_game_id()):
+                return view(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def _new_game() -> dict:
+    return {
+        'engine': GameEngine(WORLD_FILE),
+        'players_joined': set(),
+        'history': GameHistory(),  # 整体和每个玩家都只保留最近的记录
+        'ai_players': {},  # AI玩家实例
+        'ai_enabled': {},  # 哪些角色启用了AI
+        'ai_types': {},  # 角色 -> AI类型（'llm' 或 'mcts'），恢复游戏时用来重建AI
+        'ai_decisions': {},  # 角色 -> 正在进行的AI决策（Future）
+        'cancelled': False,  # 游戏是否被取消/重置
+        'changed': threading.Condition(),  # 游戏状态变化时通知推送连接
+        'version': 0,  # 游戏版本（每次变化加一，只增不减）
+        'token': secrets.token_hex(4),  # 区分同名游戏的不同实例（重置后版本从0开始）
+        'log': None,  # 事件日志（没有配置GAME_LOG_DIR时为None）
+        'stored_version': 0,  # 共享存储里的版本号（0表示还没写入过）
+        'dirty': False,  # 有没有还没写入共享存储的改动
+        'last_access': time.monotonic(),  # 最近一次请求的时间（回收空闲游戏用）
+        'streams': 0,  # 打开着的推送连接数（有连接的游戏不回收）
+        'sync_bases': {}  # 角色 -> {版本: 该版本的状态}（增量同步的基准）
+    }
+
 def get_or_create_game(game_id='default'):
-    """获取或创建游戏实例"""
+    """获取或创建游戏实例（内存里没有时先尝试从共享存储或事件日志恢复）"""
+    if store:
+        _refresh_game(game_id)
     if game_id not in games:
-        world_file = os.path.join(os.path.dirname(__file__), "world_definition.yaml")
-        games[game_id] = {
-            'engine': GameEngine(world_file),
-            'players_joined': set(),
-            'history': [],
-            'ai_players': {},  # AI玩家实例
-            'ai_enabled': {},  # 哪些角色启用了AI
-            'cancelled': False  # 游戏是否被取消/重置
-        }
-    return games[game_id]
+        game = _load_game(game_id) if GAME_LOG_DIR else None
+        if game is None and GAME_SPILL_DIR:
+            game = _load_spilled(game_id)
+        if game is None:
+            game = _new_game()
+            if GAME_LOG_DIR:
+                game['log'] = EventLog(GAME_LOG_DIR, game_id, GAME_LOG_SYNC)
+        games[game_id] = game
+    game = games[game_id]
+    now = game['last_access'] = time.monotonic()
+    if _can_evict() and ((MAX_GAMES and len(games) > MAX_GAMES) or now - _last_sweep > GAME_SWEEP_INTERVAL):
+        evict_idle_games(keep=game_id)
+    return game
+
+# ===== 空闲游戏回收 =====
+
+def _can_evict() -> bool:
+    """回收的游戏能不能恢复（配置了事件日志、共享存储或GAME_SPILL_DIR）"""
+    return bool(GAME_LOG_DIR or store or GAME_SPILL_DIR)
+
+def evict_idle_games(keep: str = None) -> int:
+    """回收过期的游戏和超出数量上限的最久没用的游戏，返回回收的数量（游戏无法恢复时不回收）"""
+    global _last_sweep
+    now = _last_sweep = time.monotonic()
+    if not _can_evict():
+        return 0
+    over = len(games) - MAX_GAMES if MAX_GAMES else 0
+    evicted = 0
+    for game_id, game in sorted(games.items(), key=lambda item: item[1]['last_access']):
+        expired = GAME_IDLE_TTL and now - game['last_access'] > GAME_IDLE_TTL
+        if not expired and evicted >= over:
+            break  # 之后的都更新，既没过期也不需要腾位置
+        if game_id != keep and _evict_game(game_id, game):
+            evicted += 1
+    if evicted:
+        print(f"[系统] 回收了 {evicted} 局空闲游戏，剩余 {len(games)} 局")
+    return evicted
+
+def _evict_game(game_id: str, game) -> bool:
+    """从内存中移除一局游戏（能恢复的先保存）。正在使用的游戏不回收，返回False"""
+    lock = _game_lock(game_id)
+    if not lock.acquire(blocking=False):
+        return False  # 有请求或AI正在处理（不能等，否则两个线程互相回收对方的游戏时会死锁）
+    try:
+        if (games.get(game_id) is not game or game['streams'] or game['ai_decisions']
+                or ai_pool.pending(game_id)):
+            return False
+        if not (store or game['log'] or GAME_SPILL_DIR):
+            return False  # 无法恢复
+        if store:
+            try:
+                _save_game(game_id, game)
+            except VersionConflict:
+                pass  # 存储里已经是更新的状态
+        if game['log']:
+            game['log'].close()  # 事件日志里有完整记录
+        elif GAME_SPILL_DIR and not store:
+            _spill_game(game_id, game)
+        game['cancelled'] = True
+        del games[game_id]
+        return True
+    finally:
+        lock.release()
+
+def _spill_path(game_id: str) -> str:
+    return os.path.join(GAME_SPILL_DIR, quote(game_id, safe='') + '.json')
+
+def _spill_game(game_id: str, game):
+    os.makedirs(GAME_SPILL_DIR, exist_ok=True)
+    path = _spill_path(game_id)
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(_export_game(game), f, ensure_ascii=False, separators=(',', ':'))
+    os.replace(path + '.tmp', path)
+
+def _load_spilled(game_id: str):
+    """恢复被回收到磁盘的游戏（恢复后删除文件），没有时返回None"""
+    path = _spill_path(game_id)
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+    except FileNotFoundError:
+        return None
+    os.remove(path)
+    game = _new_game()
+    _import_game(game, state)
+    _resume_ai(game_id, game)
+    return game
+
+def _resume_ai(game_id: str, game):
+    """恢复的游戏：重建AI玩家，轮到AI时继续行动"""
+    engine = game['engine']
+    for role, ai_type in game['ai_types'].items():
+        game['ai_players'][role] = _create_ai_player(game, role, ai_type)
+    if not engine.game_over and engine.current_turn in game['ai_types']:
+        _schedule_ai_turn(game_id, engine.current_turn)
+
+# ===== 共享存储 =====
+
+def _refresh_game(game_id: str):
+    """共享存储里的版本和本进程的不同时（其他进程改过），用存储里的状态替换本地的"""
+    game = games.get(game_id)
+    version = store.version(game_id)
+    if game is not None and version == game['stored_version']:
+        return
+    if version is None:
+        if game is not None and game['stored_version']:
+            _cancel_game(game_id)  # 其他进程重置了游戏
+        return
+    loaded = store.load(game_id)
+    if loaded is None:
+        return
+    if game is None:
+        game = games[game_id] = _new_game()
+    game['stored_version'], state = loaded
+    _import_game(game, state)
+    game['dirty'] = False
+    for role, ai_type in game['ai_types'].items():
+        if role not in game['ai_players']:
+            game['ai_players'][role] = _create_ai_player(game, role, ai_type)
+    _notify_game(game)
+
+def _save_game(game_id: str, game):
+    """
+    把本进程的改动写入共享存储（带上读到的版本号）
+
+    Raises:
+        VersionConflict: 其他进程先写入了，本地改动已丢弃并换成存储里的最新状态
+    """
+    if not store or not game['dirty'] or game['cancelled']:
+        return
+    try:
+        game['stored_version'] = store.save(game_id, _export_game(game), game['stored_version'])
+        game['dirty'] = False
+    except VersionConflict:
+        _refresh_game(game_id)
+        raise
+
+@app.errorhandler(VersionConflict)
+def version_conflict(error):
+    return jsonify({'error': '游戏状态已被其他请求修改，请刷新后重试'}), 409
+
+# ===== 事件日志与恢复 =====
+
+def _log_event(game, event: dict):
+    """写入事件日志，积累足够多的事件后写快照（所有改动都经过这里）"""
+    game['dirty'] = True
+    log = game['log']
+    if log and not game['cancelled']:
+        log.append(event)
+        if log.since_snapshot >= GAME_SNAPSHOT_EVERY:
+            log.write_snapshot(_export_game(game))
+
+def _execute(game, player: Player, command: str) -> str:
+    """执行命令并记录事件（所有改变局面的命令都经过这里）"""
+    result = game['engine'].execute_action(player, command)
+    _log_event(game, {'type': 'command', 'role': player.name, 'command': command})
+    return result
+
+def _next_turn(game):
+    game['engine'].next_turn()
+    _log_event(game, {'type': 'next_turn'})
+
+def _finish(game, winner: str):
+    game['engine'].finish(winner)
+    _log_event(game, {'type': 'finish', 'winner': winner})
+
+def _export_game(game) -> dict:
+    """整局游戏的可序列化状态（不含AI玩家实例和连接等运行时对象）"""
+    return {
+        'engine': game['engine'].export_state(),
+        'players_joined': sorted(game['players_joined']),
+        'ai_types': dict(game['ai_types']),
+        'history': list(game['history']),
+        'token': game['token'],
+        'version': game['version'],
+    }
+
+def _import_game(game, state: dict):
+    game['engine'].import_state(state['engine'])
+    game['players_joined'] = set(state['players_joined'])
+    game['ai_types'] = dict(state['ai_types'])
+    game['ai_enabled'] = {role: True for role in game['ai_types']}
+    game['history'] = GameHistory()
+    for entry in state['history']:
+        game['history'].append(entry)
+    game['token'] = state['token']
+    game['version'] = state.get('version', 0)  # 接着原来的版本，恢复前的ETag不会被误认
+
+def _apply_event(game, event: dict):
+    """重放一个事件（恢复游戏时使用）"""
+    engine = game['engine']
+    kind = event['type']
+    if kind == 'command':
+        engine.execute_action(engine.players[event['role']], event['command'])
+    elif kind == 'next_turn':
+        engine.next_turn()
+    elif kind == 'finish':
+        engine.finish(event['winner'])
+    elif kind == 'history':
+        game['history'].append(event['entry'])
+    elif kind == 'join':
+        game['players_joined'].add(event['role'])
+        if event.get('ai_type'):
+            game['ai_types'][event['role']] = event['ai_type']
+            game['ai_enabled'][event['role']] = True
+
+def _create_ai_player(game, role: str, ai_type: str):
+    if ai_type == 'mcts':
+        return MCTSPlayer(role, game['engine'], budget_ms=MCTS_BUDGET_MS)
+    return AIPlayer(role)
+
+def _load_game(game_id: str):
+    """从最新的快照和之后的事件恢复一局游戏，没有日志时返回None"""
+    state, events, seq = event_log.load(GAME_LOG_DIR, game_id)
+    if state is None and not events:
+        return None
+
+    game = _new_game()
+    engine = game['engine']
+    engine.quiet = True  # 重放时不打印噪音等系统消息
+    if state:
+        _import_game(game, state)
+    for event in events:
+        _apply_event(game, event)
+    engine.quiet = False
+
+    game['log'] = EventLog(GAME_LOG_DIR, game_id, GAME_LOG_SYNC, seq=seq)
+    game['log'].since_snapshot = len(events)
+    _resume_ai(game_id, game)
+    return game
+
+def recover_games() -> int:
+    """启动时恢复事件日志目录里的所有游戏，返回恢复的数量"""
+    count = 0
+    for game_id in event_log.game_ids(GAME_LOG_DIR):
+        if game_id not in games:
+            game = _load_game(game_id)
+            if game:
+                games[game_id] = game
+                count += 1
+    return count
+
+def _notify_game(game):
+    """唤醒所有等待该游戏变化的推送连接"""
+    with game['changed']:
+        game['version'] += 1
+        game['changed'].notify_all()
+
+def _add_history(game, entry: dict):
+    """记录历史并通知推送连接（动作执行、回合切换、游戏结束都会经过这里）"""
+    game['history'].append(entry)
+    _log_event(game, {'type': 'history', 'entry': entry})
+    _notify_game(game)
 
 @app.route('/')
 def index():
@@ -42,16 +403,21 @@ def index():
     return render_template('index.html')
 
 @app.route('/api/join', methods=['POST'])
+@_locked(_body_game_id)
 def join_game():
     """加入游戏，选择角色"""
     data = request.json
     role = data.get('role')  # 'H' or 'Z'
     game_id = data.get('game_id', 'default')
     use_ai = data.get('use_ai', False)  # 是否使用AI
+    ai_type = data.get('ai_type', 'llm')  # 'llm' 或 'mcts'（本地搜索，无需网络）
     
     if role not in ['H', 'Z']:
         return jsonify({'error': 'Invalid role'}), 400
     
+    if use_ai and ai_type not in ['llm', 'mcts']:
+        return jsonify({'error': 'Invalid ai_type'}), 400
+    
     game = get_or_create_game(game_id)
     
     # 检查角色是否已被占用
@@ -59,8 +425,7 @@ def join_game():
         return jsonify({'error': f'角色 {role} 已被占用'}), 400
     
     game['players_joined'].add(role)
-    session['role'] = role
-    session['game_id'] = game_id
+    _log_event(game, {'type': 'join', 'role': role})
     
     # 如果使用AI，为对手创建AI玩家
     if use_ai:
@@ -68,23 +433,31 @@ def join_game():
         if opponent_role not in game['players_joined']:
             game['players_joined'].add(opponent_role)
             game['ai_enabled'][opponent_role] = True
-            game['ai_players'][opponent_role] = AIPlayer(opponent_role)
-            print(f"[系统] 为 {opponent_role} 启用了AI对手", flush=True)
+            game['ai_types'][opponent_role] = ai_type
+            game['ai_players'][opponent_role] = _create_ai_player(game, opponent_role, ai_type)
+            _log_event(game, {'type': 'join', 'role': opponent_role, 'ai_type': ai_type})
+            print(f"[系统] 为 {opponent_role} 启用了AI对手 ({ai_type})", flush=True)
             
             # 如果对手（AI）是当前回合，立即触发AI行动
             engine = game['engine']
             if engine.current_turn == opponent_role:
                 print(f"[系统] {opponent_role} 是当前回合，触发AI行动", flush=True)
-                threading.Thread(target=ai_take_turn, args=(game_id, opponent_role)).start()
+                _schedule_ai_turn(game_id, opponent_role)
+    
+    _save_game(game_id, game)
+    session['role'] = role
+    session['game_id'] = game_id
     
     return jsonify({
         'success': True,
         'role': role,
         'message': f'你现在扮演 {role}',
-        'ai_opponent': use_ai
+        'ai_opponent': use_ai,
+        'ai_type': ai_type if use_ai else None
     })
 
 @app.route('/api/state', methods=['GET'])
+@_locked(_session_game_id)
 def get_state():
     """获取当前游戏状态"""
     role = session.get('role')
@@ -94,15 +467,40 @@ def get_state():
         return jsonify({'error': 'Not joined'}), 401
     
     game = get_or_create_game(game_id)
+    return _conditional_json(game, role, lambda: _state_payload(game, role))
+
+def _game_etag(game, role: str) -> str:
+    """由游戏版本和角色得到的ETag（引擎版本也算进去，防止绕过历史记录的改动）"""
+    return f"{game['token']}-{game['version']}-{game['engine'].version}-{role}"
+
+def _conditional_json(game, role: str, build):
+    """
+    条件GET：客户端的If-None-Match与当前版本一致时直接返回304，
+    不调用build（即不重新观察房间或枚举动作）
+    """
+    etag = _game_etag(game, role)
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+    else:
+        response = jsonify(build())
+    # 弱ETag：同一版本下内容语义相同（如已看过的痕迹不再列出）
+    response.set_etag(etag, weak=True)
+    response.headers['Cache-Control'] = 'no-cache'
+    response.vary.add('Cookie')
+    return response
+
+def _state_payload(game, role: str) -> dict:
+    """某个角色视角下的游戏状态"""
     engine = game['engine']
     player = engine.players[role]
-    opponent = engine.get_opponent(player)
     
-    # 观测当前房间
-    room_view = engine.observe_room(player)
+    # 只是显示当前房间，不算真正观察过（痕迹要等玩家look或进入房间时才标记为已看到）；
+    # 发送结构化的观测，文字由前端渲染
+    observation = engine.observe(player)
     
-    return jsonify({
+    return {
         'role': role,
+        'version': game['version'],
         'current_turn': engine.current_turn,
         'is_your_turn': engine.current_turn == role,
         'turn_count': engine.turn_count,
@@ -111,15 +509,137 @@ def get_state():
             'ap': player.ap,
             'max_ap': player.max_ap,
             'state': player.state.value,
-            'inventory': player.inventory
+            'inventory': list(player.inventory)
         },
-        'room_view': room_view,
+        'observation': observation,
         'game_over': engine.game_over,
         'winner': engine.winner,
-        'history': game['history'][-10:]  # 最近10条历史
-    })
+        'history': game['history'].recent(10)  # 最近10条历史
+    }
+
+@app.route('/api/stream', methods=['GET'])
+@_locked(_session_game_id)
+def stream_state():
+    """Server-Sent Events：游戏状态变化时推送当前角色的状态（取代前端轮询）"""
+    role = session.get('role')
+    game_id = session.get('game_id', 'default')
+    
+    if not role:
+        return jsonify({'error': 'Not joined'}), 401
+    
+    game = get_or_create_game(game_id)
+    
+    def generate():
+        with _game_lock(game_id):
+            game['streams'] += 1
+        try:
+            yield from _stream_events(game_id, game, role)
+        finally:
+            with _game_lock(game_id):
+                game['streams'] -= 1
+    
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+def _stream_events(game_id: str, game, role: str):
+    """推送的内容：状态变化时发送新状态，空闲时发送保活注释"""
+    last_version = None
+    while True:
+        if game.get('cancelled'):
+            yield "event: reset\ndata: {}\n\n"
+            return
+        if game['version'] != last_version:
+            with _game_lock(game_id):  # 生成器在请求返回后才运行，需要自己加锁
+                last_version = game['version']
+                payload = _state_payload(game, role)
+            yield f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+            if game['engine'].game_over:
+                return
+            continue
+        # 没有变化就等通知；超时发一条注释保持连接
+        with game['changed']:
+            changed = game['changed'].wait_for(
+                lambda: game['version'] != last_version or game.get('cancelled'),
+                timeout=STORE_POLL_INTERVAL if store else STREAM_KEEPALIVE)
+        if not changed:
+            if store:
+                with _game_lock(game_id):
+                    _refresh_game(game_id)  # 其他进程的改动不会通知到这里，定时检查
+            yield ": keepalive\n\n"
+
+@app.route('/api/sync', methods=['GET'])
+@_locked(_session_game_id)
+def sync_state():
+    """
+    状态和可用动作的增量同步（取代分别请求 /api/state 和 /api/actions）
+    
+    ?since=<上次返回的version>：只返回之后变化的部分（新的历史记录、变化的字段、增减的动作）；
+    不带since或版本太旧时返回完整状态（full为真）；没有变化时返回 unchanged
+    """
+    role = session.get('role')
+    game_id = session.get('game_id', 'default')
+    
+    if not role:
+        return jsonify({'error': 'Not joined'}), 401
+    
+    game = get_or_create_game(game_id)
+    version = _game_etag(game, role)
+    since = request.args.get('since')
+    if since == version:
+        return jsonify({'version': version, 'unchanged': True})
+    
+    bases = game['sync_bases'].setdefault(role, OrderedDict())
+    current = bases.get(version)
+    if current is None:
+        current = bases[version] = _sync_base(game, role)
+        while len(bases) > SYNC_BASES:
+            bases.popitem(last=False)
+    
+    base = bases.get(since) if since else None
+    delta = _sync_delta(base, current) if base else None
+    if delta is None:
+        return jsonify({
+            'version': version,
+            'full': True,
+            'state': current['state'],
+            'actions': list(current['actions'].values())
+        })
+    delta['version'] = version
+    return jsonify(delta)
+
+def _sync_base(game, role: str) -> dict:
+    """某个版本下角色看到的完整内容（动作按命令索引，方便比较增减）"""
+    engine = game['engine']
+    player = engine.players[role]
+    return {
+        'state': _state_payload(game, role),
+        'history_total': game['history'].total,
+        'actions': {a.command: dict(a.to_dict(), command=a.command) for a in engine.legal_actions(player)}
+    }
+
+def _sync_delta(base: dict, current: dict):
+    """两个版本之间的差异；新的历史记录超出状态里保留的条数时返回None（改为发送完整状态）"""
+    new_entries = current['history_total'] - base['history_total']
+    history = current['state']['history']
+    if new_entries > len(history):
+        return None
+    old_state, new_state = base['state'], current['state']
+    changed = {key: value for key, value in new_state.items()
+               if key not in ('version', 'history') + SYNC_NESTED and old_state.get(key) != value}
+    # 玩家状态和房间观测只发送变化的字段
+    nested = {key: {field: value for field, value in new_state[key].items() if old_state[key].get(field) != value}
+              for key in SYNC_NESTED}
+    old_actions, new_actions = base['actions'], current['actions']
+    return {
+        'changed': changed,
+        **nested,
+        'history': history[len(history) - new_entries:] if new_entries else [],
+        'actions_added': [action for command, action in new_actions.items() if command not in old_actions],
+        'actions_removed': [command for command in old_actions if command not in new_actions]
+    }
 
 @app.route('/api/actions', methods=['GET'])
+@_locked(_session_game_id)
 def get_available_actions():
     """获取可用的动作列表"""
     role = session.get('role')
@@ -131,129 +651,18 @@ def get_available_actions():
     game = get_or_create_game(game_id)
     engine = game['engine']
     player = engine.players[role]
-    room = engine.world.get_room(player.location)
     
-    # 如果玩家在睡眠，只能醒来
-    if player.is_asleep():
-        return jsonify({
-            'no_target': [
-                {'name': 'wake', 'label': '醒来 (-1 AP)', 'ap_cost': 1}
-            ],
-            'with_target': []
-        })
-    
-    # 基础动作
-    actions = {
-        'no_target': [
-            {'name': 'look', 'label': '观察房间', 'ap_cost': 0},
-            {'name': 'status', 'label': '查看状态', 'ap_cost': 0},
-            {'name': 'inventory', 'label': '查看背包', 'ap_cost': 0},
-            {'name': 'wait', 'label': '等待（+3 AP额外, 结束回合）', 'ap_cost': 0},
-            {'name': 'sleep', 'label': '睡觉（+8 AP额外, 失去行动能力！）', 'ap_cost': 0}
-        ],
-        'with_target': []
-    }
-    
-    # 移动动作
-    if room and room.connections:
-        for dest_id in room.connections.values():
-            dest_room = engine.world.get_room(dest_id)
-            if dest_room:
-                actions['with_target'].append({
-                    'name': 'move',
-                    'label': f'前往 {dest_room.name}',
-                    'target': dest_id,
-                    'ap_cost': 1
-                })
-    
-    # 物品交互动作
-    if room:
-        # 1. 房间里的物品
-        for obj in room.objects:
-            # 检查物品
-            actions['with_target'].append({
-                'name': 'examine',
-                'label': f'检查 {obj.name}',
-                'target': obj.id,
-                'ap_cost': 1
-            })
-            
-            # 拾取
-            if obj.is_portable:
-                actions['with_target'].append({
-                    'name': 'take',
-                    'label': f'拾取 {obj.name}',
-                    'target': obj.id,
-                    'ap_cost': 1
-                })
-            
-            # 打开/关闭
-            if obj.properties.get('can_open'):
-                if obj.state.get('is_open'):
-                    actions['with_target'].append({
-                        'name': 'close',
-                        'label': f'关闭 {obj.name}',
-                        'target': obj.id,
-                        'ap_cost': 1
-                    })
-                else:
-                    actions['with_target'].append({
-                        'name': 'open',
-                        'label': f'打开 {obj.name}',
-                        'target': obj.id,
-                        'ap_cost': 1
-                    })
-            
-            # 解锁（如果有钥匙）
-            if obj.is_lockable and obj.state.get('is_locked'):
-                for item_id in player.inventory:
-                    # 获取物品的显示名称
-                    item_obj = engine.world.get_object(item_id)
-                    item_name = item_obj.name if item_obj else item_id
-                    actions['with_target'].append({
-                        'name': 'unlock',
-                        'label': f'用 {item_name} 解锁 {obj.name}',
-                        'target': obj.id,
-                        'extra': item_id,
-                        'ap_cost': 2
-                    })
-                
-                # 撬锁（如果有撬锁器）
-                if player.has_item('lockpick'):
-                    actions['with_target'].append({
-                        'name': 'pick',
-                        'label': f'撬开 {obj.name} (需要撬锁器, 3 AP)',
-                        'target': obj.id,
-                        'ap_cost': 3
-                    })
-        
-        # 2. 已打开容器内的物品
-        for container in room.objects:
-            if container.is_container and container.state.get('is_open'):
-                contains = container.state.get('contains', [])
-                for item_id in contains:
-                    item = engine.world.get_object(item_id)
-                    if item:
-                        # 检查容器内物品
-                        actions['with_target'].append({
-                            'name': 'examine',
-                            'label': f'检查 {item.name} (在{container.name}中)',
-                            'target': item.id,
-                            'ap_cost': 1
-                        })
-                        
-                        # 拾取容器内物品
-                        if item.is_portable:
-                            actions['with_target'].append({
-                                'name': 'take',
-                                'label': f'拾取 {item.name} (从{container.name})',
-                                'target': item.id,
-                                'ap_cost': 1
-                            })
-    
-    return jsonify(actions)
+    return _conditional_json(game, role, lambda: _actions_payload(engine, player))
+
+def _actions_payload(engine: GameEngine, player: Player) -> dict:
+    """把引擎的合法动作分成无目标/有目标两组"""
+    actions = {'no_target': [], 'with_target': []}
+    for action in engine.legal_actions(player):
+        actions['with_target' if action.target else 'no_target'].append(action.to_dict())
+    return actions
 
 @app.route('/api/action', methods=['POST'])
+@_locked(_session_game_id)
 def execute_action():
     """执行动作"""
     role = session.get('role')
@@ -271,24 +680,13 @@ def execute_action():
     
     player = engine.players[role]
     data = request.json
-    action_name = data.get('action')
-    target = data.get('target', '')
-    extra = data.get('extra', '')
-    
-    # 构建命令
-    if target:
-        if extra:
-            command = f"{action_name} {target} with {extra}"
-        else:
-            command = f"{action_name} {target}"
-    else:
-        command = action_name
+    command = _build_command(data)
     
     # 执行命令
-    result = engine.execute_action(player, command)
+    result = _execute(game, player, command)
     
     # 记录历史
-    game['history'].append({
+    _add_history(game, {
         'turn': engine.turn_count,
         'player': role,
         'action': command,
@@ -297,45 +695,136 @@ def execute_action():
     
     # 检查是否应该结束回合
     # wait和sleep会自动结束回合
-    auto_end_turn = action_name in ['wait', 'sleep']
+    auto_end_turn = data.get('action') in AUTO_END_ACTIONS
     should_end_turn = data.get('end_turn', False) or auto_end_turn
     
     if should_end_turn:
-        engine.next_turn()
-        game['history'].append({
-            'turn': engine.turn_count,
-            'player': 'SYSTEM',
-            'action': 'turn_change',
-            'result': f"现在轮到 {engine.current_turn}"
-        })
-        
-        # 如果下一个玩家是AI，触发AI行动
-        next_player = engine.current_turn
-        print(f"[系统] 自动结束回合，下一个玩家: {next_player}, AI启用状态: {game.get('ai_enabled', {})}", flush=True)
-        if game['ai_enabled'].get(next_player):
-            print(f"[系统] 触发 {next_player} AI行动", flush=True)
-            threading.Thread(target=ai_take_turn, args=(game_id, next_player)).start()
-    
-    # 检查胜利条件
+        _switch_turn(game_id, game)
+    
+    _check_game_over(game)
+    _save_game(game_id, game)
+    
+    return jsonify({
+        'success': True,
+        'result': result,
+        'game_over': engine.game_over,
+        'winner': engine.winner
+    })
+
+def _build_command(data: dict) -> str:
+    """把前端的 {action, target, extra} 拼成引擎命令"""
+    action_name = data.get('action') or ''
+    target = data.get('target', '')
+    extra = data.get('extra', '')
+    if target:
+        if extra:
+            return f"{action_name} {target} with {extra}"
+        return f"{action_name} {target}"
+    return action_name
+
+def _switch_turn(game_id: str, game):
+    """玩家的回合结束：切换回合，下一个玩家是AI时触发AI行动"""
+    engine = game['engine']
+    _next_turn(game)
+    _add_history(game, {
+        'turn': engine.turn_count,
+        'player': 'SYSTEM',
+        'action': 'turn_change',
+        'result': f"现在轮到 {engine.current_turn}"
+    })
+    
+    # 如果下一个玩家是AI，触发AI行动
+    next_player = engine.current_turn
+    print(f"[系统] 自动结束回合，下一个玩家: {next_player}, AI启用状态: {game.get('ai_enabled', {})}", flush=True)
+    if game['ai_enabled'].get(next_player):
+        print(f"[系统] 触发 {next_player} AI行动", flush=True)
+        _schedule_ai_turn(game_id, next_player)
+
+def _check_game_over(game) -> bool:
+    """检查胜利条件，游戏结束时记录结果"""
+    engine = game['engine']
     is_over, winner = engine.check_victory()
-    if is_over:
-        engine.game_over = True
-        engine.winner = winner
-        game['history'].append({
+    if is_over and not engine.game_over:
+        _finish(game, winner)
+        _add_history(game, {
             'turn': engine.turn_count,
             'player': 'SYSTEM',
             'action': 'game_over',
             'result': f"游戏结束！{winner} 获胜！"
         })
+    return engine.game_over
+
+@app.route('/api/actions/batch', methods=['POST'])
+@_locked(_session_game_id)
+def execute_batch():
+    """
+    一次请求执行多个命令，返回每个命令的结果以及执行后的状态和可用动作
+    
+    请求: {"commands": ["move living_room", {"action": "take", "target": "key_z"}], "end_turn": false}
+    整批持有游戏锁，中间不会插入其他请求或AI行动，但整批不是原子的：遇到第一个
+    失败的命令就停止，后面的不再执行，之前成功的命令照常生效、不会回滚
+    （回滚会让玩家先看到开箱、进房间的结果再撤销，白白探到隐藏信息）。
+    applied 是实际生效的命令数；全部成功且end_turn为真时结束回合
+    """
+    role = session.get('role')
+    game_id = session.get('game_id', 'default')
+    
+    if not role:
+        return jsonify({'error': 'Not joined'}), 401
+    
+    data = request.get_json(silent=True) or {}
+    commands = data.get('commands')
+    if not isinstance(commands, list) or not commands or len(commands) > MAX_BATCH_COMMANDS:
+        return jsonify({'error': f'commands 必须是1到{MAX_BATCH_COMMANDS}个命令的列表'}), 400
+    
+    game = get_or_create_game(game_id)
+    engine = game['engine']
+    if engine.current_turn != role:
+        return jsonify({'error': 'Not your turn'}), 400
+    
+    player = engine.players[role]
+    results = []
+    for item in commands:
+        if engine.game_over or engine.current_turn != role:
+            break  # 上一个命令结束了回合或游戏
+        command = item if isinstance(item, str) else _build_command(item)
+        before = _action_progress(engine, player)
+        result = _execute(game, player, command)
+        action_name = command.split()[0] if command.split() else ''
+        # 改变局面的动作执行后局面却没变，说明失败了
+        ok = action_name in INFO_ACTIONS or _action_progress(engine, player) != before
+        _add_history(game, {
+            'turn': engine.turn_count,
+            'player': role,
+            'action': command,
+            'result': result
+        })
+        results.append({'command': command, 'result': result, 'ok': ok})
+        if not ok:
+            break
+        if action_name in AUTO_END_ACTIONS:
+            _switch_turn(game_id, game)
+        _check_game_over(game)
+    
+    applied = sum(1 for r in results if r['ok'])
+    success = applied == len(commands)
+    if success and data.get('end_turn') and engine.current_turn == role and not engine.game_over:
+        _switch_turn(game_id, game)
+        _check_game_over(game)
+    _save_game(game_id, game)
     
     return jsonify({
-        'success': True,
-        'result': result,
+        'success': success,
+        'applied': applied,
+        'results': results,
         'game_over': engine.game_over,
-        'winner': engine.winner
+        'winner': engine.winner,
+        'state': _state_payload(game, role),
+        'actions': _actions_payload(engine, player)
     })
 
 @app.route('/api/end_turn', methods=['POST'])
+@_locked(_session_game_id)
 def end_turn():
     """结束当前回合"""
     role = session.get('role')
@@ -350,9 +839,9 @@ def end_turn():
     if engine.current_turn != role:
         return jsonify({'error': 'Not your turn'}), 400
     
-    engine.next_turn()
+    _next_turn(game)
     
-    game['history'].append({
+    _add_history(game, {
         'turn': engine.turn_count,
         'player': 'SYSTEM',
         'action': 'turn_change',
@@ -365,39 +854,158 @@ def end_turn():
     if game['ai_enabled'].get(next_player):
         print(f"[系统] 触发 {next_player} AI行动", flush=True)
         # 在后台线程中执行AI行动，避免阻塞
-        threading.Thread(target=ai_take_turn, args=(game_id, next_player)).start()
+        _schedule_ai_turn(game_id, next_player)
     else:
         print(f"[系统] {next_player} 不是AI或未启用AI", flush=True)
     
+    _save_game(game_id, game)
+    
     return jsonify({'success': True, 'next_player': next_player})
 
+def _cancel_game(game_id: str):
+    """停止并删除本进程里的游戏实例"""
+    game = games.get(game_id)
+    if game is None:
+        return
+    # 标记游戏为已取消，停止所有AI行动
+    game['cancelled'] = True
+    _notify_game(game)
+    if game['log']:
+        game['log'].close()
+    # 还没开始的AI任务直接丢弃，正在执行的会检测到取消标志
+    ai_pool.cancel(game_id)
+    
+    # 删除游戏实例
+    del games[game_id]
+    print(f"[系统] 游戏 {game_id} 已重置")
+
 @app.route('/api/restart', methods=['POST'])
+@_locked(_body_game_id)
 def restart_game():
     """重新开始游戏"""
     data = request.json
     game_id = data.get('game_id', 'default')
     
-    # 标记游戏为已取消，停止所有AI行动
-    if game_id in games:
-        games[game_id]['cancelled'] = True
-        print(f"[系统] 游戏 {game_id} 已标记为取消，等待AI线程退出...")
-        
-        # 等待短暂时间让AI线程检测到取消标志
-        time.sleep(0.5)
-        
-        # 删除游戏实例
-        del games[game_id]
-        print(f"[系统] 游戏 {game_id} 已重置")
+    _cancel_game(game_id)
+    
+    # 删除事件日志和共享存储里的记录，之后同名的游戏从头开始
+    if GAME_LOG_DIR:
+        event_log.remove(GAME_LOG_DIR, game_id)
+    if store:
+        store.delete(game_id)
     
     # 清除session
     session.clear()
     
     return jsonify({'success': True, 'message': '游戏已重置'})
 
-def ai_take_turn(game_id: str, role: str):
-    """AI玩家执行回合"""
-    time.sleep(1)  # 稍微延迟，让前端有时间更新
+@app.route('/api/ai/metrics', methods=['GET'])
+def ai_metrics():
+    """AI工作线程池的队列状态和LLM回复缓存的命中情况"""
+    metrics = ai_pool.metrics()
+    cache = llm_cache.get_cache()
+    metrics['llm_cache'] = cache.stats() if cache else None
+    return jsonify(metrics)
+
+@app.route('/api/games/memory', methods=['GET'])
+def games_memory():
+    """每局游戏（以及总共）估算占用的内存，世界模板和LLM回复缓存等共用的部分不计入"""
+    shared = footprint.reachable_ids(cached_templates(), llm_cache.get_cache(), ai_pool)
+    now = time.monotonic()
+    report = {}
+    for game_id, game in list(games.items()):
+        report[game_id] = {
+            'bytes': footprint.deep_sizeof(game, shared),
+            'history': len(game['history']),
+            'idle_seconds': round(now - game['last_access'], 1),
+        }
+    return jsonify({
+        'games': report,
+        'count': len(report),
+        'total_bytes': sum(item['bytes'] for item in report.values()),
+        'max_games': MAX_GAMES,
+        'idle_ttl': GAME_IDLE_TTL,
+    })
+
+def _schedule_ai_turn(game_id: str, role: str):
+    """把AI回合交给工作线程池，回合结束时记录用时和LLM请求次数"""
+    turn = {}
+
+    def job():
+        with _game_lock(game_id):  # 和玩家的请求互斥，每一步都是完整的
+            if store:
+                _refresh_game(game_id)  # 先看到其他进程的改动
+            ai_player = games[game_id]['ai_players'].get(role) if game_id in games else None
+            if not turn:
+                turn['start'] = time.perf_counter()
+                turn['calls'] = getattr(ai_player, 'llm_calls', 0)
+            result = ai_take_turn(game_id, role)
+            if game_id in games:
+                try:
+                    _save_game(game_id, games[game_id])
+                except VersionConflict:
+                    print(f"[AI {role}] 游戏已被其他进程修改，放弃这一步")
+                    return None
+        if result is None and ai_player:
+            message = f"[AI {role}] 回合用时 {time.perf_counter() - turn['start']:.2f}s"
+            if hasattr(ai_player, 'llm_calls'):
+                message += f"，LLM请求 {ai_player.llm_calls - turn['calls']} 次"
+            print(message)
+        return result
+
+    ai_pool.submit(game_id, job, delay=AI_START_DELAY)
+
+def _action_progress(engine: GameEngine, player: Player) -> tuple:
+    """判断动作是否生效的依据：玩家位置/状态/背包和所有物品状态（不含AP，失败的动作也会扣AP）"""
+    objects, locations, _ = engine.world.snapshot()
+    return player.location, player.state, tuple(player.inventory), objects, locations
+
+def _start_ai_decision(game, ai_player, player: Player) -> Future:
+    """
+    让AI开始决策：支持异步的AI（LLM）在共用事件循环上发请求，立即返回；
+    其他AI（如MCTS）直接在当前线程算出结果
+    """
+    engine = game['engine']
     
+    # 获取当前状态（AI决策时确实看了房间，痕迹标记为已看到）
+    observation = engine.look(player)
+    
+    state = {
+        'turn': engine.turn_count,
+        'player_status': {
+            'location': player.location,
+            'ap': player.ap,
+            'max_ap': player.max_ap,
+            'state': player.state.value,
+            'inventory': player.inventory
+        },
+        'observation': observation
+    }
+    
+    # 获取可用动作（简化版）
+    available_actions = _get_ai_available_actions(engine, player)
+    
+    # 获取历史记录（只传给AI自己的历史）
+    my_history = game['history'].recent(AI_HISTORY_LENGTH, player=player.name)
+    
+    if hasattr(ai_player, 'decide_action_async'):
+        return llm_client.submit(ai_player.decide_action_async(state, available_actions, my_history))
+    
+    decision = Future()
+    try:
+        decision.set_result(ai_player.decide_action(state, available_actions, my_history))
+    except Exception as e:
+        decision.set_exception(e)
+    return decision
+
+def ai_take_turn(game_id: str, role: str) -> Union[float, Future, None]:
+    """
+    AI玩家执行一个动作
+
+    Returns:
+        回合还没结束时返回到下一个动作的间隔（秒）；决策还在进行时返回它的Future；
+        线程池会在间隔结束或Future完成后再次调用。回合结束时返回None
+    """
     game = games.get(game_id)
     if not game:
         print(f"[AI {role}] 错误: 找不到游戏 {game_id}")
@@ -420,43 +1028,33 @@ def ai_take_turn(game_id: str, role: str):
         return
     
     player = engine.players[role]
-    print(f"[AI {role}] 开始思考... (AP: {player.ap}/{player.max_ap}, 位置: {player.location})")
     
-    # 检查AP是否足够继续行动
-    if player.ap < 1:
-        print(f"[AI {role}] AP不足({player.ap})，结束回合")
-        engine.next_turn()
-        game['history'].append({
-            'turn': engine.turn_count,
-            'player': 'SYSTEM',
-            'action': 'turn_change',
-            'result': f"现在轮到 {engine.current_turn}"
-        })
-        return
-    
-    # 获取当前状态
-    room_view = engine.observe_room(player)
-    
-    state = {
-        'player_status': {
-            'location': player.location,
-            'ap': player.ap,
-            'max_ap': player.max_ap,
-            'state': player.state.value,
-            'inventory': player.inventory
-        },
-        'room_view': room_view
-    }
-    
-    # 获取可用动作（简化版）
-    available_actions = _get_ai_available_actions(engine, player)
-    
-    # 获取历史记录（只传给AI自己的历史）
-    my_history = [h for h in game['history'] if h.get('player') == role]
+    # 上次调用已经发出了决策请求（如LLM请求），现在它完成了：直接执行结果
+    decision = game['ai_decisions'].pop(role, None)
+    if decision is None:
+        print(f"[AI {role}] 开始思考... (AP: {player.ap}/{player.max_ap}, 位置: {player.location})")
+        
+        # 检查AP是否足够继续行动
+        if player.ap < 1:
+            print(f"[AI {role}] AP不足({player.ap})，结束回合")
+            _next_turn(game)
+            _add_history(game, {
+                'turn': engine.turn_count,
+                'player': 'SYSTEM',
+                'action': 'turn_change',
+                'result': f"现在轮到 {engine.current_turn}"
+            })
+            return
+        
+        decision = _start_ai_decision(game, ai_player, player)
+        if not decision.done():
+            # 等待期间不占用工作线程，完成后线程池会再次调用
+            game['ai_decisions'][role] = decision
+            return decision
     
     # AI决策
     try:
-        action_command = ai_player.decide_action(state, available_actions, my_history)
+        action_command = decision.result()
     except Exception as e:
         print(f"[AI {role}] 决策错误: {e}")
         import traceback
@@ -468,8 +1066,8 @@ def ai_take_turn(game_id: str, role: str):
             return
         
         # 决策失败时结束回合
-        engine.next_turn()
-        game['history'].append({
+        _next_turn(game)
+        _add_history(game, {
             'turn': engine.turn_count,
             'player': 'SYSTEM',
             'action': 'turn_change',
@@ -479,32 +1077,35 @@ def ai_take_turn(game_id: str, role: str):
     
     if action_command:
         # 执行动作
-        result = engine.execute_action(player, action_command)
+        before = _action_progress(engine, player)
+        result = _execute(game, player, action_command)
+        # 改变局面的动作执行后局面却没变，说明失败了（计划模式据此重新规划）
+        ok = action_command.split()[0] in INFO_ACTIONS or _action_progress(engine, player) != before
         
         # 检查游戏是否在执行过程中被取消
         if game.get('cancelled', False):
             print(f"[AI {role}] 游戏已被取消，不记录动作结果")
             return
         
-        game['history'].append({
+        _add_history(game, {
             'turn': engine.turn_count,
             'player': role,
             'action': action_command,
-            'result': result
+            'result': result,
+            'ok': ok
         })
         
         print(f"[AI {role}] 执行: {action_command} -> {result[:50]}...")
         
         # 检查是否是自动结束回合的命令
         action_name = action_command.split()[0]
-        auto_end_turn = action_name in ['wait', 'sleep']
+        auto_end_turn = action_name in AUTO_END_ACTIONS
         
         # 检查胜利条件
         is_over, winner = engine.check_victory()
         if is_over:
-            engine.game_over = True
-            engine.winner = winner
-            game['history'].append({
+            _finish(game, winner)
+            _add_history(game, {
                 'turn': engine.turn_count,
                 'player': 'SYSTEM',
                 'action': 'game_over',
@@ -514,8 +1115,8 @@ def ai_take_turn(game_id: str, role: str):
         
         # 如果执行了wait或sleep，自动结束回合
         if auto_end_turn:
-            engine.next_turn()
-            game['history'].append({
+            _next_turn(game)
+            _add_history(game, {
                 'turn': engine.turn_count,
                 'player': 'SYSTEM',
                 'action': 'turn_change',
@@ -531,13 +1132,12 @@ def ai_take_turn(game_id: str, role: str):
         # AI继续行动直到AP耗尽
         if player.ap >= 1:
             print(f"[AI {role}] AP充足({player.ap})，继续行动...")
-            time.sleep(2)  # 思考间隔
-            ai_take_turn(game_id, role)
+            return ai_player.pacing  # 思考间隔（不占用工作线程）
         else:
             # AP不足，结束回合
             print(f"[AI {role}] AP不足({player.ap})，结束回合")
-            engine.next_turn()
-            game['history'].append({
+            _next_turn(game)
+            _add_history(game, {
                 'turn': engine.turn_count,
                 'player': 'SYSTEM',
                 'action': 'turn_change',
@@ -552,8 +1152,8 @@ def ai_take_turn(game_id: str, role: str):
             return
         
         # 没有命令时也结束回合
-        engine.next_turn()
-        game['history'].append({
+        _next_turn(game)
+        _add_history(game, {
             'turn': engine.turn_count,
             'player': 'SYSTEM',
             'action': 'turn_change',
@@ -561,92 +1161,9 @@ def ai_take_turn(game_id: str, role: str):
         })
 
 def _get_ai_available_actions(engine: GameEngine, player: Player) -> dict:
-    """为AI获取可用动作列表（简化版）"""
-    # 如果AI在睡眠，只能醒来
-    if player.is_asleep():
-        return {
-            'no_target': [
-                {'name': 'wake', 'label': '醒来'}
-            ],
-            'with_target': []
-        }
-    
-    room = engine.world.get_room(player.location)
-    
-    actions = {
-        'no_target': [
-            {'name': 'look', 'label': '观察'},
-            {'name': 'inventory', 'label': '查看背包'}
-        ],
-        'with_target': []
-    }
-    
-    # 移动
-    if room and room.connections:
-        for dest_id in room.connections.values():
-            dest_room = engine.world.get_room(dest_id)
-            if dest_room:
-                actions['with_target'].append({
-                    'name': 'move',
-                    'target': dest_id,
-                    'label': f'前往{dest_room.name}'
-                })
-    
-    # 物品交互
-    if room:
-        # 房间里的物品
-        for obj in room.objects:
-            actions['with_target'].append({
-                'name': 'examine',
-                'target': obj.id,
-                'label': f'检查{obj.name}',
-                'ap_cost': 1
-            })
-            
-            if obj.is_portable:
-                actions['with_target'].append({
-                    'name': 'take',
-                    'target': obj.id,
-                    'label': f'拿取{obj.name}'
-                })
-            
-            if obj.properties.get('can_open') and not obj.state.get('is_locked'):
-                if not obj.state.get('is_open'):
-                    actions['with_target'].append({
-                        'name': 'open',
-                        'target': obj.id,
-                        'label': f'打开{obj.name}'
-                    })
-            
-            # 撬锁（AI版本）
-            if obj.is_lockable and obj.state.get('is_locked') and player.has_item('lockpick'):
-                actions['with_target'].append({
-                    'name': 'pick',
-                    'target': obj.id,
-                    'label': f'撬开{obj.name}'
-                })
-        
-        # 已打开容器内的物品（AI也需要看到）
-        for container in room.objects:
-            if container.is_container and container.state.get('is_open'):
-                contains = container.state.get('contains', [])
-                for item_id in contains:
-                    item = engine.world.get_object(item_id)
-                    if item:
-                        actions['with_target'].append({
-                            'name': 'examine',
-                            'target': item.id,
-                            'label': f'检查{item.name}',
-                            'ap_cost': 1
-                        })
-                        
-                        if item.is_portable:
-                            actions['with_target'].append({
-                                'name': 'take',
-                                'target': item.id,
-                                'label': f'拿取{item.name}'
-                            })
-    
+    """为AI获取可用动作列表（不含status等纯查询动作，状态已经在提示里了）"""
+    actions = _actions_payload(engine, player)
+    actions['no_target'] = [a for a in actions['no_target'] if a['name'] != 'status']
     return actions
 
 if __name__ == '__main__':
@@ -661,5 +1178,8 @@ if __name__ == '__main__':
     log = logging.getLogger('werkzeug')
     log.setLevel(logging.INFO)
     
+    if GAME_LOG_DIR:
+        print(f"[系统] 从 {GAME_LOG_DIR} 恢复了 {recover_games()} 局游戏")
+    
     # 关闭自动重载，避免AI行动时重启
     app.run(debug=True, host='0.0.0.0', port=port, use_reloader=False)
@@ -1,5 +1,10 @@
+import heapq
+import os
 import yaml
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Tuple
+from worldshell import views
+from worldshell.noise import NoiseMap
+from worldshell.trace_rules import TraceRuleIndex
 
 class GameObject:
     def __init__(self, data: Dict[str, Any], type_def: Dict[str, Any]):
@@ -21,23 +26,24 @@ class GameObject:
         self.is_portable = self.properties.get('portable', False)
         self.is_opaque = self.properties.get('is_opaque', False)
 
-    def describe(self) -> str:
-        status = []
+    def view(self) -> Dict[str, Any]:
+        """物品的结构化视图（名称和可见状态，格式见 views 模块）"""
+        view = {'id': self.id, 'name': self.name}
         if self.is_container:
-            if self.state.get('is_open'):
-                status.append("已打开")
-            else:
-                status.append("关闭")
+            view['open'] = bool(self.state.get('is_open'))
         if self.is_lockable:
-            if self.state.get('is_locked'):
-                status.append("上锁")
-            else:
-                status.append("未锁")
-        
-        desc = f"{self.name}"
-        if status:
-            desc += f" ({', '.join(status)})"
-        return desc
+            view['locked'] = bool(self.state.get('is_locked'))
+        return view
+
+    def describe(self) -> str:
+        return views.describe_object(self.view())
+
+    def clone(self) -> 'GameObject':
+        """复制物品：共享类型属性等不可变数据，只复制可变的state"""
+        obj = GameObject.__new__(GameObject)
+        obj.__dict__.update(self.__dict__)
+        obj.state = {k: list(v) if isinstance(v, list) else v for k, v in self.state.items()}
+        return obj
 
 class Room:
     def __init__(self, id: str, data: Dict[str, Any]):
@@ -45,34 +51,67 @@ class Room:
         self.name = data['name']
         self.description = data['description']
         self.connections = data.get('connections', {})
-        self.objects: List[GameObject] = []
-        # Dynamic traces left in this room
-        self.traces: List[Dict[str, Any]] = [] 
+        # 按ID索引的物品（保持放入顺序），容器另建一份索引
+        self._objects: Dict[str, GameObject] = {}
+        self._containers: Dict[str, GameObject] = {}
+        # 房间里的痕迹，按ID索引（保持留下的顺序，序号seq随之递增）；痕迹留下后不再修改，快照和副本可以共享
+        self.traces: Dict[str, Dict[str, Any]] = {}
+
+    @property
+    def objects(self):
+        """房间里的物品（只读视图）"""
+        return self._objects.values()
+
+    @property
+    def containers(self):
+        """房间里的容器（只读视图）"""
+        return self._containers.values()
 
     def add_object(self, obj: GameObject):
-        self.objects.append(obj)
+        self._objects[obj.id] = obj
+        if obj.is_container:
+            self._containers[obj.id] = obj
 
     def remove_object(self, obj: GameObject):
-        if obj in self.objects:
-            self.objects.remove(obj)
+        self._objects.pop(obj.id, None)
+        self._containers.pop(obj.id, None)
+
+    def has_object(self, obj_id: str) -> bool:
+        return obj_id in self._objects
 
     def get_object(self, obj_id: str) -> Optional[GameObject]:
-        for obj in self.objects:
-            if obj.id == obj_id:
-                return obj
-        return None
+        return self._objects.get(obj_id)
+
+    def clone(self) -> 'Room':
+        """复制房间：名称、描述、连接共享，物品索引和痕迹独立"""
+        room = Room.__new__(Room)
+        room.__dict__.update(self.__dict__)
+        room._objects = {}
+        room._containers = {}
+        room.traces = dict(self.traces)
+        return room
 
 class World:
     def __init__(self, yaml_path: str):
+        self.yaml_path = yaml_path
         with open(yaml_path, 'r', encoding='utf-8') as f:
             self.data = yaml.safe_load(f)
         
         self.rooms: Dict[str, Room] = {}
         self.objects: Dict[str, GameObject] = {}
+        # 反向索引：物品ID -> (位置类型, 位置ID)，位置类型为 'room' / 'container' / 'player'
+        self.locations: Dict[str, Tuple[str, str]] = {}
         self.object_types: Dict[str, Dict] = {t['name']: t for t in self.data['object_types']}
         self.trace_rules = self.data.get('trace_rules', [])
+        # 编译后的规则表（复制世界时共享）
+        self.trace_index = TraceRuleIndex(self.trace_rules, self.object_types)
+        # 会过期的痕迹：(过期回合, 房间ID, 痕迹ID) 的最小堆，永久痕迹不进堆
+        self.trace_expiry: List[Tuple[int, str, str]] = []
+        # 下一条痕迹的序号，只增不减（恢复快照也不回退），玩家按序号记住每个房间看到了哪里
+        self.trace_seq = 0
 
         self._build_world()
+        self.noise = NoiseMap(self)
 
     def _build_world(self):
         # 1. Build Rooms
@@ -99,6 +138,7 @@ class World:
             # Here we assume location is a Room ID for simplicity of the MVP.
             if obj.location in self.rooms:
                 self.rooms[obj.location].add_object(obj)
+                self.locations[obj.id] = ('room', obj.location)
             # If location is another object (container), we handle it separately logic-wise
             # or we iterate again. For MVP, let's assume flat room placement or handle container placement.
             
@@ -110,6 +150,7 @@ class World:
                 if 'contains' not in parent_obj.state:
                     parent_obj.state['contains'] = []
                 parent_obj.state['contains'].append(obj.id)
+                self.locations[obj.id] = ('container', parent_obj.id)
                 # It's physically in the container, so logically it's in the room of the container?
                 # Or we just track it abstractly.
                 # Let's keep it abstract. If you search the container, you find it.
@@ -119,3 +160,172 @@ class World:
 
     def get_object(self, obj_id: str) -> Optional[GameObject]:
         return self.objects.get(obj_id)
+
+    def locate(self, obj_id: str) -> Optional[Tuple[str, str]]:
+        """物品在哪里：('room', 房间ID) / ('container', 容器ID) / ('player', 玩家名)"""
+        return self.locations.get(obj_id)
+
+    def place_object(self, obj_id: str, kind: str, holder_id: str):
+        """把物品移到新位置（自动从原位置移除），保持所有索引一致"""
+        obj = self.objects[obj_id]
+        self._detach_object(obj)
+        if kind == 'room':
+            self.rooms[holder_id].add_object(obj)
+        elif kind == 'container':
+            self.objects[holder_id].state.setdefault('contains', []).append(obj_id)
+        self.locations[obj_id] = (kind, holder_id)
+
+    def _detach_object(self, obj: GameObject):
+        location = self.locations.pop(obj.id, None)
+        if not location:
+            return
+        kind, holder_id = location
+        if kind == 'room':
+            self.rooms[holder_id].remove_object(obj)
+        elif kind == 'container':
+            contains = self.objects[holder_id].state.get('contains', [])
+            if obj.id in contains:
+                contains.remove(obj.id)
+
+    def is_reachable(self, obj_id: str, room_id: str) -> bool:
+        """物品是否能在该房间里拿到：直接在房间里，或在房间里已打开的容器中"""
+        location = self.locations.get(obj_id)
+        if not location:
+            return False
+        kind, holder_id = location
+        if kind == 'room':
+            return holder_id == room_id
+        if kind == 'container':
+            container = self.objects[holder_id]
+            return (container.is_container and container.state.get('is_open', False)
+                    and self.locations.get(holder_id) == ('room', room_id))
+        return False
+
+    def is_accessible(self, obj_id: str, player) -> bool:
+        """玩家能否接触到物品：在房间里、在已打开的容器里、或在自己身上"""
+        if self.locations.get(obj_id) == ('player', player.name):
+            return True
+        return self.is_reachable(obj_id, player.location)
+
+    def open_container_items(self, room_id: str):
+        """遍历房间中已打开容器里的物品，产出 (容器, 物品)"""
+        room = self.rooms.get(room_id)
+        if not room:
+            return
+        for container in room.containers:
+            if container.state.get('is_open'):
+                for item_id in container.state.get('contains', []):
+                    item = self.objects.get(item_id)
+                    if item:
+                        yield container, item
+
+    def snapshot(self) -> tuple:
+        """保存可变状态：物品state、物品位置、房间物品索引和痕迹"""
+        objects = tuple(
+            {k: list(v) if isinstance(v, list) else v for k, v in obj.state.items()}
+            for obj in self.objects.values()
+        )
+        # 房间里只记物品ID，快照可以恢复到同一模板复制出的任何世界
+        rooms = tuple((tuple(room._objects), dict(room.traces)) for room in self.rooms.values())
+        return objects, dict(self.locations), rooms
+
+    def restore(self, snapshot: tuple):
+        """从snapshot()的结果恢复（同一个快照可以恢复多次）"""
+        objects, locations, rooms = snapshot
+        # 只替换和快照不同的部分：搜索时每次回滚通常只有少数物品变化过
+        for obj, state in zip(self.objects.values(), objects):
+            if obj.state != state:
+                obj.state = {k: list(v) if isinstance(v, list) else v for k, v in state.items()}
+        if self.locations != locations:
+            self.locations = dict(locations)
+        traces_changed = False
+        for room, (object_ids, traces) in zip(self.rooms.values(), rooms):
+            if tuple(room._objects) != object_ids:
+                room._objects = {}
+                room._containers = {}
+                for obj_id in object_ids:
+                    room.add_object(self.objects[obj_id])
+            if room.traces != traces:
+                room.traces = dict(traces)
+                traces_changed = True
+        if traces_changed:
+            self._rebuild_trace_expiry()
+            self.trace_seq = max([self.trace_seq] + [trace['seq'] + 1 for room in self.rooms.values()
+                                                     for trace in room.traces.values()])
+        self.noise.refresh()
+
+    # ===== 痕迹 =====
+
+    def leave_trace(self, room_id: str, trace: Dict[str, Any]):
+        """在房间留下痕迹（同ID的痕迹被替换）；trace['expires_at']为None表示永久"""
+        traces = self.rooms[room_id].traces
+        old = traces.get(trace['id'])
+        # 替换时沿用原来的序号，房间里的痕迹始终按序号递增排列
+        if old is not None:
+            trace['seq'] = old['seq']
+        else:
+            trace['seq'] = self.trace_seq
+            self.trace_seq += 1
+        traces[trace['id']] = trace
+        if trace['expires_at'] is not None:
+            heapq.heappush(self.trace_expiry, (trace['expires_at'], room_id, trace['id']))
+
+    def expire_traces(self, turn: int) -> List[str]:
+        """删除到turn为止过期的痕迹，返回有痕迹被删除的房间。只处理过期的痕迹，O(过期数 × log n)"""
+        expired = []
+        heap = self.trace_expiry
+        while heap and heap[0][0] <= turn:
+            expires_at, room_id, trace_id = heapq.heappop(heap)
+            traces = self.rooms[room_id].traces
+            trace = traces.get(trace_id)
+            # 痕迹被同ID的新痕迹替换过时，堆里的旧条目直接丢弃
+            if trace is not None and trace['expires_at'] == expires_at:
+                del traces[trace_id]
+                expired.append(room_id)
+        return expired
+
+    def _rebuild_trace_expiry(self):
+        self.trace_expiry = [(trace['expires_at'], room_id, trace['id'])
+                             for room_id, room in self.rooms.items()
+                             for trace in room.traces.values() if trace['expires_at'] is not None]
+        heapq.heapify(self.trace_expiry)
+
+    def clone(self) -> 'World':
+        """复制世界。YAML数据、类型定义和规则共享（只读），房间和物品的可变部分独立"""
+        world = World.__new__(World)
+        world.__dict__.update(self.__dict__)
+        world.objects = {obj_id: obj.clone() for obj_id, obj in self.objects.items()}
+        world.locations = dict(self.locations)
+        world.trace_expiry = list(self.trace_expiry)
+        world.rooms = {}
+        for room_id, room in self.rooms.items():
+            new_room = room.clone()
+            for obj in room.objects:
+                new_room.add_object(world.objects[obj.id])
+            world.rooms[room_id] = new_room
+        world.noise = self.noise.bind(world)
+        return world
+
+# 已编译的世界模板（按文件路径和修改时间缓存），新游戏从模板复制而不是重新解析YAML
+_world_templates: Dict[Tuple[str, float], World] = {}
+
+def load_world(yaml_path: str) -> World:
+    """加载世界：同一个YAML只解析一次，之后返回模板的副本"""
+    path = os.path.abspath(yaml_path)
+    key = (path, os.path.getmtime(path))
+    template = _world_templates.get(key)
+    if template is None:
+        # 文件被修改过，丢弃旧模板
+        for old_key in [k for k in _world_templates if k[0] == path]:
+            del _world_templates[old_key]
+        template = World(path)
+        _world_templates[key] = template
+    return template.clone()
+
+def cached_templates() -> List[World]:
+    """当前缓存的世界模板（游戏之间共用的数据都在这里）"""
+    return list(_world_templates.values())
+
+def clear_world_cache():
+    """清空世界模板缓存"""
+    _world_templates.clear()